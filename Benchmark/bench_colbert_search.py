@@ -0,0 +1,68 @@
+"""
+Benchmark the query throughput of a stored ColBERT index: one `Searcher.search` per query, as the index used to
+search, against the batched search of `ColBertIndex` with a cold and with a warm query encoding cache.
+
+The queries are read from a text file (one per line), or default to the names of the indexed entities, recorded in
+the `elements.json` file of the index. Both searches must return the same passages.
+
+Usage:
+    python -m Benchmark.bench_colbert_search --persist_path ./Results/HippoRAG/entities_vdb --num_queries 1000
+    python -m Benchmark.bench_colbert_search --persist_path ./Results/HippoRAG/entities_vdb --queries ./queries.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from Core.Index.ColBertIndex import ColBertIndex
+from Core.Index.Schema import ColBertIndexConfig
+
+
+def load_queries(args):
+    if args.queries:
+        with open(args.queries, "r") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        with open(os.path.join(args.persist_path, ColBertIndex.ELEMENTS_NAME), "r") as f:
+            # The keys are JSON lists of metadata values, e.g., ["ENTITY NAME"]
+            queries = [" ".join(json.loads(key)) for key in json.load(f)]
+    return queries[:args.num_queries]
+
+
+def timed(label, fn, queries):
+    start = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed:8.2f}s  {len(queries) / elapsed:9.1f} queries/s")
+    return results
+
+
+async def main(args):
+    config = ColBertIndexConfig(persist_path=args.persist_path, index_name=args.index_name,
+                                model_name=args.checkpoint)
+    index = ColBertIndex(config)
+    if not await index._load_index():
+        raise ValueError(f"No ColBERT index {args.index_name} under {args.persist_path}")
+    queries = load_queries(args)
+    print(f"{len(queries)} queries, top {args.k}")
+
+    single = timed("single (Searcher.search)", lambda: [index._index.search(query, k=args.k) for query in queries],
+                   queries)
+    index._query_cache.clear()
+    batched = timed("batched, cold encoding cache", lambda: index._search(queries, args.k), queries)
+    timed("batched, warm encoding cache", lambda: index._search(queries, args.k), queries)
+
+    assert [list(pids) for pids, _, _ in single] == [list(pids) for pids, _, _ in batched], "the results differ"
+    print("Both searches return the same passages.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--persist_path", type=str, required=True, help="The directory of the stored ColBERT index.")
+    parser.add_argument("--index_name", type=str, default="nbits_2")
+    parser.add_argument("--checkpoint", type=str, default="colbert-ir/colbertv2.0")
+    parser.add_argument("--queries", type=str, default=None, help="A text file with one query per line.")
+    parser.add_argument("--num_queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
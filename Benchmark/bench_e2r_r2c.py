@@ -0,0 +1,120 @@
+"""
+Benchmark the construction of the entity -> relationship and relationship -> chunk maps.
+
+Compares the per-adjacency loop used before against the bulk COO -> CSR builder of `BaseGraph`, on a synthetic
+graph. The "before" side runs the lookups of the storage as they were: a `list.index` scan of the node and edge lists
+for every adjacency, and one merge-key split per edge. It is quadratic in the graph size, so skip it on large graphs.
+
+Usage:
+    python -m Benchmark.bench_e2r_r2c --num_nodes 5000 --num_edges 20000 --num_chunks 1000
+    python -m Benchmark.bench_e2r_r2c --num_nodes 200000 --num_edges 1000000 --num_chunks 10000 --skip_legacy
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from Config.ChunkConfig import ChunkConfig
+from Config.GraphConfig import GraphConfig
+from Core.Chunk.DocChunk import DocChunk
+from Core.Common.Constants import GRAPH_FIELD_SEP
+from Core.Common.Utils import csr_from_indices, csr_from_indices_list
+from Core.Graph.ERGraph import ERGraph
+from Core.Schema.ChunkSchema import TextChunk
+
+
+async def build_synthetic_graph(num_nodes, num_edges, num_chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    graph = ERGraph(GraphConfig(), llm=None, encoder=None)
+    chunks = DocChunk(ChunkConfig(), token_model=None, namesapce=None)
+    for idx in range(num_chunks):
+        chunk_id = f"chunk-{idx}"
+        await chunks._chunk.upsert(chunk_id, TextChunk(tokens=0, chunk_id=chunk_id, content="", doc_id="", index=idx))
+
+    for idx in range(num_nodes):
+        await graph._graph.upsert_node(f"node-{idx}", dict(entity_name=f"node-{idx}", source_id=""))
+    # Draw unique undirected node pairs (no self loops) up front
+    pairs = rng.integers(0, num_nodes, size=(num_edges * 2, 2))
+    pairs = np.unique(np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1), axis=0)
+    pairs = pairs[rng.permutation(len(pairs))[:num_edges]]
+    chunk_ids = rng.integers(0, num_chunks, size=(len(pairs), 2))
+    for (s, t), (c1, c2) in zip(pairs.tolist(), chunk_ids.tolist()):
+        src_id, tgt_id = f"node-{s}", f"node-{t}"
+        await graph._graph.upsert_edge(src_id, tgt_id, dict(src_id=src_id, tgt_id=tgt_id, weight=1.0,
+                                                            source_id=f"chunk-{c1}{GRAPH_FIELD_SEP}chunk-{c2}"))
+    return graph, chunks
+
+
+class LegacyIndexLookups:
+    """The node / edge index lookups of NetworkXStorage before the id <-> index map: a scan of cached lists."""
+
+    def __init__(self, nx_graph):
+        self.node_list = list(nx_graph.nodes())
+        self.edge_list = list(nx_graph.edges())
+
+    def get_edge_index(self, src_id, tgt_id):
+        try:
+            return self.edge_list.index((src_id, tgt_id))
+        except ValueError:
+            return -1
+
+    async def get_node_index(self, node_id):
+        try:
+            return self.node_list.index(node_id)
+        except ValueError:
+            return None
+
+
+async def legacy_entities_to_relationships_map(graph):
+    storage = graph._graph
+    lookups = LegacyIndexLookups(storage.graph)
+    node_neighbors = {node: list(await storage.neighbors(node)) for node in await storage.nodes()}
+    data = []
+    for node, neighbors in node_neighbors.items():
+        for neighbor in neighbors:
+            edge_index = lookups.get_edge_index(node, neighbor)
+            if edge_index == -1:
+                continue
+            data.append([await lookups.get_node_index(node), edge_index])
+            data.append([await lookups.get_node_index(neighbor), edge_index])
+    return csr_from_indices(data, shape=(graph.node_num, graph.edge_num))
+
+
+async def legacy_relationships_to_chunks_map(graph, chunks):
+    raw = [edge["source_id"] for edge in await graph.edges_data(False)]
+    raw = [[i for i in await chunks.get_index_by_merge_key(chunk_ids) if i is not None] for chunk_ids in raw]
+    return csr_from_indices_list(raw, shape=(len(raw), await chunks.size))
+
+
+async def timed(name, coro):
+    start = time.perf_counter()
+    result = await coro
+    print(f"{name:<40} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+async def main(args):
+    graph, chunks = await build_synthetic_graph(args.num_nodes, args.num_edges, args.num_chunks)
+    print(f"Graph with {graph.node_num} nodes, {graph.edge_num} edges, {args.num_chunks} chunks")
+
+    # The "after" side includes building the id <-> index map of the storage
+    bulk_e2r = await timed("e2r (after, bulk COO -> CSR)", graph.get_entities_to_relationships_map(False))
+    bulk_r2c = await timed("r2c (after, bulk COO -> CSR)", graph.get_relationships_to_chunks_map(chunks))
+    if args.skip_legacy:
+        return
+    legacy_e2r = await timed("e2r (before, list.index lookups)", legacy_entities_to_relationships_map(graph))
+    legacy_r2c = await timed("r2c (before, per-edge merge key)", legacy_relationships_to_chunks_map(graph, chunks))
+
+    assert (legacy_e2r != bulk_e2r).nnz == 0, "e2r maps differ"
+    assert (legacy_r2c != bulk_r2c).nnz == 0, "r2c maps differ"
+    print("Both builders produce identical maps.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_nodes", type=int, default=5000)
+    parser.add_argument("--num_edges", type=int, default=20000)
+    parser.add_argument("--num_chunks", type=int, default=1000)
+    parser.add_argument("--skip_legacy", action="store_true", help="Only run the bulk builders (for large graphs).")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Benchmark the recall@k and the search latency of the faiss index families against the exact flat search.
+
+The embedding matrix is read from a `.npy` file (N, D), or reconstructed from a stored faiss index, e.g., the
+`index.faiss` file of a `faiss_native` workspace; without either, clustered synthetic vectors are used. A sample of
+the vectors (plus noise) serves as queries, `IndexFlatL2` gives the ground truth, and every configuration is built,
+trained and searched through `build_faiss_index`, as `FaissIndex` does.
+
+Usage:
+    python -m Benchmark.bench_faiss_recall --embeddings ./entity_embeddings.npy --k 10
+    python -m Benchmark.bench_faiss_recall --index_file ./Results/HippoRAG/entities_vdb/index.faiss
+    python -m Benchmark.bench_faiss_recall --num_vectors 200000 --dim 256 --hnsw_ef_search 16 64 --ivf_nprobe 8 32
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from Config.FaissConfig import FaissConfig
+from Core.Index.FaissIndex import build_faiss_index, set_faiss_search_params
+
+
+def load_embeddings(args):
+    if args.embeddings:
+        return np.ascontiguousarray(np.load(args.embeddings), dtype=np.float32)
+    if args.index_file:
+        index = faiss.read_index(args.index_file)
+        return index.reconstruct_n(0, index.ntotal)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.num_clusters, args.dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, args.num_clusters, args.num_vectors)]
+    return embeddings + 0.3 * rng.standard_normal(embeddings.shape).astype(np.float32)
+
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) / len(queries)
+
+
+def recall_at_k(ids, ground_truth):
+    k = ground_truth.shape[1]
+    return np.mean([len(np.intersect1d(row, truth)) / k for row, truth in zip(ids, ground_truth)])
+
+
+def configurations(args):
+    """(label, FaissConfig) of every index family and query-time parameter to measure."""
+    common = dict(hnsw_m=args.hnsw_m, hnsw_ef_construction=args.hnsw_ef_construction, ivf_nlist=args.ivf_nlist,
+                  pq_m=args.pq_m, pq_nbits=args.pq_nbits, sq_type=args.sq_type,
+                  train_sample_size=args.train_sample_size)
+    for index_type in args.index_types:
+        if index_type.startswith("hnsw"):
+            for ef_search in args.hnsw_ef_search:
+                yield f"{index_type} efSearch={ef_search}", FaissConfig(index_type=index_type, hnsw_ef_search=ef_search,
+                                                                        **common)
+        elif index_type.startswith("ivf"):
+            for nprobe in args.ivf_nprobe:
+                yield f"{index_type} nprobe={nprobe}", FaissConfig(index_type=index_type, ivf_nprobe=nprobe, **common)
+        else:
+            yield index_type, FaissConfig(index_type=index_type, **common)
+
+
+def main(args):
+    embeddings = load_embeddings(args)
+    num_vectors, dim = embeddings.shape
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(0, num_vectors, args.num_queries)]
+    queries = queries + args.query_noise * queries.std() * rng.standard_normal(queries.shape).astype(np.float32)
+    print(f"{num_vectors} vectors of dimension {dim}, {len(queries)} queries, recall@{args.k}")
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(embeddings)
+    ground_truth, exact_latency = timed_search(exact, queries, args.k)
+    print(f"  {'flat (exact)':<28} recall 1.000  {exact_latency * 1e6:9.1f}us/query")
+
+    built = {}
+    for label, config in configurations(args):
+        # The query-time parameters do not change the index, build each family once
+        build_key = config.model_dump_json(exclude={"hnsw_ef_search", "ivf_nprobe"})
+        if build_key not in built:
+            start = time.perf_counter()
+            index = build_faiss_index(embeddings, config)
+            index.add(embeddings)
+            build_time = time.perf_counter() - start
+            built[build_key] = index
+            print(f"  {config.index_type:<28} built in {build_time:.2f}s, "
+                  f"{len(faiss.serialize_index(index)) / 2 ** 20:.1f} MiB")
+        index = built[build_key]
+        set_faiss_search_params(index, config)
+        ids, latency = timed_search(index, queries, args.k)
+        print(f"  {label:<28} recall {recall_at_k(ids, ground_truth):.3f}  {latency * 1e6:9.1f}us/query "
+              f"({exact_latency / latency:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", type=str, default=None, help="A .npy (N, D) embedding matrix.")
+    parser.add_argument("--index_file", type=str, default=None, help="A stored faiss index to reconstruct.")
+    parser.add_argument("--num_vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--num_clusters", type=int, default=1000)
+    parser.add_argument("--num_queries", type=int, default=1000)
+    parser.add_argument("--query_noise", type=float, default=0.1)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index_types", nargs="+",
+                        default=["hnsw_flat", "hnsw_sq", "ivf_flat", "ivf_sq", "ivf_pq"])
+    parser.add_argument("--hnsw_m", type=int, default=32)
+    parser.add_argument("--hnsw_ef_construction", type=int, default=40)
+    parser.add_argument("--hnsw_ef_search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--ivf_nlist", type=int, default=1024)
+    parser.add_argument("--ivf_nprobe", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--pq_m", type=int, default=16)
+    parser.add_argument("--pq_nbits", type=int, default=8)
+    parser.add_argument("--sq_type", type=str, default="QT_8bit")
+    parser.add_argument("--train_sample_size", type=int, default=100000)
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Benchmark the memory and the access latency of the graph storage backends on the same synthetic graph.
+
+Builds the graph into `NetworkXStorage` (one dict per node / edge) and `CSRGraphStorage` (interned strings, column
+arrays and CSR adjacency), measures the memory held by each one with tracemalloc, times the storage API used by the
+retrievers, and checks that both backends return the same results.
+
+Usage:
+    python -m Benchmark.bench_graph_storage --num_nodes 100000 --num_edges 500000 --num_queries 2000
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from Core.Common.Constants import GRAPH_FIELD_SEP
+from Core.Storage.CSRGraphStorage import CSRGraphStorage
+from Core.Storage.NetworkXStorage import NetworkXStorage
+
+
+def build_synthetic_records(num_nodes, num_edges, num_chunks=5000, num_relations=200, seed=0):
+    rng = np.random.default_rng(seed)
+    nodes = [(f"ENTITY {idx}", dict(entity_name=f"ENTITY {idx}", entity_type="PERSON" if idx % 3 else "ORGANIZATION",
+                                    source_id=f"chunk-{rng.integers(num_chunks)}",
+                                    description=f"Entity {idx} is mentioned in the corpus. " * 3))
+             for idx in range(num_nodes)]
+    pairs = rng.integers(0, num_nodes, size=(num_edges * 2, 2))
+    pairs = np.unique(np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1), axis=0)
+    pairs = pairs[rng.permutation(len(pairs))[:num_edges]]
+    edges = []
+    for src, tgt in pairs.tolist():
+        src_id, tgt_id = f"ENTITY {src}", f"ENTITY {tgt}"
+        edges.append((src_id, tgt_id, dict(
+            src_id=src_id, tgt_id=tgt_id, weight=float(rng.integers(1, 5)),
+            relation_name=GRAPH_FIELD_SEP.join(f"relation {rel}" for rel in rng.integers(0, num_relations, 2)),
+            keywords=f"keyword {rng.integers(num_relations)}", source_id=f"chunk-{rng.integers(num_chunks)}",
+            description=f"{src_id} is related to {tgt_id}.")))
+    return nodes, edges
+
+
+async def build_storage(storage_cls, args):
+    gc.collect()
+    tracemalloc.start()
+    # The records are generated inside the traced region, so that the strings kept by the storage are counted
+    nodes, edges = build_synthetic_records(args.num_nodes, args.num_edges)
+    start = time.perf_counter()
+    storage = storage_cls()
+    if isinstance(storage, NetworkXStorage):
+        storage._graph = nx.Graph()  # The class attribute is shared between instances, start from an empty graph
+    await storage.upsert_nodes(nodes)
+    await storage.upsert_edges(edges)
+    # Build the derived structures (PPR transition matrix, adjacency) as the first queries would
+    storage.get_transition_matrix_snapshot()
+    await storage.node_degree(nodes[0][0])
+    build_time = time.perf_counter() - start
+    del nodes, edges
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return storage, build_time, memory
+
+
+async def timed(name, backends, fn, queries):
+    results = []
+    line = f"  {name:<36}"
+    for label, storage in backends:
+        start = time.perf_counter()
+        results.append([await fn(storage, query) for query in queries])
+        line += f" {label} {(time.perf_counter() - start) / len(queries) * 1e6:9.1f}us"
+    print(line)
+    return results
+
+
+def normalize(name, result):
+    # Neighbour orders differ between the backends, and so does the candidate picked among the closest ones
+    if name in ("neighbors", "get_node_edges"):
+        return [sorted(item) for item in result]
+    if name == "get_one_path":
+        return [None if item is None else len(item[1]) for item in result]
+    return result
+
+
+async def main(args):
+    nodes, edges = build_synthetic_records(args.num_nodes, args.num_edges)
+    rng = np.random.default_rng(1)
+    print(f"{len(nodes)} nodes, {len(edges)} edges")
+
+    backends = []
+    for label, storage_cls in (("networkx", NetworkXStorage), ("csr", CSRGraphStorage)):
+        storage, build_time, memory = await build_storage(storage_cls, args)
+        print(f"  {label:<10} build {build_time:7.2f}s, memory {memory / 2 ** 20:9.1f} MiB")
+        backends.append((label, storage))
+
+    node_queries = [nodes[idx][0] for idx in rng.integers(0, len(nodes), args.num_queries)]
+    edge_queries = [(tgt, src) for src, tgt, _ in (edges[idx] for idx in rng.integers(0, len(edges), args.num_queries))]
+    seed_queries = [[nodes[idx][0] for idx in rng.integers(0, len(nodes), 10)] for _ in range(args.num_queries // 100)]
+    path_queries = [(seeds[0], seeds[1:]) for seeds in seed_queries]
+
+    checks = [
+        ("get_node", lambda s, q: s.get_node(q), node_queries),
+        ("get_edge", lambda s, q: s.get_edge(*q), edge_queries),
+        ("has_edge", lambda s, q: s.has_edge(*q), edge_queries),
+        ("node_degree", lambda s, q: s.node_degree(q), node_queries),
+        ("neighbors", lambda s, q: s.neighbors(q), node_queries),
+        ("get_node_edges", lambda s, q: s.get_node_edges(q), node_queries),
+        ("find_k_hop_neighbors_batch (10 seeds)", lambda s, q: s.find_k_hop_neighbors_batch(q, 2), seed_queries),
+        ("get_one_path", lambda s, q: s.get_one_path(q[0], q[1], 3), path_queries),
+    ]
+    for name, fn, queries in checks:
+        results = await timed(name, backends, fn, queries)
+        if name == "neighbors":
+            results = [[list(item) for item in result] for result in results]
+        assert normalize(name, results[0]) == normalize(name, results[1]), f"{name} differs"
+
+    await timed("get_edge_attr_column (whole graph)", backends,
+                lambda s, q: s.get_edge_attr_column("relation_name"), [None])
+    await timed("get_nodes_data (whole graph)", backends, lambda s, q: s.get_nodes_data(), [None])
+    print("Both backends return the same results.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_nodes", type=int, default=100000)
+    parser.add_argument("--num_edges", type=int, default=500000)
+    parser.add_argument("--num_queries", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
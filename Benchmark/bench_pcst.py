@@ -0,0 +1,142 @@
+"""
+Benchmark the G-Retriever PCST retrieval on synthetic triplet graphs of growing size.
+
+Compares the per-relation pandas scan plus the Python loop over `edge_index` used before against the triplet hash
+index and the vectorized PCST inputs of `Core.Utils.PCST`, on the whole graph and on a k-hop neighbourhood.
+
+Usage:
+    python -m Benchmark.bench_pcst --sizes 10000 100000 1000000 --topk 5 --topk_e 5 --k_hop 2
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from pcst_fast import pcst_fast
+
+from Core.Storage.GraphTensorStorage import GraphTensorStorage
+from Core.Utils.PCST import assign_edge_prizes, build_adjacency, k_hop_node_mask, pcst_subgraph
+
+
+def build_synthetic_tensors(num_edges, num_relations=50, seed=0):
+    rng = np.random.default_rng(seed)
+    num_nodes = max(num_edges // 5, 2)
+    graph_tensors = GraphTensorStorage()
+    graph_tensors.node_names.intern(f"node-{idx}" for idx in range(num_nodes))
+    graph_tensors.relation_names.intern(f"relation-{idx}" for idx in range(num_relations))
+    # Triplets are unique in the export, as in `GraphTensorStorage.update`
+    triplets = np.unique(np.column_stack([rng.integers(0, num_nodes, num_edges),
+                                          rng.integers(0, num_relations, num_edges),
+                                          rng.integers(0, num_nodes, num_edges)]), axis=0)
+    triplets = triplets[rng.permutation(len(triplets))]
+    graph_tensors.edge_src, graph_tensors.edge_rel, graph_tensors.edge_dst = triplets.T.copy()
+    return graph_tensors
+
+
+def legacy_pcst(nodes, edges, edge_index, n_prizes, retrieved, scores, topk_e, cost_e, c=0.01):
+    # The construction used before: one boolean scan per relation, one Python iteration per edge
+    e_prizes = np.zeros(len(edges))
+    for i, rel in enumerate(retrieved):
+        index = edges[(edges["src"] == rel["src"]) & (edges["edge_attr"] == rel["relation_name"]) &
+                      (edges["dst"] == rel["dst"])].index
+        e_prizes[index] = scores[i]
+    last_topk_e_value = topk_e
+    for k in range(min(topk_e, len(scores))):
+        indices = e_prizes == scores[k]
+        value = min((topk_e - k) / sum(indices), last_topk_e_value - c)
+        e_prizes[indices] = value
+        last_topk_e_value = value * (1 - c)
+    cost_e = min(cost_e, e_prizes.max() * (1 - c / 2))
+
+    costs, pcst_edges, virtual_n_prizes, virtual_edges, virtual_costs = [], [], [], [], []
+    mapping_n, mapping_e = {}, {}
+    for i, (src, dst) in enumerate(edge_index.T):
+        prize_e = e_prizes[i]
+        if prize_e <= cost_e:
+            mapping_e[len(pcst_edges)] = i
+            pcst_edges.append((src, dst))
+            costs.append(cost_e - prize_e)
+        else:
+            virtual_node_id = len(nodes) + len(virtual_n_prizes)
+            mapping_n[virtual_node_id] = i
+            virtual_edges.append((src, virtual_node_id))
+            virtual_edges.append((virtual_node_id, dst))
+            virtual_costs.append(0)
+            virtual_costs.append(0)
+            virtual_n_prizes.append(prize_e - cost_e)
+    prizes = np.concatenate([n_prizes, np.array(virtual_n_prizes)])
+    num_edges = len(pcst_edges)
+    costs = np.array(costs + virtual_costs)
+    pcst_edges = np.array(pcst_edges + virtual_edges)
+    vertices, selected = pcst_fast(pcst_edges, prizes, costs, -1, 1, "gw", 0)
+    selected_edges = [mapping_e[e] for e in selected if e < num_edges]
+    selected_edges = np.array(selected_edges + [mapping_n[i] for i in vertices[vertices >= len(nodes)]],
+                              dtype=np.int64)
+    selected_nodes = np.unique(np.concatenate([vertices[vertices < len(nodes)],
+                                               edge_index[0][selected_edges], edge_index[1][selected_edges]]))
+    return selected_nodes, selected_edges
+
+
+def timed(name, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {name:<44} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def run(num_edges, args):
+    rng = np.random.default_rng(num_edges)
+    graph_tensors = build_synthetic_tensors(num_edges)
+    node_names = graph_tensors.node_names.tolist()
+    relation_names = np.array(graph_tensors.relation_names.tolist(), dtype=object)
+    edge_index = graph_tensors.edge_index
+    nodes = pd.DataFrame({"node_id": np.arange(len(node_names)), "node_attr": node_names})
+    edges = pd.DataFrame({"src": graph_tensors.edge_src, "edge_attr": relation_names[graph_tensors.edge_rel],
+                          "dst": graph_tensors.edge_dst})
+    print(f"{len(nodes)} nodes, {len(edges)} triplets")
+
+    n_prizes = np.zeros(len(nodes))
+    n_prizes[rng.choice(len(nodes), args.topk, replace=False)] = np.arange(args.topk, 0, -1)
+    rows = rng.choice(len(edges), args.topk_e, replace=False)
+    scores = np.sort(rng.random(args.topk_e))[::-1].tolist()
+    retrieved = [{"src": edges.src[row], "relation_name": edges.edge_attr[row], "dst": edges.dst[row],
+                  "src_id": node_names[edges.src[row]], "tgt_id": node_names[edges.dst[row]]} for row in rows]
+
+    legacy = timed("before (pandas scan + Python loop)",
+                   lambda: legacy_pcst(nodes, edges, edge_index, n_prizes, retrieved, scores, args.topk_e,
+                                       args.cost_e))
+
+    graph_tensors.triplet_rows()  # The hash index is built once per graph, outside of the query path
+
+    def indexed(k_hop):
+        matched_rows = [graph_tensors.find_triplets(rel["src_id"], rel["relation_name"], rel["tgt_id"])
+                        for rel in retrieved]
+        e_prizes = assign_edge_prizes(len(edges), matched_rows, scores, args.topk_e)
+        cost_e = min(args.cost_e, e_prizes.max() * (1 - 0.01 / 2))
+        node_mask = None
+        if k_hop > 0:
+            seeds = np.concatenate([np.flatnonzero(n_prizes > 0), edge_index[:, e_prizes > 0].ravel()])
+            node_mask = k_hop_node_mask(adjacency, seeds, k_hop)
+        return pcst_subgraph(edge_index, n_prizes, e_prizes, cost_e, node_mask=node_mask)
+
+    adjacency = build_adjacency(edge_index, len(nodes))
+    after = timed("after (hash index + vectorized inputs)", lambda: indexed(0))
+    timed(f"after, on the {args.k_hop}-hop neighbourhood", lambda: indexed(args.k_hop))
+
+    assert np.array_equal(legacy[0], after[0]) and np.array_equal(legacy[1], after[1]), "selected subgraphs differ"
+
+
+def main(args):
+    for num_edges in args.sizes:
+        run(num_edges, args)
+    print("The indexed construction selects the same subgraph as before on every size.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--topk", type=int, default=5)
+    parser.add_argument("--topk_e", type=int, default=5)
+    parser.add_argument("--cost_e", type=float, default=0.5)
+    parser.add_argument("--k_hop", type=int, default=2)
+    main(parser.parse_args())
@@ -10,6 +10,7 @@ class EmbeddingType(Enum):
     OPENAI = "openai"
     HF = "hf"
     OLLAMA = "ollama"
+    FAKE = "fake"  # Deterministic hashed vectors, see FakeEmbedding
 
 
 class EmbeddingConfig(YamlModel):
@@ -28,6 +29,9 @@ class EmbeddingConfig(YamlModel):
     cache_folder: Optional[str] = None
     embed_batch_size: Optional[int] = None
     dimensions: Optional[int] = None  # output dimension of embedding model
+    vector_cache_dir: Optional[str] = None  # persistent embedding cache, disabled when unset
+    vector_cache_dtype: str = "float32"  # float32 / float16 (half the disk size, rounded vectors)
+    vector_cache_memory_size: int = 100000  # vectors kept in the in-memory LRU layer of the cache
 
     @field_validator("api_type", mode="before")
     @classmethod
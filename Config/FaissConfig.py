@@ -0,0 +1,20 @@
+from Core.Utils.YamlModel import YamlModel
+
+
+class FaissConfig(YamlModel):
+    # Index family: flat (exact) / hnsw_flat / hnsw_sq / ivf_flat / ivf_sq / ivf_pq
+    index_type: str = "hnsw_flat"
+    # HNSW graph degree, and the candidate list sizes when building / searching the graph
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 40
+    hnsw_ef_search: int = 16
+    # IVF coarse quantizer: number of inverted lists, and how many of them are visited per query
+    ivf_nlist: int = 1024
+    ivf_nprobe: int = 8
+    # Product quantization: sub-vectors per vector (must divide the dimension) and bits per sub-vector code
+    pq_m: int = 16
+    pq_nbits: int = 8
+    # Scalar quantization of the *_sq families: QT_8bit / QT_6bit / QT_4bit / QT_fp16 / ...
+    sq_type: str = "QT_8bit"
+    # Number of vectors sampled to train the IVF / PQ / SQ indexes
+    train_sample_size: int = 100000
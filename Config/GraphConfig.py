@@ -9,6 +9,19 @@ class GraphConfig(YamlModel):
     extract_two_step: bool = True
     max_gleaning: int = 1
     force: bool = False
+    # Offline extraction of the ER / RK graphs: "off" (live requests), "openai" (Batch API) or "local" (file-based
+    # stand-in running the jobs through the live client). One job per round of requests, resumed after an interruption
+    extraction_batch: str = "off"
+    batch_poll_interval: float = 60.0  # Seconds between two status checks of a job
+    batch_max_requests: int = 50000  # Requests per job, the limit of the OpenAI Batch API
+    batch_max_retries: int = 2  # Re-submissions of the failed requests
+    batch_completion_window: str = "24h"
+    # Graph storage backend: "networkx" or "csr" (array-backed, see CSRGraphStorage)
+    graph_storage: str = "networkx"
+    # Persistence of the NetworkX graphs: "graphml" or "columnar" (NumPy node / edge tables, memory-mapped on load)
+    graph_storage_format: str = "graphml"
+    # Attributes of the columnar format only decoded when a node / edge is accessed
+    graph_lazy_attrs: list[str] = ["description"]
 
     # For ER graph & KG graph and & RKG graph
     enable_entity_description: bool = False
@@ -50,3 +63,4 @@ class GraphConfig(YamlModel):
     similarity_threshold: float = 0.8
     similarity_top_k: int = 10
     similarity_max: float = 1.0
+    similarity_block_size: int = 8192  # Entities searched at once when building the similarity kNN graph
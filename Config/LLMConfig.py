@@ -22,6 +22,7 @@ class LLMType(Enum):
     OPENROUTER = "openrouter"
     BEDROCK = "bedrock"
     ARK = "ark"  # https://www.volcengine.com/docs/82379/1263482#python-sdk
+    FAKE = "fake"  # Offline rule-based responses, see FakeLLM
 
     def __missing__(self, key):
         return self.OPENAI
@@ -78,9 +79,29 @@ class LLMConfig(YamlModel):
     # For Network
     proxy: Optional[str] = None
     max_concurrent:int  = 20 # Your concurrent number 
+    # Request scheduling: the concurrency adapts (AIMD) between min_concurrent and max_concurrent
+    min_concurrent: int = 1
+    adaptive_concurrency: bool = True
+    rpm_limit: Optional[int] = None  # Requests per minute, None for no budget
+    tpm_limit: Optional[int] = None  # Tokens (prompt + max_tokens) per minute, None for no budget
+    max_rate_limit_retries: int = 6
+    coalesce_requests: bool = True  # Concurrent identical requests share one in-flight call
     # Cost Control
     calc_usage: bool = True
 
+    # For Response Cache
+    cache_mode: str = "off"  # off / read_write / replay (read-only: a miss raises instead of calling the LLM)
+    cache_path: str = str(GRAPHRAG_ROOT / "Cache" / "llm_responses.sqlite")
+    cache_ttl: dict[str, float] = {}  # namespace -> TTL in seconds, "*" for the other namespaces
+    cache_max_entries: dict[str, int] = {}  # namespace -> max entries (LRU eviction), "*" for the other namespaces
+
+    # For the fake provider (api_type: fake): latency of every request, constant / uniform / exponential / lognormal
+    fake_latency: str = "constant"
+    fake_latency_mean: float = 0.0  # seconds
+    fake_latency_std: float = 0.0
+    fake_seed: int = 0
+    fake_responses: dict[str, str] = {}  # regex over the last user message -> canned response, before the rules
+
     # For Messages Control
     use_system_prompt: bool = True
 
@@ -53,6 +53,7 @@ class QueryConfig(YamlModel):
     max_txt_len: int = 512
     topk_e: int = 3
     cost_e: float = 0.5
+    pcst_k_hop: int = 0  # Run PCST on the k-hop neighbourhood of the prized nodes, 0 for the whole graph
 
     # For Medical GraphRAG
     topk_entity: int = 10
@@ -9,6 +9,8 @@ class RetrieverConfig(YamlModel):
     top_k_entity_for_ppr: int = 8
     node_specificity: bool = True
     damping: float = 0.1
+    ppr_implementation: str = "prpack"  # prpack (igraph) / power_iteration (NumPy on the cached CSR snapshot)
+    ppr_batch_implementation: str = "power_iteration"  # Of the `*_batch` modes: one sparse matrix-matrix iteration
     top_k: int = 5
     k_nei: int = 3
     node_specificity: bool = True
@@ -21,3 +23,7 @@ class RetrieverConfig(YamlModel):
     global_max_consider_community: int = 128
     global_min_community_rating: float = 0.0
     level: int = 2
+    # Lexical retrieval (`bm25` / `hybrid` modes, see `use_bm25`)
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    rrf_k: int = 60  # Smoothing constant of the reciprocal rank fusion of the lexical and the vector rankings
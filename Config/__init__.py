@@ -4,5 +4,6 @@ from Config.LLMConfig import LLMConfig, LLMType
 from Config.RetrieverConfig import RetrieverConfig
 from Config.QueryConfig import QueryConfig
 from Config.ChunkConfig import ChunkConfig
+from Config.FaissConfig import FaissConfig
 
-__all__ = ["EmbeddingConfig", "EmbeddingType", "GraphConfig", "LLMConfig", "LLMType", "RetrieverConfig", "QueryConfig", "ChunkConfig"]
+__all__ = ["EmbeddingConfig", "EmbeddingType", "GraphConfig", "LLMConfig", "LLMType", "RetrieverConfig", "QueryConfig", "ChunkConfig", "FaissConfig"]
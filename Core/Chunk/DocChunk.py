@@ -84,6 +84,9 @@ class DocChunk:
     async def get_index_by_merge_key(self, chunk_id):
         return await self._chunk.get_index_by_merge_key(chunk_id)
 
+    async def get_indices_by_keys(self, keys):
+        return await self._chunk.get_indices_by_keys(keys)
+
     @property
     async def size(self):
         return await self._chunk.size()
@@ -108,16 +111,19 @@ class DocChunk:
             *[self.get_data_by_index(index) for index in indices]
         )
     
-    async def add_manual_chunks(self, chunks):
+    async def add_manual_chunks(self, chunks, persist: bool = True):
         """
         Register manually created chunks so that relationships can map to chunk indices.
 
         Args:
             chunks: List[dict] with keys: chunk_id, content, optional doc_id, title
+            persist: Whether to persist the chunk storage, bulk loaders call `persist` once at the end instead
         """
         # Determine start index based on existing size
         start_index = await self._chunk.size()
-        for offset, chunk in enumerate(chunks):
+        # Tokenize all the chunks at once
+        tokens = self.token_model.encode_batch([chunk.get("content", "") or "" for chunk in chunks], num_threads=16)
+        for offset, (chunk, chunk_tokens) in enumerate(zip(chunks, tokens)):
             chunk_id = chunk.get("chunk_id", None)
             content = chunk.get("content", "")
             doc_id = chunk.get("doc_id", "")
@@ -125,9 +131,8 @@ class DocChunk:
             if not chunk_id:
                 # Skip invalid chunk without id
                 continue
-            tokens = self.token_model.encode(content or "")
             text_chunk = TextChunk(
-                tokens=len(tokens),
+                tokens=len(chunk_tokens),
                 chunk_id=chunk_id,
                 content=content,
                 doc_id=doc_id,
@@ -135,4 +140,8 @@ class DocChunk:
                 title=title,
             )
             await self._chunk.upsert(chunk_id, text_chunk)
+        if persist:
+            await self._chunk.persist()
+
+    async def persist(self):
         await self._chunk.persist()
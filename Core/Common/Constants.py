@@ -97,6 +97,9 @@ g = int(hex_color[3:5], 16)
 b = int(hex_color[5:7], 16)
 ANSI_COLOR = f"\033[38;2;{r};{g};{b}m"
 TOKEN_TO_CHAR_RATIO = 4
+# Priorities of the LLM requests in the scheduler, the lowest first
+LLM_PRIORITY_INTERACTIVE = 0  # Query answering
+LLM_PRIORITY_BULK = 1  # Graph construction (extraction, summaries, community reports)
 class Retriever(Enum):
     ENTITY = "entity"
     RELATION = "relationship"
@@ -19,6 +19,9 @@ class Costs(NamedTuple):
     total_completion_tokens: int
     total_cost: float
     total_budget: float
+    cache_hits: int = 0
+    cache_misses: int = 0
+    coalesced_calls: int = 0
 
 
 class CostManager(BaseModel):
@@ -31,6 +34,11 @@ class CostManager(BaseModel):
     total_cost: float = 0
     token_costs: dict[str, dict[str, float]] = TOKEN_COSTS  # different model's token cost
     stage_costs: list[Costs] = []
+    # Requests served by / missing from the LLM response cache, when it is enabled
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # Requests that shared the response of an identical in-flight request
+    coalesced_calls: int = 0
 
     def update_cost(self, prompt_tokens, completion_tokens, model):
         """
@@ -59,6 +67,22 @@ class CostManager(BaseModel):
             f"Current cost: ${cost:.3f}, prompt_tokens: {prompt_tokens}, completion_tokens: {completion_tokens}"
         )
 
+    def update_cache_stats(self, hit: bool):
+        """
+        Count one lookup of the LLM response cache.
+
+        Args:
+        hit (bool): Whether the response was served by the cache, without any API call.
+        """
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def update_coalesced_calls(self):
+        """Count one request served by an identical in-flight request, without its own API call."""
+        self.coalesced_calls += 1
+
     def get_total_prompt_tokens(self):
         """
         Get the total number of prompt tokens.
@@ -88,7 +112,8 @@ class CostManager(BaseModel):
 
     def get_costs(self) -> Costs:
         """Get all costs"""
-        return Costs(self.total_prompt_tokens, self.total_completion_tokens, self.total_cost, self.total_budget)
+        return Costs(self.total_prompt_tokens, self.total_completion_tokens, self.total_cost, self.total_budget,
+                     self.cache_hits, self.cache_misses, self.coalesced_calls)
 
     def set_stage_cost(self):
         """Set the cost of the current stage."""
@@ -109,7 +134,10 @@ class CostManager(BaseModel):
             current_cost.total_prompt_tokens - last_cost.total_prompt_tokens,
             current_cost.total_completion_tokens - last_cost.total_completion_tokens,
             current_cost.total_cost - last_cost.total_cost,
-            current_cost.total_budget - last_cost.total_budget
+            current_cost.total_budget - last_cost.total_budget,
+            current_cost.cache_hits - last_cost.cache_hits,
+            current_cost.cache_misses - last_cost.cache_misses,
+            current_cost.coalesced_calls - last_cost.coalesced_calls,
         )
         
         self.set_stage_cost()
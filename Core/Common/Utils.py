@@ -7,10 +7,10 @@ import numbers
 import shutil
 import io
 import csv
-from scipy.sparse import csr_matrix
+from scipy.sparse import coo_matrix, csr_matrix
 
 from Core.Common.Logger import logger
-import tiktoken
+from Core.Utils.ByteTokenizer import get_encoding
 from tenacity import RetryCallState
 import numpy as np
 from Core.Common.Constants import GRAPH_FIELD_SEP
@@ -223,12 +223,12 @@ def prase_json_from_response(response: str) -> dict:
 
 
 def encode_string_by_tiktoken(content: str, model_name: str = "cl100k_base"):
-    ENCODER = tiktoken.get_encoding(model_name)
+    ENCODER = get_encoding(model_name)
     tokens = ENCODER.encode(content)
     return tokens
 
 def decode_string_by_tiktoken(tokens: list[int], model_name: str = "cl100k_base"):
-    ENCODER = tiktoken.get_encoding(model_name)
+    ENCODER = get_encoding(model_name)
     string = ENCODER.decode(tokens)
     return string
 
@@ -269,6 +269,22 @@ def min_max_normalize(x):
     return (x - np.min(x)) / (np.max(x) - np.min(x))
 
 
+def reciprocal_rank_fusion(rankings: List[List[Any]], k: int = 60) -> List[Tuple[Any, float]]:
+    """
+    Reciprocal rank fusion of several rankings of the same kind of items, e.g., the lexical and the vector results.
+
+    Args:
+        rankings (list): The rankings, best item first; an item scores `1 / (k + rank)` (rank from 1) in every ranking.
+        k (int): The smoothing constant, 60 as in Cormack et al.
+        Returns: The (item, fused score) pairs, sorted by decreasing score, ties kept in their first-seen order.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: -pair[1])
+
+
 def get_class_name(cls) -> str:
     """Return class name"""
     return f"{cls.__module__}.{cls.__name__}"
@@ -359,6 +375,12 @@ def csr_from_indices_list(data: List[List[int]], shape: Tuple[int, int]) -> csr_
     return csr_matrix((values, (row_indices, col_indices)), shape=shape)
 
 
+def csr_from_coo_arrays(rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int], dtype=np.float64) -> csr_matrix:
+    """Create a CSR matrix with all-ones values from row/column index arrays in one COO -> CSR conversion."""
+    values = np.ones(len(rows), dtype=dtype)
+    return coo_matrix((values, (rows, cols)), shape=shape).tocsr()
+
+
 def clean_storage(path):
     try:
         if os.path.exists(path):
@@ -11,6 +11,7 @@ from Core.Common.Utils import (
     truncate_list_by_token_size, clean_str
 )
 from Core.Common.Logger import logger
+from Core.Common.Constants import LLM_PRIORITY_BULK
 import asyncio
 
 from Core.Graph.BaseGraph import BaseGraph
@@ -109,7 +110,7 @@ class LeidenCommunity(BaseCommunity):
         describe = await self._pack_single_community_describe(er_graph, community, already_reports=already_reports)
         prompt = CommunityPrompt.COMMUNITY_REPORT.format(input_text=describe)
         print("_form_single_community_report")
-        response = await self.llm.aask(prompt, format = "json", timeout=600)
+        response = await self.llm.aask(prompt, format = "json", timeout=600, priority=LLM_PRIORITY_BULK)
         # data = prase_json_from_response(response)
 
         return response
@@ -1,21 +1,24 @@
 import asyncio
 from abc import ABC, abstractmethod
 from collections import defaultdict
-import igraph as ig
+from itertools import chain
 import numpy as np
 from lazy_object_proxy.utils import await_
 from scipy.sparse import csr_matrix
 
 from Core.Common.Logger import logger
 from typing import List
-from Core.Common.Constants import GRAPH_FIELD_SEP
+from Core.Common.Constants import GRAPH_FIELD_SEP, LLM_PRIORITY_BULK
 from Core.Common.Memory import Memory
 from Core.Prompt import GraphPrompt
+from Core.Provider.LLMBatch import BatchLLM
 from Core.Schema.ChunkSchema import TextChunk
 from Core.Schema.EntityRelation import Entity, Relationship
-from Core.Common.Utils import (clean_str, build_data_for_merge, csr_from_indices, csr_from_indices_list)
+from Core.Common.Utils import (clean_str, build_data_for_merge, csr_from_coo_arrays)
+from Core.Storage.CSRGraphStorage import CSRGraphStorage
 from Core.Storage.NetworkXStorage import NetworkXStorage
 from Core.Utils.MergeER import MergeEntity, MergeRelationship
+from Core.Utils.PageRank import personalized_pagerank_power_iteration
 
 
 class BaseGraph(ABC):
@@ -100,7 +103,8 @@ class BaseGraph(ABC):
         # Upsert the node with the merged data
         await self._graph.upsert_node(entity_name, node_data=node_data)
 
-    async def _merge_edges_then_upsert(self, src_id: str, tgt_id: str, edges_data: List[Relationship]) -> None:
+    async def _merge_edge_data(self, src_id: str, tgt_id: str, edges_data: List[Relationship]) -> dict:
+        """Merge the relationships of one edge with the stored edge, if any, into the edge data to upsert."""
         # Check if the edge exists and fetch existing data
         existing_edge = await self._graph.get_edge(src_id, tgt_id) if await self._graph.has_edge(src_id,
                                                                                                  tgt_id) else None
@@ -133,22 +137,41 @@ class BaseGraph(ABC):
         relation_name = (MergeRelationship.merge_relation_name(existing_edge_data["relation_name"],
                                                                upsert_edge_data[
                                                                    "relation_name"]) if self.config.enable_edge_name else "")
+        # Create edge_data with merged data
+        return dict(weight=total_weight, source_id=source_id,
+                    relation_name=relation_name, keywords=keywords, description=description, src_id=src_id,
+                    tgt_id=tgt_id)
+
+    async def _merge_edges_then_upsert(self, src_id: str, tgt_id: str, edges_data: List[Relationship]) -> None:
+        edge_data = await self._merge_edge_data(src_id, tgt_id, edges_data)
         # Ensure src_id and tgt_id nodes exist
         for node_id in (src_id, tgt_id):
             if not await self._graph.has_node(node_id):
                 # Upsert node with source_id and entity_name
                 await self._graph.upsert_node(
                     node_id,
-                    node_data=dict(source_id=source_id, entity_name=node_id, entity_type="", description="")
+                    node_data=dict(source_id=edge_data["source_id"], entity_name=node_id, entity_type="",
+                                   description="")
                 )
 
-        # Create edge_data with merged data
-        edge_data = dict(weight=total_weight, source_id=source_id,
-                         relation_name=relation_name, keywords=keywords, description=description, src_id=src_id,
-                         tgt_id=tgt_id)
         # Upsert the edge with the merged data
         await self._graph.upsert_edge(src_id, tgt_id, edge_data=edge_data)
-    
+
+    async def _merge_edges_then_upsert_batch(self, maybe_edges: dict[tuple[str, str], List[Relationship]]) -> None:
+        """`_merge_edges_then_upsert` for many edges, written with one bulk upsert of the nodes and one of the edges."""
+        edges = list(maybe_edges.items())
+        edges_data = await asyncio.gather(*[self._merge_edge_data(src_id, tgt_id, relationships)
+                                            for (src_id, tgt_id), relationships in edges])
+        missing_nodes = {}
+        for edge_data in edges_data:
+            for node_id in (edge_data["src_id"], edge_data["tgt_id"]):
+                if node_id not in missing_nodes and not await self._graph.has_node(node_id):
+                    missing_nodes[node_id] = dict(source_id=edge_data["source_id"], entity_name=node_id,
+                                                  entity_type="", description="")
+        await self._graph.upsert_nodes(list(missing_nodes.items()))
+        await self._graph.upsert_edges([(src_id, tgt_id, edge_data)
+                                        for ((src_id, tgt_id), _), edge_data in zip(edges, edges_data)])
+
     @abstractmethod
     def _extract_entity_relationship(self, chunk_key_pair: tuple[str, TextChunk]):
         """
@@ -170,60 +193,86 @@ class BaseGraph(ABC):
         """
         pass
 
-    async def augment_graph_by_similarity_search(self, entity_vdb, duplicate=False):
-        logger.info("Starting augment the existing graph with similariy edges")
-
+    async def _extract_from_chunks(self, chunk_list: List):
+        """
+        Run `_extract_entity_relationship` on every chunk, with live LLM requests or, if `extraction_batch` is set,
+        with batch jobs (see `BatchLLM`), whose responses are kept under the graph namespace to resume an interrupted run.
+        """
+        if self.config.extraction_batch == "off":
+            return await asyncio.gather(*[self._extract_entity_relationship(chunk) for chunk in chunk_list])
+        batch_llm = BatchLLM.from_config(self.llm, self.config, self._graph.namespace.get_save_path("extraction_batch"))
+        live_llm, self.llm = self.llm, batch_llm
+        try:
+            return await batch_llm.gather([self._extract_entity_relationship(chunk) for chunk in chunk_list])
+        finally:
+            self.llm = live_llm
 
+    async def augment_graph_by_similarity_search(self, entity_vdb, duplicate=False):
+        """
+        Add "similarity" edges between every entity and its nearest entities in the entity vector index.
 
-        ranking  = {}
-        import tqdm
-        for node in tqdm.tqdm(await self._graph.nodes(), total=len(await self._graph.nodes())):
-            ranking[node] =  await entity_vdb.retrieval(query = node, top_k=self.config.similarity_top_k)
-        # For FAISS index, it uses L2-distance 
-        is_euclidean_distance = False
-        kb_similarity = defaultdict(list)
-        for key, rank in ranking.items():
-            max_score = max(ns_item.score for ns_item in rank)  # find the max score
-            for idx, ns_item in enumerate(rank):
-                score = ns_item.score
-                if idx == 0 and score == 0:
-                    # L1 or L2 distance 
-                    is_euclidean_distance = True
-                if not duplicate and idx == 0:
-                    continue
-                if is_euclidean_distance:
-                    kb_similarity[key].append((ns_item.metadata['entity_name'], 1 - score / max_score))
-                else: 
-                    kb_similarity[key].append((ns_item.metadata['entity_name'],  score / max_score))
+        The kNN graph is built in one pass: the faiss indexes search their own stored vectors block by block (see
+        `FaissIndex.stored_knn`), the other indexes embed all the entity names with one batched retrieval. The scores
+        are then normalized and thresholded as arrays, and the edges merged and written with one bulk upsert.
+        """
+        logger.info("Starting augment the existing graph with similariy edges")
+        top_k = self.config.similarity_top_k
+        names, scores, neighbors, is_euclidean_distance = await self._similarity_knn(entity_vdb, top_k)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Normalize by the largest score of every row, L1 / L2 distances becoming similarities
+            max_scores = np.nanmax(np.where(np.isnan(scores), -np.inf, scores), axis=1, keepdims=True)
+            scores = 1 - scores / max_scores if is_euclidean_distance else scores / max_scores
+        if not duplicate:
+            # The first result is the entity itself
+            scores, neighbors = scores[:, 1:], neighbors[:, 1:]
+        scores, neighbors = scores[:, :top_k], neighbors[:, :top_k]
+        # The results are ranked: keep every row up to its first score under the threshold
+        keep = np.logical_and.accumulate(scores >= self.config.similarity_threshold, axis=1) & (neighbors >= 0)
+        rows, cols = np.nonzero(keep)
+        neighbors = neighbors[rows, cols]
+        keep = names[rows] != names[neighbors]
+
+        clean_names = np.array([clean_str(name) for name in names.tolist()], dtype=object)
         maybe_edges = defaultdict(list)
-        # Refactored second part using dictionary iteration and enumerate
-        for src_id, nns in kb_similarity.items():
-    
-            for idx, (nn, score) in enumerate(nns):
-       
-                if score < self.config.similarity_threshold or idx >= self.config.similarity_top_k:
-                    break
-                if nn == src_id:
-                    continue
-                tgt_id = nn
-
-                # No need source_id for this type of edges
-                relationship = Relationship(src_id=clean_str(src_id),
-                                            tgt_id=clean_str(tgt_id),
-                                            source_id="N/A",
-                                            weight=self.config.similarity_max * score, relation_name="similarity")
-                maybe_edges[(relationship.src_id, relationship.tgt_id)].append(relationship)
-
-        # Merge the edges
-        maybe_edges_aug = defaultdict(list)
-        for k, v in maybe_edges.items():
-            maybe_edges_aug[tuple(sorted(k))].extend(v)
-        logger.info(f"Augmenting graph with {len(maybe_edges_aug)} edges")
-     
-        await asyncio.gather(*[self._merge_edges_then_upsert(k[0], k[1], v) for k, v in maybe_edges.items()])
+        for src_id, tgt_id, score in zip(clean_names[rows[keep]].tolist(), clean_names[neighbors[keep]].tolist(),
+                                         scores[rows[keep], cols[keep]].tolist()):
+            # No need source_id for this type of edges
+            relationship = Relationship(src_id=src_id, tgt_id=tgt_id, source_id="N/A",
+                                        weight=self.config.similarity_max * score, relation_name="similarity")
+            # Merge the edges of both directions
+            maybe_edges[tuple(sorted((src_id, tgt_id)))].append(relationship)
+        logger.info(f"Augmenting graph with {len(maybe_edges)} edges")
+
+        await self._merge_edges_then_upsert_batch(maybe_edges)
         await self._persist_graph()
         logger.info("✅ Finished augment the existing graph with similariy edges")
 
+    async def _similarity_knn(self, entity_vdb, top_k):
+        """
+        The top_k nearest entities of every entity.
+
+        Returns:
+            tuple: The (N,) entity names; the (N, top_k) scores, NaN past the results; the (N, top_k) positions of the
+            neighbours in the names, -1 past the results; and whether the scores are distances.
+        """
+        if hasattr(entity_vdb, "stored_knn"):
+            metadata, scores, neighbors, is_distance = entity_vdb.stored_knn(top_k, self.config.similarity_block_size)
+            return (np.array([data.get("entity_name", "") for data in metadata], dtype=object), scores, neighbors,
+                    is_distance)
+
+        nodes = list(await self._graph.nodes())
+        ranking = await entity_vdb.retrieval_batch(nodes, top_k)
+        positions = {name: idx for idx, name in enumerate(nodes)}
+        scores = np.full((len(nodes), top_k), np.nan, dtype=np.float32)
+        neighbors = np.full((len(nodes), top_k), -1, dtype=np.int64)
+        for row, rank in enumerate(ranking):
+            for col, ns_item in enumerate(rank[:top_k]):
+                scores[row, col] = ns_item.score
+                neighbors[row, col] = positions.setdefault(ns_item.metadata['entity_name'], len(positions))
+        # For FAISS index, it uses L2-distance: the entity itself is at distance 0
+        is_distance = any(len(rank) > 0 and rank[0].score == 0 for rank in ranking)
+        return np.array(list(positions), dtype=object), scores, neighbors, is_distance
 
     async def __graph__(self, elements: list):
         """
@@ -278,7 +327,8 @@ class BaseGraph(ABC):
         logger.debug(f"Trigger summary: {entity_or_relation_name}")
 
         # Asynchronously generate the summary using the language model
-        return await self.llm.aask(use_prompt, max_tokens=self.config.summary_max_tokens)
+        return await self.llm.aask(use_prompt, max_tokens=self.config.summary_max_tokens, cache_namespace="summary",
+                                   priority=LLM_PRIORITY_BULK)
 
     async def _persist_graph(self, force = False):
         await self._graph.persist(force)
@@ -302,14 +352,14 @@ class BaseGraph(ABC):
         return await self._graph.get_subgraph_metadata()
 
     async def stable_largest_cc(self):
-        if isinstance(self._graph, NetworkXStorage):
+        if isinstance(self._graph, (NetworkXStorage, CSRGraphStorage)):
             return await self._graph.get_stable_largest_cc()
         else:
             logger.exception("**Only NETWORKX is supported for finding the largest connected component.** ")
             return None
 
     async def cluster_data_to_subgraphs(self, cluster_data: dict):
-        if isinstance(self._graph, NetworkXStorage):
+        if isinstance(self._graph, (NetworkXStorage, CSRGraphStorage)):
 
             await self._graph.cluster_data_to_subgraphs(cluster_data)
         else:
@@ -364,6 +414,11 @@ class BaseGraph(ABC):
     def edge_num(self):
         return self._graph.get_edge_num()
 
+    @property
+    def data_version(self):
+        # Changes on every write to the graph storage, None if the storage does not track it
+        return getattr(self._graph, "data_version", None)
+
     def get_induced_subgraph(self, nodes: list[str]):
         return self._graph.get_induced_subgraph(nodes)
 
@@ -371,47 +426,46 @@ class BaseGraph(ABC):
         if self.node_num == 0:
             return csr_matrix((0, 0))
 
-        node_neighbors = {node: list(await self._graph.neighbors(node)) for node in await self._graph.nodes()}
-
-        # Construct the row and column indices for the CSR matrix
-        data = []
-        for node, neighbors in node_neighbors.items():
-            for neighbor in neighbors:
-                # Get the edge index (assuming edge indices are unique)
-                edge_index = self._graph.get_edge_index(node, neighbor)
-                if edge_index == -1: continue
-                node_index = await self._graph.get_node_index(node)
-                data.append([node_index, edge_index])
-                if not is_directed:
-                    neighbor_index = await self._graph.get_node_index(neighbor)
-                    data.append([neighbor_index, edge_index])
-
-        # Get the number of nodes and edges
-        node_count = self.node_num
-        edge_count = self.edge_num
-        # Construct the CSR matrix
-        return csr_from_indices(data, shape=(node_count, edge_count))
+        # Export the edge list once as integer arrays and assemble the matrix in a single COO -> CSR step
+        src_idx, tgt_idx, edge_idx = await self._graph.get_edge_index_arrays()
+        if is_directed:
+            rows, cols = src_idx, edge_idx
+        else:
+            rows, cols = np.concatenate([src_idx, tgt_idx]), np.concatenate([edge_idx, edge_idx])
+        return csr_from_coo_arrays(rows, cols, shape=(self.node_num, self.edge_num))
 
     async def get_relationships_attrs(self, key):
         if self.edge_num == 0:
             return []
-        lists_of_attrs = []
-        for edge in await self.edges_data(False):
-            lists_of_attrs.append(edge[key])
-        return lists_of_attrs
+        return await self._graph.get_edge_attr_column(key)
 
     async def get_relationships_to_chunks_map(self, doc_chunk):
         raw_relationships_to_chunks = await self.get_relationships_attrs(key="source_id")
-        # Map Chunk IDs to indices
-
-        raw_relationships_to_chunks = [
-            [i for i in await doc_chunk.get_index_by_merge_key(chunk_ids) if i is not None]
+        # Split the merged chunk ids of every edge, then map all of them to chunk indices in one pass
+        chunk_ids_per_edge = [
+            [chunk_id.strip() for chunk_id in chunk_ids.split(GRAPH_FIELD_SEP) if chunk_id.strip()]
             for chunk_ids in raw_relationships_to_chunks
         ]
-        return csr_from_indices_list(
-            raw_relationships_to_chunks, shape=(len(raw_relationships_to_chunks), await doc_chunk.size)
+        counts = np.fromiter(map(len, chunk_ids_per_edge), dtype=np.int64, count=len(chunk_ids_per_edge))
+        chunk_idx = await doc_chunk.get_indices_by_keys(list(chain.from_iterable(chunk_ids_per_edge)))
+        rows = np.repeat(np.arange(len(chunk_ids_per_edge), dtype=np.int64), counts)
+        valid = chunk_idx >= 0
+        return csr_from_coo_arrays(
+            rows[valid], chunk_idx[valid], shape=(len(chunk_ids_per_edge), await doc_chunk.size), dtype=np.int64
         )
 
+    @staticmethod
+    def get_entity_chunk_count(entities_to_relationships, relationships_to_chunks):
+        """
+        Count the distinct chunks every entity is linked to through its relationships.
+
+        This is the node-specificity statistic of HippoRAG. The entity -> chunk product stays sparse, and only the
+        number of stored entries of each row is read, so the chunk x entity matrix is never densified.
+        """
+        entity_to_chunk = (entities_to_relationships @ relationships_to_chunks).tocsr()
+        entity_to_chunk.eliminate_zeros()
+        return np.diff(entity_to_chunk.indptr).astype(np.int64)
+
     async def get_edge_weight(self, src_id: str, tgt_id: str):
         return await self._graph.get_edge_weight(src_id, tgt_id)
 
@@ -419,25 +473,53 @@ class BaseGraph(ABC):
         return await self._graph.get_node_index(node_key)
 
     async def get_node_indices(self, node_keys):
-        return await asyncio.gather(
-            *[self.get_node_index(node_key) for node_key in node_keys]
-        )
+        return await self._graph.get_node_indices(node_keys)
 
-    async def personalized_pagerank(self, reset_prob_chunk, damping: float = 0.1):
-        pageranked_probabilities = []
-        igraph_ = ig.Graph.from_networkx(self._graph.graph)
-        igraph_.es['weight'] = [await self.get_edge_weight(edge[0], edge[1]) for edge in list(await self.edges())]
+    async def personalized_pagerank(self, reset_prob_chunk, damping: float = 0.1, implementation: str = "prpack"):
+        """
+        Run Personalized PageRank on the cached snapshot of the graph.
+
+        Args:
+            reset_prob_chunk: The reset vectors, one per run.
+            damping: The probability to follow an edge.
+            implementation: "prpack" (igraph) or "power_iteration" (NumPy power iteration on the CSR transition matrix).
+        Returns:
+            The PPR scores of the first reset vector.
+        """
+        pageranked_probabilities = await self.personalized_pagerank_batch(np.asarray(reset_prob_chunk), damping,
+                                                                          implementation)
+        return pageranked_probabilities[0]
+
+    async def personalized_pagerank_batch(self, reset_prob_matrix, damping: float = 0.1,
+                                          implementation: str = "power_iteration"):
+        """
+        Run Personalized PageRank for many reset vectors at once.
+
+        With the "power_iteration" implementation all the queries share one sparse matrix-matrix power iteration
+        over the cached CSR transition matrix, so the graph walk is paid once per iteration instead of once per query.
+
+        Args:
+            reset_prob_matrix: The reset matrix (Q, N), one row per query.
+            damping: The probability to follow an edge.
+            implementation: "power_iteration" (batched) or "prpack" (igraph, one run per row).
+        Returns:
+            np.ndarray: The PPR scores (Q, N), one row per query.
+        """
+        reset_prob_matrix = np.atleast_2d(np.asarray(reset_prob_matrix, dtype=np.float64))
+        if implementation == "power_iteration":
+            transition_t = self._graph.get_transition_matrix_snapshot()
+            return personalized_pagerank_power_iteration(transition_t, reset_prob_matrix.T, damping).T
 
-        for reset_prob in reset_prob_chunk:
+        igraph_ = self._graph.get_igraph_snapshot()
+        pageranked_probabilities = []
+        for reset_prob in reset_prob_matrix:
             pageranked_probs = igraph_.personalized_pagerank(vertices=range(self.node_num), damping=damping,
                                                              directed=False,
                                                              weights='weight', reset=reset_prob,
                                                              implementation='prpack')
 
             pageranked_probabilities.append(np.array(pageranked_probs))
-        pageranked_probabilities = np.array(pageranked_probabilities)
-
-        return pageranked_probabilities[0]
+        return np.array(pageranked_probabilities)
 
     async def get_neighbors(self, node_id: str):
         return await self._graph.neighbors(node_id)
@@ -15,22 +15,23 @@ from Core.Prompt import GraphPrompt
 from Core.Prompt.Base import TextPrompt
 from Core.Schema.EntityRelation import Entity, Relationship
 from Core.Common.Constants import (
+    LLM_PRIORITY_BULK,
     NODE_PATTERN,
     REL_PATTERN
 )
-from Core.Storage.NetworkXStorage import NetworkXStorage
+from Core.Storage.GraphStorageFactory import get_graph_storage
 
 
 class ERGraph(BaseGraph):
 
     def __init__(self, config, llm, encoder):
         super().__init__(config, llm, encoder)
-        self._graph = NetworkXStorage()
+        self._graph = get_graph_storage(config)
 
     async def _named_entity_recognition(self, passage: str):
         ner_messages = GraphPrompt.NER.format(user_input=passage)
 
-        entities = await self.llm.aask(ner_messages, format = "json")
+        entities = await self.llm.aask(ner_messages, format = "json", cache_namespace="ner", priority=LLM_PRIORITY_BULK)
     
         # entities = prase_json_from_response(response_content)
 
@@ -44,7 +45,7 @@ class ERGraph(BaseGraph):
         named_entity_json = {"named_entities": entities}
         openie_messages = GraphPrompt.OPENIE_POST_NET.format(passage=chunk,
                                                              named_entity_json=json.dumps(named_entity_json))
-        triples = await self.llm.aask(openie_messages, format = "json")
+        triples = await self.llm.aask(openie_messages, format = "json", cache_namespace="openie", priority=LLM_PRIORITY_BULK)
       
         # triples = prase_json_from_response(response_content)
         try:
@@ -76,14 +77,14 @@ class ERGraph(BaseGraph):
         )
 
         knowledge_graph_generation_msg = Message(role="Graphify", content=knowledge_graph_generation)
-        content = await self.llm.aask(knowledge_graph_generation_msg.content)
+        content = await self.llm.aask(knowledge_graph_generation_msg.content, cache_namespace="extraction",
+                                      priority=LLM_PRIORITY_BULK)
 
         return content
 
     async def _build_graph(self, chunk_list: List[Any]):
         try:
-            results = await asyncio.gather(
-                *[self._extract_entity_relationship(chunk) for chunk in chunk_list])
+            results = await self._extract_from_chunks(chunk_list)
             # Build graph based on the extracted entities and triples
             await self.__graph__(results)
         except Exception as e:
@@ -12,7 +12,7 @@ from collections import defaultdict
 from itertools import combinations
 import requests
 from Core.Common.Constants import GCUBE_TOKEN, GRAPH_FIELD_SEP
-from Core.Storage.NetworkXStorage import NetworkXStorage
+from Core.Storage.GraphStorageFactory import get_graph_storage
 
 from Core.Utils.WAT import WATAnnotation
 import pickle
@@ -36,7 +36,7 @@ class PassageGraph(BaseGraph):
         super().__init__(config, llm, encoder)
         self.k: int = 30
         self.k_nei: int = 3
-        self._graph = NetworkXStorage()
+        self._graph = get_graph_storage(config)
 
     @staticmethod
     async def _wat_entity_linking(text: str):
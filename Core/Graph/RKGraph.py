@@ -17,17 +17,18 @@ from Core.Common.Constants import (
     DEFAULT_RECORD_DELIMITER,
     DEFAULT_COMPLETION_DELIMITER,
     DEFAULT_TUPLE_DELIMITER,
-    DEFAULT_ENTITY_TYPES
+    DEFAULT_ENTITY_TYPES,
+    LLM_PRIORITY_BULK
 )
 from Core.Common.Memory import Memory
-from Core.Storage.NetworkXStorage import NetworkXStorage
+from Core.Storage.GraphStorageFactory import get_graph_storage
 
 
 class RKGraph(BaseGraph):
 
     def __init__(self, config, llm, encoder):
         super().__init__(config, llm, encoder)
-        self._graph = NetworkXStorage()
+        self._graph = get_graph_storage(config)
 
     @classmethod
     async def _handle_single_entity_extraction(self, record_attributes: list[str], chunk_key: str) -> Union[
@@ -56,8 +57,7 @@ class RKGraph(BaseGraph):
 
     async def _build_graph(self, chunk_list: List[Any]):
         try:
-            elements = await asyncio.gather(
-                *[self._extract_entity_relationship(chunk) for chunk in chunk_list])
+            elements = await self._extract_from_chunks(chunk_list)
             # Build graph based on the extracted entities and triples
             await self.__graph__(elements)
         except Exception as e:
@@ -79,13 +79,13 @@ class RKGraph(BaseGraph):
         working_memory = Memory()
 
         working_memory.add(Message(content=prompt, role="user"))
-        final_result = await self.llm.aask(prompt)
+        final_result = await self.llm.aask(prompt, cache_namespace="extraction", priority=LLM_PRIORITY_BULK)
         working_memory.add(Message(content=final_result, role="assistant"))
 
         for glean_idx in range(self.config.max_gleaning):
             working_memory.add(Message(content=GraphPrompt.ENTITY_CONTINUE_EXTRACTION, role="user"))
             context = "\n".join(f"{msg.sent_from}: {msg.content}" for msg in working_memory.get())
-            glean_result = await self.llm.aask(context)
+            glean_result = await self.llm.aask(context, cache_namespace="extraction", priority=LLM_PRIORITY_BULK)
             working_memory.add(Message(content=glean_result, role="assistant"))
             final_result += glean_result
 
@@ -94,7 +94,7 @@ class RKGraph(BaseGraph):
 
             working_memory.add(Message(content=GraphPrompt.ENTITY_IF_LOOP_EXTRACTION, role="user"))
             context = "\n".join(f"{msg.sent_from}: {msg.content}" for msg in working_memory.get())
-            if_loop_result = await self.llm.aask(context)
+            if_loop_result = await self.llm.aask(context, cache_namespace="extraction", priority=LLM_PRIORITY_BULK)
             if if_loop_result.strip().strip('"').strip("'").lower() != "yes":
                 break
         working_memory.clear()
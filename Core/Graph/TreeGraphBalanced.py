@@ -1,6 +1,7 @@
 from Core.Graph.BaseGraph import BaseGraph
 from Core.Schema.ChunkSchema import TextChunk
 from Core.Common.Logger import logger
+from Core.Common.Constants import LLM_PRIORITY_BULK
 from Core.Index.EmbeddingFactory import get_rag_embedding
 from Core.Prompt.RaptorPrompt import SUMMARIZE
 from Core.Storage.TreeGraphStorage import TreeGraphStorage
@@ -161,7 +162,7 @@ class TreeGraphBalanced(BaseGraph):
         # Give a summarization from a cluster of nodes
         node_texts = f"\n\n".join([' '.join(node.text.splitlines()) for node in node_list])
         content = SUMMARIZE.format(context=node_texts)
-        return await self.llm.aask(content, max_tokens=summarization_length)
+        return await self.llm.aask(content, max_tokens=summarization_length, priority=LLM_PRIORITY_BULK)
 
     async def _batch_embed_and_assign(self, layer):
         current_layer = self._graph.get_layer(layer)
@@ -0,0 +1,220 @@
+from collections import defaultdict
+from itertools import islice
+from typing import Iterable, Optional
+
+import numpy as np
+
+from Core.Common.Logger import logger
+from Core.Common.Utils import clean_str, build_data_for_merge, mdhash_id
+from Core.Storage.GraphTensorStorage import StringPool
+from Core.Utils.MergeER import MergeEntity, MergeRelationship
+
+
+class TripleBulkLoader:
+    """
+    Streaming bulk ingestion of (source, relation, target, time) triples into a graph.
+
+    Builds the same graph as grouping the triples chunk by chunk with `_build_graph_from_tuples_withtime` and merging
+    them with `__graph__`, without one coroutine and one merge per node and edge:
+
+    * the triples are consumed from any iterable (e.g., a generator over a TSV file) in batches of `batch_size`;
+    * every `chunk_size` triples form one manual chunk `manual_input_<i>`, registered into the DocChunk;
+    * names are cleaned once per distinct string and interned, so a batch becomes a few integer columns, which are
+      de-duplicated with NumPy before being kept, bounding the memory to the distinct (edge, attribute) pairs;
+    * the merged nodes and edges are finally written with one bulk upsert into the graph storage.
+
+    An entity only gets the chunks of the triples it appears in as `source_id`. The nodes and edges already in the
+    graph are merged with the new triples, whose chunks are numbered from `first_chunk` on. The chunks whose content
+    is already stored in the DocChunk are skipped, so that loading the same triples again leaves the graph unchanged.
+    """
+
+    def __init__(self, graph, doc_chunk=None, chunk_size: int = 100, batch_size: int = 1_000_000,
+                 first_chunk: int = 0):
+        self.graph = graph
+        self.doc_chunk = doc_chunk
+        self.chunk_size = chunk_size
+        # Batches hold whole chunks only
+        self.batch_size = max(batch_size // chunk_size, 1) * chunk_size
+        self._clean_cache: dict[str, str] = {}
+        self._entities = StringPool()
+        self._relations = StringPool()  # "{relation} on {time}"
+        self._keywords = StringPool()  # "{time}"
+        # De-duplicated integer tables, the edge being encoded as `lo << 32 | hi` with lo / hi the sorted entity ids
+        self._edge_counts: list[np.ndarray] = []
+        self._edge_relations: list[np.ndarray] = []
+        self._edge_keywords: list[np.ndarray] = []
+        self._edge_chunks: list[np.ndarray] = []
+        self._entity_chunks: list[np.ndarray] = []
+        self._num_chunks = first_chunk
+        self._num_skipped = 0
+        self._stored_chunks: set[str] = set()  # Content hashes of the manual chunks already in the DocChunk
+        self._num_stored = 0
+
+    @staticmethod
+    def chunk_key(chunk_idx: int) -> str:
+        return f"manual_input_{chunk_idx}"
+
+    async def load(self, triples: Iterable, entities: Optional[Iterable[str]] = None):
+        """
+        Ingest the triples, then the entities that do not appear in any triple.
+
+        Args:
+            triples: (source entity, relation, target entity, time) tuples.
+            entities: Optional entity names, only needed for entities without any triple.
+        """
+        if self.doc_chunk is not None:
+            self._stored_chunks = {mdhash_id(chunk.content) for key, chunk in await self.doc_chunk.get_chunks()
+                                   if key.startswith("manual_input_")}
+        triples = iter(triples)
+        num_triples = 0
+        while True:
+            batch = list(islice(triples, self.batch_size))
+            if not batch:
+                break
+            await self._add_batch(batch)
+            num_triples += len(batch)
+            logger.info(f"Grouped {num_triples} triples into {len(self._entities)} entities")
+        if self._num_skipped:
+            logger.warning(f"Skipped {self._num_skipped} invalid triples (wrong length or empty entity / relation)")
+        if self._num_stored:
+            logger.info(f"Skipped {self._num_stored} chunks of triples already loaded")
+        if entities is not None:
+            self._entities.intern(name for name in map(self._clean, entities) if name != "")
+
+        await self._upsert_nodes()
+        await self._upsert_edges()
+        if self.doc_chunk is not None:
+            await self.doc_chunk.persist()
+        logger.info(f"✅ Bulk loaded {num_triples} triples: {self.graph.node_num} nodes, {self.graph.edge_num} edges")
+
+    def _clean(self, value) -> str:
+        cleaned = self._clean_cache.get(value)
+        if cleaned is None:
+            cleaned = self._clean_cache[value] = clean_str(value)
+        return cleaned
+
+    async def _add_batch(self, batch: list):
+        contents = ["\n".join("\t".join(map(str, triple)) for triple in batch[offset:offset + self.chunk_size])
+                    for offset in range(0, len(batch), self.chunk_size)]
+        # Drop the chunks already loaded. Only the last chunk of the last batch may be partial, so the kept chunks stay
+        # aligned on `chunk_size`
+        kept = [idx for idx, content in enumerate(contents) if mdhash_id(content) not in self._stored_chunks]
+        if len(kept) < len(contents):
+            self._num_stored += len(contents) - len(kept)
+            batch = [triple for idx in kept for triple in batch[idx * self.chunk_size:(idx + 1) * self.chunk_size]]
+            contents = [contents[idx] for idx in kept]
+            if not batch:
+                return
+
+        first_chunk = self._num_chunks
+        self._num_chunks += len(contents)
+        if self.doc_chunk is not None:
+            await self.doc_chunk.add_manual_chunks([
+                {"chunk_id": self.chunk_key(first_chunk + idx), "content": content, "doc_id": "", "title": ""}
+                for idx, content in enumerate(contents)
+            ], persist=False)
+
+        sources, targets, relations, keywords, chunks = [], [], [], [], []
+        for position, triple in enumerate(batch):
+            if isinstance(triple[0], list):
+                triple = triple[0]
+            if len(triple) != 4:
+                self._num_skipped += 1
+                continue
+            source, relation, target, time = map(self._clean, triple)
+            if source == "" or target == "" or relation == "":
+                self._num_skipped += 1
+                continue
+            # Edges are keyed by the sorted pair of names, as in `__graph__`
+            if source > target:
+                source, target = target, source
+            sources.append(source)
+            targets.append(target)
+            relations.append(f"{relation} on {time}")
+            keywords.append(time)
+            chunks.append(first_chunk + position // self.chunk_size)
+        if not sources:
+            return
+
+        source_ids = self._entities.intern(sources)
+        target_ids = self._entities.intern(targets)
+        edge_keys = (source_ids << 32) | target_ids
+        chunk_ids = np.asarray(chunks, dtype=np.int64)
+
+        keys, counts = np.unique(edge_keys, return_counts=True)
+        self._edge_counts.append(np.column_stack([keys, counts]))
+        self._edge_relations.append(np.unique(np.column_stack([edge_keys, self._relations.intern(relations)]), axis=0))
+        self._edge_keywords.append(np.unique(np.column_stack([edge_keys, self._keywords.intern(keywords)]), axis=0))
+        self._edge_chunks.append(np.unique(np.column_stack([edge_keys, chunk_ids]), axis=0))
+        self._entity_chunks.append(np.unique(np.column_stack([np.concatenate([source_ids, target_ids]),
+                                                              np.concatenate([chunk_ids, chunk_ids])]), axis=0))
+
+    @staticmethod
+    def _group(tables: list[np.ndarray], keys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Merge the (key, value) tables, returning the values and the [start, end) range of every key."""
+        if not tables:
+            empty = np.zeros(len(keys), dtype=np.int64)
+            return np.empty(0, dtype=np.int64), empty, empty
+        table = np.unique(np.concatenate(tables), axis=0)
+        return (table[:, 1], np.searchsorted(table[:, 0], keys, side="left"),
+                np.searchsorted(table[:, 0], keys, side="right"))
+
+    async def _upsert_nodes(self):
+        config, storage = self.graph.config, self.graph._graph
+        names = self._entities.tolist()
+        chunks, starts, ends = self._group(self._entity_chunks, np.arange(len(names)))
+        self._entity_chunks = []
+        chunk_keys = [self.chunk_key(idx) for idx in chunks.tolist()]
+
+        nodes = []
+        for entity_name, start, end in zip(names, starts.tolist(), ends.tolist()):
+            existing = await storage.get_node(entity_name) if await storage.has_node(entity_name) else None
+            existing = defaultdict(list, build_data_for_merge(existing) if existing else {})
+            source_id = MergeEntity.merge_source_ids(existing["source_id"], chunk_keys[start:end])
+            entity_type = MergeEntity.merge_types(existing["entity_type"], [""]) if config.enable_entity_type else ""
+            description = (MergeEntity.merge_descriptions(existing["description"], [""])
+                           if config.enable_entity_description else "")
+            if description:
+                description = await self.graph._handle_entity_relation_summary(entity_name, description)
+            nodes.append((entity_name, dict(source_id=source_id, entity_name=entity_name, entity_type=entity_type,
+                                            description=description)))
+        await storage.upsert_nodes(nodes)
+
+    async def _upsert_edges(self):
+        config, storage = self.graph.config, self.graph._graph
+        names = self._entities.tolist()
+        counts = np.concatenate(self._edge_counts) if self._edge_counts else np.empty((0, 2), dtype=np.int64)
+        keys, inverse = np.unique(counts[:, 0], return_inverse=True)
+        weights = np.bincount(inverse, weights=counts[:, 1], minlength=len(keys))
+        relations, relation_starts, relation_ends = self._group(self._edge_relations, keys)
+        keywords, keyword_starts, keyword_ends = self._group(self._edge_keywords, keys)
+        chunks, chunk_starts, chunk_ends = self._group(self._edge_chunks, keys)
+        self._edge_counts = self._edge_relations = self._edge_keywords = self._edge_chunks = []
+
+        relation_names = np.array(self._relations.tolist(), dtype=object)[relations]
+        keyword_names = np.array(self._keywords.tolist(), dtype=object)[keywords]
+        chunk_keys = [self.chunk_key(idx) for idx in chunks.tolist()]
+
+        edges = []
+        for idx, (key, weight) in enumerate(zip(keys.tolist(), weights.tolist())):
+            src_id, tgt_id = names[key >> 32], names[key & 0xFFFFFFFF]
+            existing = await storage.get_edge(src_id, tgt_id) if await storage.has_edge(src_id, tgt_id) else None
+            existing = defaultdict(list, build_data_for_merge(existing) if existing else {})
+
+            source_id = MergeRelationship.merge_source_ids(existing["source_id"],
+                                                           chunk_keys[chunk_starts[idx]:chunk_ends[idx]])
+            total_weight = MergeRelationship.merge_weight(existing["weight"], [weight])
+            description = (MergeRelationship.merge_descriptions(existing["description"], [""])
+                           if config.enable_edge_description else "")
+            if description:
+                description = await self.graph._handle_entity_relation_summary((src_id, tgt_id), description)
+            edge_keywords = (MergeRelationship.merge_keywords(
+                existing["keywords"], keyword_names[keyword_starts[idx]:keyword_ends[idx]].tolist())
+                             if config.enable_edge_keywords else "")
+            relation_name = (MergeRelationship.merge_relation_name(
+                existing["relation_name"], relation_names[relation_starts[idx]:relation_ends[idx]].tolist())
+                             if config.enable_edge_name else "")
+            edges.append((src_id, tgt_id, dict(weight=total_weight, source_id=source_id, relation_name=relation_name,
+                                               keywords=edge_keywords, description=description, src_id=src_id,
+                                               tgt_id=tgt_id)))
+        await storage.upsert_edges(edges)
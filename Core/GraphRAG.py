@@ -2,17 +2,22 @@ from typing import Union, Any
 from pyfiglet import Figlet
 from Core.Chunk.DocChunk import DocChunk
 from Core.Common.Logger import logger
-import tiktoken
 from pydantic import BaseModel, model_validator
 from Core.Common.ContextMixin import ContextMixin
 from Core.Schema.RetrieverContext import RetrieverContext
 from Core.Common.TimeStatistic import TimeStatistic
 from Core.Graph import get_graph
+from Core.Graph.TripleBulkLoader import TripleBulkLoader
 from Core.Index import get_index, get_index_config
+from Core.Index.BM25Index import BM25Index
+from Core.Index.TFIDFStore import TFIDFIndex
 from Core.Query import get_query
 from Core.Storage.NameSpace import Workspace
 from Core.Community.ClusterFactory import get_community
 from Core.Storage.PickleBlobStorage import PickleBlobStorage
+from Core.Storage.GraphTensorStorage import GraphTensorStorage
+from Core.Utils.ByteTokenizer import encoding_for_model, use_offline_encoding
+from Config.LLMConfig import LLMType
 from colorama import Fore, Style, init
 
 
@@ -66,7 +71,10 @@ class GraphRAG(ContextMixin, BaseModel):
     @model_validator(mode="after")
     def _update_context(cls, data):
         # cls.config = data.config
-        cls.ENCODER = tiktoken.encoding_for_model(data.config.token_model)
+        # The fake LLM runs offline, so the tokens are counted without downloading a tiktoken encoding
+        if data.config.llm.api_type == LLMType.FAKE:
+            use_offline_encoding()
+        cls.ENCODER = encoding_for_model(data.config.token_model)
         cls.workspace = Workspace(data.config.working_dir, data.config.index_name)  # register workspace
         cls.graph = get_graph(data.config, llm=data.llm, encoder=cls.ENCODER)  # register graph
         cls.doc_chunk = DocChunk(data.config.chunk, cls.ENCODER, data.workspace.make_for("chunk_storage"))
@@ -76,6 +84,9 @@ class GraphRAG(ContextMixin, BaseModel):
         data = cls._register_vdbs(data)
         data = cls._register_community(data)
         data = cls._register_e2r_r2c_matrix(data)
+        data = cls._register_graph_tensors(data)
+        data = cls._register_entities_tfidf(data)
+        data = cls._register_bm25(data)
         data = cls._register_retriever_context(data)
         return data
 
@@ -93,6 +104,14 @@ class GraphRAG(ContextMixin, BaseModel):
         if data.config.use_entity_link_chunk:
             data.e2r_namespace = data.workspace.make_for("map_e2r")
             data.r2c_namespace = data.workspace.make_for("map_r2c")
+            data.entity_chunk_count_namespace = data.workspace.make_for("map_entity_chunk_count")
+        if data.config.retriever.query_type == "gr":
+            data.graph_tensors_namespace = data.workspace.make_for("graph_tensors")
+        if data.config.use_bm25:
+            data.chunks_bm25_namespace = data.workspace.make_for("chunks_bm25")
+            data.entities_bm25_namespace = data.workspace.make_for("entities_bm25")
+        if data.config.retriever.query_type == "kgp":
+            data.entities_tfidf_namespace = data.workspace.make_for("entities_tfidf")
 
    
         return data
@@ -138,6 +157,33 @@ class GraphRAG(ContextMixin, BaseModel):
             cls.relationships_to_chunks = PickleBlobStorage(
                 namespace=data.r2c_namespace, config=None
             )
+            # Number of chunks linked to every entity, used as the node specificity of the PPR reset vector
+            cls.entity_chunk_count = PickleBlobStorage(
+                namespace=data.entity_chunk_count_namespace, config=None
+            )
+        return data
+
+    @classmethod
+    def _register_graph_tensors(cls, data):
+        # The (src, relation, dst) integer export of the graph used by the PCST retrieval of G-Retriever
+        if data.config.retriever.query_type == "gr":
+            cls.graph_tensors = GraphTensorStorage(namespace=data.graph_tensors_namespace, config=None)
+        return data
+
+    @classmethod
+    def _register_entities_tfidf(cls, data):
+        # The TF-IDF index of the entity descriptions used by the `tf_df` retrieval of KGP
+        if data.config.retriever.query_type == "kgp":
+            cls.entities_tfidf = TFIDFIndex(namespace=data.entities_tfidf_namespace)
+        return data
+
+    @classmethod
+    def _register_bm25(cls, data):
+        # The lexical indexes of the chunks and of the entity descriptions, used by the `bm25` / `hybrid` retrievals
+        if data.config.use_bm25:
+            bm25_params = dict(k1=data.config.retriever.bm25_k1, b=data.config.retriever.bm25_b)
+            cls.chunks_bm25 = BM25Index(namespace=data.chunks_bm25_namespace, **bm25_params)
+            cls.entities_bm25 = BM25Index(namespace=data.entities_bm25_namespace, **bm25_params)
         return data
 
     @classmethod
@@ -162,6 +208,11 @@ class GraphRAG(ContextMixin, BaseModel):
             "community": data.config.graph.use_community,
             "relationships_to_chunks": data.config.use_entity_link_chunk,
             "entities_to_relationships": data.config.use_entity_link_chunk,
+            "entity_chunk_count": data.config.use_entity_link_chunk,
+            "graph_tensors": data.config.retriever.query_type == "gr",
+            "entities_tfidf": data.config.retriever.query_type == "kgp",
+            "chunks_bm25": data.config.use_bm25,
+            "entities_bm25": data.config.use_bm25,
         }
         return data
 
@@ -191,18 +242,66 @@ class GraphRAG(ContextMixin, BaseModel):
     async def build_e2r_r2c_maps(self, force = False):
         # await self._build_ppr_context()
         logger.info("Starting build two maps: 1️⃣ entity <-> relationship; 2️⃣ relationship <-> chunks ")
+        rebuilt = False
         if not await self.entities_to_relationships.load(force):
             await self.entities_to_relationships.set(await self.graph.get_entities_to_relationships_map(False))
             await self.entities_to_relationships.persist()
+            rebuilt = True
         if not await self.relationships_to_chunks.load(force):
             await self.relationships_to_chunks.set(await self.graph.get_relationships_to_chunks_map(self.doc_chunk))
             await self.relationships_to_chunks.persist()
+            rebuilt = True
+        # The entity-chunk count is derived from the two maps, so it is rebuilt whenever one of them is
+        if not await self.entity_chunk_count.load(force or rebuilt):
+            await self.entity_chunk_count.set(self.graph.get_entity_chunk_count(
+                await self.entities_to_relationships.get(), await self.relationships_to_chunks.get()))
+            await self.entity_chunk_count.persist()
         logger.info("✅ Finished building the two maps ")
 
+    async def build_graph_tensors(self, force=False):
+        # Load the persisted export, then only append what the graph gained since it was written
+        if force:
+            self.graph_tensors.clear()
+        elif self.graph_tensors.num_nodes == 0:
+            await self.graph_tensors.load()
+        if await self.graph_tensors.update(self.graph):
+            await self.graph_tensors.persist()
+
+    async def build_entities_tfidf(self, force=False):
+        # Load the persisted index, then only re-tokenize the entities whose description changed since it was written
+        if force:
+            self.entities_tfidf.clear()
+        elif self.entities_tfidf.num_docs == 0:
+            await self.entities_tfidf.load()
+        entity_names, descriptions = await self._entity_descriptions()
+        if await self.entities_tfidf.update(entity_names, descriptions):
+            await self.entities_tfidf.persist()
+
+    async def build_bm25_indexes(self, force=False):
+        # Load the persisted indexes, then only re-tokenize the chunks and descriptions added or changed since
+        chunks = await self.doc_chunk.get_chunks()
+        entity_names, descriptions = await self._entity_descriptions()
+        for index, keys, docs in [(self.chunks_bm25, [key for key, _ in chunks], [chunk.content for _, chunk in chunks]),
+                                  (self.entities_bm25, entity_names, descriptions)]:
+            if force:
+                index.clear()
+            elif index.num_docs == 0:
+                await index.load()
+            if await index.update(keys, docs):
+                await index.persist()
+
+    async def _entity_descriptions(self):
+        entity_names = list(await self.graph.get_nodes())
+        return entity_names, [(await self.graph.get_node(name))["description"] for name in entity_names]
+
 
     def _update_costs_info(self, stage_str:str):
         last_cost = self.llm.get_last_stage_cost()
         logger.info(f"{stage_str} stage cost: Total prompt token: {last_cost.total_prompt_tokens}, Total completeion token: {last_cost.total_completion_tokens}, Total cost: {last_cost.total_cost}")
+        if last_cost.cache_hits or last_cost.cache_misses:
+            logger.info(f"{stage_str} LLM response cache: {last_cost.cache_hits} hits, {last_cost.cache_misses} misses")
+        if last_cost.coalesced_calls:
+            logger.info(f"{stage_str} coalesced LLM calls: {last_cost.coalesced_calls}")
         last_stage_time = self.time_manager.stop_last_stage()
         logger.info(f"{stage_str} time(s): {last_stage_time:.2f}")
 
@@ -213,8 +312,8 @@ class GraphRAG(ContextMixin, BaseModel):
 
         Args:
             docs (Union[str, list[Any]]): Corpus to process if entities/triples are not provided.
-            entities (List[str], optional): Pre-extracted entity list.
-            triples (List[Tuple[str, str, str, str]], optional): Pre-extracted triples list.
+            entities (List[str], optional): Pre-extracted entity list, only needed for entities without any triple.
+            triples (Iterable[Tuple[str, str, str, str]], optional): Pre-extracted triples, a list or a generator.
         """
 
         # Case 1: Use corpus docs → chunking → build graph
@@ -229,50 +328,27 @@ class GraphRAG(ContextMixin, BaseModel):
             self._update_costs_info("Build Graph")
 
         # Case 2: Use directly provided entities & triples
-        elif entities is not None and triples is not None:
+        elif triples is not None:
             self.time_manager.start_stage()
             chunk_size_for_triples = 100
-            # 如果未指定分块，沿用旧路径
-            if not chunk_size_for_triples or chunk_size_for_triples <= 0:
-                chunk_key = "manual_input"
-                maybe_nodes, maybe_edges = await self.graph._build_graph_from_tuples_withtime(
-                    entities, triples, chunk_key
-                )
-                await self.graph.__graph__([(maybe_nodes, maybe_edges)])
-            else:
-                # 新路径：按 chunk_size_for_triples 分块，并在 DocChunk 中注册对应 chunk
-                chunked_elements = []
-                manual_chunks = []
-                total = len(triples)
-                for i in range(0, total, chunk_size_for_triples):
-                    batch_triples = triples[i:i+chunk_size_for_triples]
-                    chunk_key = f"manual_input_{i//chunk_size_for_triples}"
-                    if i // chunk_size_for_triples % 500 == 0:
-                        print("Chunk id:", chunk_key)
-                    # 注册 chunk 内容可简单拼接为多行文本，保留可溯源性
-                    content_lines = ["\t".join(map(str, t)) for t in batch_triples]
-                    manual_chunks.append({
-                        "chunk_id": chunk_key,
-                        "content": "\n".join(content_lines),
-                        "doc_id": "",
-                        "title": "",
-                    })
-                    m_nodes, m_edges = await self.graph._build_graph_from_tuples_withtime(
-                        entities, batch_triples, chunk_key
-                    )
-                    chunked_elements.append((m_nodes, m_edges))
-                print("Chunk id:", chunk_key)
-                # 先注册所有 chunk 再统一构图
-                await self.doc_chunk.add_manual_chunks(manual_chunks)
-                await self.graph.__graph__(chunked_elements)
+            # Stream the triples into the graph: every `chunk_size_for_triples` triples are registered as one chunk
+            # in DocChunk (to keep the traceability), and the nodes / edges are grouped and bulk inserted.
+            # The triples are added to the stored graph and chunks, if any: the vector indexes below then only embed
+            # the nodes and edges created or changed by this insert. The chunks of triples already stored are skipped,
+            # so that inserting the same triples again does not count them twice
+            if self.graph.node_num == 0:
+                await self.graph._load_graph(self.config.graph.force)
+            if await self.doc_chunk.size == 0:
+                await self.doc_chunk._load_chunk(self.config.graph.force)
+            loader = TripleBulkLoader(self.graph, self.doc_chunk, chunk_size=chunk_size_for_triples,
+                                      first_chunk=await self.doc_chunk.size)
+            await loader.load(triples, entities)
 
             await self.graph._graph.persist(force=True)
-            print("Graph saved at:", self.graph._graph.graphml_xml_file)
-            print("GraphML path:", self.graph._graph.graphml_xml_file)
-            print("Node count:", self.graph._graph.graph.number_of_nodes())
-            print("Edge count:", self.graph._graph.graph.number_of_edges())
-            # print("Edges with data:", list(self.graph._graph.graph.edges()))
-            print("Edges with data:", list(self.graph._graph.graph.edges(data=True))[0])
+            print("Graph saved at:", self.graph._graph.graph_file)
+            print("Node count:", self.graph.node_num)
+            print("Edge count:", self.graph.edge_num)
+            print("Edges with data:", await self.graph.get_edge_by_index(0) if self.graph.edge_num else None)
             self._update_costs_info("Build Graph from Tuples")
 
         else:
@@ -293,10 +369,11 @@ class GraphRAG(ContextMixin, BaseModel):
 
         if self.config.use_relations_vdb:
             edge_metadata = await self.graph.edge_metadata()
+            # Only the relation index is skipped: the indexes below, and the retriever context, are still built
             if not edge_metadata:
                 logger.warning("No edge metadata found. Skipping relation indexing.")
-                return
-            await self.relations_vdb.build_index(await self.graph.edges_data(), edge_metadata, force=False)
+            else:
+                await self.relations_vdb.build_index(await self.graph.edges_data(), edge_metadata, force=False)
 
         if self.config.use_subgraphs_vdb:
             subgraph_metadata = await self.graph.subgraph_metadata()
@@ -313,6 +390,15 @@ class GraphRAG(ContextMixin, BaseModel):
             )
             await self.community.generate_community_report(self.graph, False)
 
+        if self.config.retriever.query_type == "gr":
+            await self.build_graph_tensors(self.config.graph.force)
+
+        if self.config.retriever.query_type == "kgp":
+            await self.build_entities_tfidf(self.config.graph.force)
+
+        if self.config.use_bm25:
+            await self.build_bm25_indexes(self.config.graph.force)
+
         self._update_costs_info("Index Building")
 
         await self._build_retriever_context()
@@ -330,3 +416,13 @@ class GraphRAG(ContextMixin, BaseModel):
         response = await self._querier.query(query)
 
         return response
+
+    async def query_batch(self, queries: list[str]) -> list:
+        """
+            Answer many queries, e.g., a whole evaluation set; the PPR queries batch their retrieval.
+            Args:
+                queries: The queries to be processed.
+            Returns:
+                The responses, in the order of the queries.
+        """
+        return await self._querier.query_batch(queries)
@@ -0,0 +1,35 @@
+import numpy as np
+from scipy import sparse
+
+from Core.Index.LexicalIndex import LexicalIndex
+
+
+class BM25Index(LexicalIndex):
+    """
+    Okapi BM25 index of keyed documents, e.g., the text chunks or the descriptions of the graph entities.
+
+    The BM25 weight of every (term, document) pair, `idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))` with
+    the non-negative Lucene idf `ln(1 + (N - df + 0.5) / (df + 0.5))`, is pre-computed into the posting lists, so that
+    the score of a document is the sum of the weights of the query terms, counted with their multiplicity.
+    """
+    NAME = "bm25"
+
+    def __init__(self, namespace=None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        super().__init__(namespace)
+
+    def _refit(self):
+        num_docs, counts = self._counts.shape[0], self._counts
+        df = self._document_frequencies()
+        self.idf = np.where(df > 0, np.log(1 + (num_docs - df + 0.5) / (df + 0.5)), 0.0)
+        doc_lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if num_docs and doc_lengths.mean() > 0 else 1.0
+        # Length normalization of the row of every stored count
+        norms = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+        row_norms = np.repeat(norms, np.diff(counts.indptr))
+        weights = self.idf[counts.indices] * counts.data * (self.k1 + 1) / (counts.data + row_norms)
+        self.postings = sparse.csr_matrix((weights, counts.indices, counts.indptr), shape=counts.shape).T.tocsr()
+
+    def _query_vectors(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        return counts
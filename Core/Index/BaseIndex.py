@@ -1,9 +1,32 @@
+import asyncio
+import json
 import os
 from abc import ABC, abstractmethod
-from Core.Common.Utils import clean_storage
+from typing import Optional, Union
+
+import numpy as np
+
+from Core.Common.Utils import clean_storage, mdhash_id
 from Core.Common.Logger import logger
 from Core.Schema.VdbResult import * 
 
+
+def element_key(key: Union[str, tuple, list]) -> str:
+    """
+    The key of an indexed element, from its metadata values: an entity name, or the (src_id, tgt_id) of a relation.
+    """
+    values = [key] if isinstance(key, str) else key
+    return json.dumps([str(value) for value in values], ensure_ascii=False)
+
+
+def element_keys(elements: list[dict], meta_data: list) -> list[str]:
+    return [element_key([data.get(key, "") for key in meta_data]) for data in elements]
+
+
+def content_hash(data: dict) -> str:
+    return mdhash_id(data["content"])
+
+
 class BaseIndex(ABC):
     def __init__(self, config):
         self.config = config
@@ -19,8 +42,11 @@ class BaseIndex(ABC):
         else:
         
             self._index = self._get_index()
+        if from_load:
+            # Note: When you successfully load the index from a file, you don't need to rebuild it, only to apply
+            # the changes of the elements since it was stored.
+            from_load = await self.sync_index(elements, meta_data)
         if not from_load:
-            # Note: When you successfully load the index from a file, you don't need to rebuild it.
             await self.clean_index()
             logger.info("Building index for input elements")
             await self._update_index(elements, meta_data)
@@ -28,6 +54,53 @@ class BaseIndex(ABC):
             logger.info("Index successfully built and stored.")
         logger.info("✅ Finished starting insert entities of the given graph into vector database")
 
+    async def sync_index(self, elements, meta_data) -> bool:
+        """
+        Bring a loaded index up to date with the elements: only the new elements and those whose content changed are
+        embedded, and the elements that are gone are deleted.
+
+        Returns:
+            bool: False if the index has to be re-built instead, i.e., it cannot be updated in place.
+        """
+        indexed_hashes = self._indexed_hashes(meta_data)
+        if indexed_hashes is None:
+            # The index does not track its elements, keep it as loaded
+            return True
+        keys = element_keys(elements, meta_data)
+        changed = [data for key, data in zip(keys, elements) if indexed_hashes.get(key) != content_hash(data)]
+        removed = list(indexed_hashes.keys() - set(keys))
+        if not changed and not removed:
+            logger.info("The loaded index is up to date")
+            return True
+        try:
+            await self._delete_keys(removed)
+            await self.upsert(changed, meta_data)
+        except NotImplementedError:
+            logger.info(f"{len(changed)} new / changed and {len(removed)} removed elements, re-building the index")
+            return False
+        self._storage_index()
+        logger.info(f"Index updated in place: {len(changed)} new / changed and {len(removed)} removed elements")
+        return True
+
+    def _indexed_hashes(self, meta_data) -> Optional[dict[str, str]]:
+        """The element key -> content hash of the indexed elements, None if the index does not track them."""
+        return None
+
+    async def upsert(self, elements, meta_data):
+        """Embed and insert the elements, replacing the indexed elements with the same key (see `element_key`)."""
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental updates")
+
+    async def delete(self, keys):
+        """Delete the elements of the given entity names / (src_id, tgt_id) pairs."""
+        await self._delete_keys([element_key(key) for key in keys])
+
+    async def _delete_keys(self, keys: list[str]):
+        if keys:
+            raise NotImplementedError(f"{type(self).__name__} does not support incremental updates")
+
+    def persist(self):
+        self._storage_index()
+
     def exist_index(self):
         return os.path.exists(self.config.persist_path)
 
@@ -78,5 +151,54 @@ class BaseIndex(ABC):
         pass
 
 
+    async def retrieval_nodes_batch(self, queries, top_k, graph, need_score=False, tree_node=False):
+        """
+        The `retrieval_nodes` result of every query, in order.
+
+        This default issues one search per query; indexes with a native batched search override it.
+        """
+        return await asyncio.gather(
+            *[self.retrieval_nodes(query, top_k, graph, need_score=need_score, tree_node=tree_node) for query in queries])
+
+    async def retrieval_edges_batch(self, queries, top_k, graph, need_score=False):
+        """The `retrieval_edges` result of every query, in order."""
+        return await asyncio.gather(
+            *[self.retrieval_edges(query, top_k, graph, need_score=need_score) for query in queries])
+
+    async def retrieval_nodes_with_score_matrices(self, query_lists, top_k, graph):
+        """
+        The entity weights of several query lists with a single batched retrieval.
+
+        Row i holds, for every entity of the graph, its highest score over the queries of `query_lists[i]`,
+        normalized to sum to one.
+
+        Returns:
+            np.ndarray: The (len(query_lists), #all_entities) weights.
+        """
+        queries = [query for query_list in query_lists for query in query_list]
+        group_ids = np.repeat(np.arange(len(query_lists)), [len(query_list) for query_list in query_lists])
+        results = await self.retrieval_nodes_batch(queries, top_k, graph, need_score=True) if queries else []
+
+        rows, entity_names, scores = [], [], []
+        for group_id, (nodes, node_scores) in zip(group_ids.tolist(), results):
+            for entity, score in zip(nodes, node_scores):
+                if entity is not None:
+                    rows.append(group_id)
+                    entity_names.append(entity["entity_name"])
+                    scores.append(score)
+        entity_indices = await graph.get_node_indices(entity_names)
+        is_known = entity_indices >= 0
+        all_entity_weights = np.zeros((len(query_lists), graph.node_num))
+        # An entity retrieved by several queries of a list keeps its highest score
+        np.maximum.at(all_entity_weights, (np.asarray(rows, dtype=np.int64)[is_known], entity_indices[is_known]),
+                      np.asarray(scores, dtype=np.float64)[is_known])
+
+        # Normalize the scores
+        weight_sums = all_entity_weights.sum(axis=1, keepdims=True)
+        np.divide(all_entity_weights, weight_sums, out=all_entity_weights, where=weight_sums > 0)
+        return all_entity_weights
+
     async def retrieval_nodes_with_score_matrix(self, query_list, top_k, graph):
-        pass
\ No newline at end of file
+        if isinstance(query_list, str):
+            query_list = [query_list]
+        return (await self.retrieval_nodes_with_score_matrices([query_list], top_k, graph))[0]
\ No newline at end of file
@@ -6,10 +6,16 @@ from colbert.infra import ColBERTConfig, Run, RunConfig
 from pathlib import Path
 
 from Core.Common.Logger import logger
+import asyncio
+import json
 import os
-from typing import Any
+from collections import OrderedDict
+import torch
 from colbert.data import Queries
-from Core.Index.BaseIndex import BaseIndex, ColbertNodeResult, ColbertEdgeResult
+from Core.Index.BaseIndex import BaseIndex, ColbertNodeResult, ColbertEdgeResult, content_hash, element_keys
+
+# Encoded query / document texts kept in memory, per index
+ENCODING_CACHE_SIZE = 10000
 
 
 class ColBertIndex(BaseIndex):
@@ -28,8 +34,17 @@ class ColBertIndex(BaseIndex):
             nbits=self.config.nbits,
             kmeans_niters=self.config.kmeans_niters,
         )
+        # Text -> ColBERT token embeddings, the entity linking and PPR seeding re-issue the same queries
+        self._query_cache: OrderedDict[str, torch.Tensor] = OrderedDict()
+        self._doc_cache: OrderedDict[str, torch.Tensor] = OrderedDict()
+
+    ELEMENTS_NAME = "elements.json"
 
     async def _update_index(self, elements, meta_data):
+        # The key -> content hash of the indexed elements, to detect the changes of the graph when the index is loaded
+        os.makedirs(self.config.persist_path, exist_ok=True)
+        with open(os.path.join(self.config.persist_path, self.ELEMENTS_NAME), "w") as f:
+            json.dump(dict(zip(element_keys(elements, meta_data), map(content_hash, elements))), f)
 
         with Run().context(
                 RunConfig(nranks=self.config.ranks, experiment=self.index_config.experiment,
@@ -56,36 +71,84 @@ class ColBertIndex(BaseIndex):
         except Exception as e:
             logger.error("Loading colbert index failed", exc_info=e)
 
-    async def upsert(self, data: list[Any]):
-        pass
+    def _indexed_hashes(self, meta_data):
+        # The passage ids of ColBERT are the graph node / edge indices: any change re-builds the index (`upsert`
+        # is not supported), and an index stored without its elements is kept as loaded
+        elements_path = os.path.join(self.config.persist_path, self.ELEMENTS_NAME)
+        if not os.path.exists(elements_path):
+            return None
+        with open(elements_path, "r") as f:
+            return json.load(f)
 
     def exist_index(self):
 
         return os.path.exists(self.config.persist_path)
 
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key: str):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: str, value):
+        cache[key] = value
+        if len(cache) > ENCODING_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _encode_queries(self, queries: list[str]) -> torch.Tensor:
+        """The (len(queries), query_maxlen, dim) query encodings, the missing ones encoded with one batched call."""
+        misses = [query for query in dict.fromkeys(queries) if self._cache_get(self._query_cache, query) is None]
+        if misses:
+            encoded = self._index.encode(misses, full_length_search=False)
+            for query, query_encoding in zip(misses, encoded):
+                self._cache_put(self._query_cache, query, query_encoding.unsqueeze(0))
+        return torch.cat([self._query_cache[query] for query in queries])
+
+    def _encode_doc(self, doc: str) -> torch.Tensor:
+        encoded = self._cache_get(self._doc_cache, doc)
+        if encoded is None:
+            encoded = self._index.checkpoint.docFromText([doc]).float()[0]
+            self._cache_put(self._doc_cache, doc, encoded)
+        return encoded
+
+    def _search(self, queries: list[str], top_k: int) -> list[tuple]:
+        """
+        `Searcher.search_all` over the cached query encodings: the (pids, ranks, scores) of every query.
+        """
+        encoded = self._encode_queries(queries)
+        return [tuple(self._index.dense_search(encoded[idx:idx + 1], top_k)) for idx in range(len(queries))]
+
     async def retrieval(self, query, top_k=None):
 
         if top_k is None:
             top_k = self._get_retrieve_top_k()
 
-        results =  tuple(self._index.search(query, k=top_k))
-        return results
+        return self._search([query], top_k)[0]
 
 
     async def retrieval_nodes(self, query, top_k, graph, need_score = False, tree_node = False):
+        return (await self.retrieval_nodes_batch([query], top_k, graph, need_score, tree_node))[0]
 
-        result =  ColbertNodeResult(*(await self.retrieval(query, top_k)))
-        
+    async def retrieval_edges(self, query, top_k, graph, need_score = False):
+        return (await self.retrieval_edges_batch([query], top_k, graph, need_score))[0]
+
+    async def retrieval_nodes_batch(self, queries, top_k, graph, need_score=False, tree_node=False):
+        if top_k is None:
+            top_k = self._get_retrieve_top_k()
+        results = [ColbertNodeResult(*result) for result in self._search(list(queries), top_k)]
         if tree_node:
-            return await result.get_tree_node_data(graph, need_score)
+            return await asyncio.gather(*[result.get_tree_node_data(graph, need_score) for result in results])
         else:
-            return await result.get_node_data(graph, need_score)
+            return await asyncio.gather(*[result.get_node_data(graph, need_score) for result in results])
+
+    async def retrieval_edges_batch(self, queries, top_k, graph, need_score=False):
+        if top_k is None:
+            top_k = self._get_retrieve_top_k()
+        results = [ColbertEdgeResult(*result) for result in self._search(list(queries), top_k)]
+        return await asyncio.gather(*[result.get_edge_data(graph, need_score) for result in results])
 
-    async def retrieval_edges(self, query, top_k, graph, need_score = False):
-        results = await self.retrieval(query, top_k)
-        result =  ColbertEdgeResult(*results)
-        
-        return await result.get_edge_data(graph, need_score)
     async def retrieval_batch(self, queries, top_k=None):
         if top_k is None:
             top_k = self._get_retrieve_top_k()
@@ -93,9 +156,11 @@ class ColBertIndex(BaseIndex):
             if isinstance(queries, str):
                 queries = Queries(path=None, data={0: queries})
             elif not isinstance(queries, Queries):
-                queries = Queries(data=queries)
+                queries = Queries(data=queries if isinstance(queries, dict) else dict(enumerate(queries)))
 
-            return self._index.search_all(queries, k=top_k).data
+            # The `Ranking.data` of `search_all`: qid -> [(pid, rank, score), ...]
+            return {qid: list(zip(*result))
+                    for qid, result in zip(queries.keys(), self._search(list(queries.values()), top_k))}
         except Exception as e:
             logger.exception(f"fail to search {queries} for {e}")
             return []
@@ -111,16 +176,15 @@ class ColBertIndex(BaseIndex):
         return ColBertIndex(self.config)
 
     async def _similarity_score(self, object_q, object_d):
-        encoded_q = self._index.encode(object_q, full_length_search=False)
-        encoded_d = self._index.checkpoint.docFromText(object_d).float()
-        real_score = encoded_q[0].matmul(encoded_d[0].T).max(
+        object_q = object_q if isinstance(object_q, str) else object_q[0]
+        object_d = object_d if isinstance(object_d, str) else object_d[0]
+        encoded_q = self._encode_queries([object_q])
+        encoded_d = self._encode_doc(object_d)
+        real_score = encoded_q[0].matmul(encoded_d.T).max(
             dim=1).values.sum().detach().cpu().numpy()
         return real_score
 
     async def get_max_score(self, queries_):
+        # The score of the (first) query against itself as a document
         assert isinstance(queries_, list)
-        encoded_query = self._index.encode(queries_, full_length_search=False)
-        encoded_doc = self._index.checkpoint.docFromText(queries_).float()
-        max_score = encoded_query[0].matmul(encoded_doc[0].T).max(dim=1).values.sum().detach().cpu().numpy()
-
-        return max_score
+        return await self._similarity_score(queries_[0], queries_[0])
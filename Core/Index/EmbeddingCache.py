@@ -0,0 +1,209 @@
+"""
+Persistent embedding cache.
+
+Embeddings are keyed by the md5 of their text (`mdhash_id`) under one directory per embedding model, so re-building an
+index, re-embedding the graph nodes as queries, or re-running a workspace after a config change costs no embedding
+call for the texts seen before.
+"""
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.embeddings.openai import OpenAIEmbedding
+from pydantic import PrivateAttr
+
+from Core.Common.Logger import logger
+from Core.Common.Utils import mdhash_id
+
+
+class EmbeddingCache:
+    """
+    The vectors of one embedding model: an append-only memory-mapped array plus an index file of their keys (one key
+    per line, the line number is the row of the vector), with an LRU of the recently used vectors in memory.
+
+    Use `EmbeddingCache.open` so that all the embedding models of a process share the instance of a directory.
+    """
+    VECTORS_NAME = "vectors.bin"
+    KEYS_NAME = "keys.txt"
+    META_NAME = "meta.json"
+    _instances: dict[str, "EmbeddingCache"] = {}
+
+    def __init__(self, directory: str, dtype: str = "float32", memory_size: int = 100000):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.memory_size = memory_size
+        self._rows: dict[str, int] = {}
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._vectors: Optional[np.memmap] = None
+        self.memory_hits = self.disk_hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def open(cls, directory: str, dtype: str = "float32", memory_size: int = 100000) -> "EmbeddingCache":
+        directory = os.path.abspath(directory)
+        if directory not in cls._instances:
+            cls._instances[directory] = cls(directory, dtype=dtype, memory_size=memory_size)
+        return cls._instances[directory]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path(self.META_NAME)):
+            return
+        with open(self._path(self.META_NAME), "r") as f:
+            meta = json.load(f)
+        if np.dtype(meta["dtype"]) != self.dtype:
+            logger.warning(f"The embedding cache {self.directory} stores {meta['dtype']} vectors, keeping that dtype")
+            self.dtype = np.dtype(meta["dtype"])
+        self.dim = meta["dim"]
+        with open(self._path(self.KEYS_NAME), "r") as f:
+            keys = f.read().splitlines()
+        row_bytes = self.dim * self.dtype.itemsize
+        num_rows = min(len(keys), os.path.getsize(self._path(self.VECTORS_NAME)) // row_bytes)
+        if num_rows != len(keys) or num_rows * row_bytes != os.path.getsize(self._path(self.VECTORS_NAME)):
+            # An interrupted write: drop the rows that are not complete in both files
+            logger.warning(f"Truncating the embedding cache {self.directory} to its {num_rows} complete vectors")
+            keys = keys[:num_rows]
+            with open(self._path(self.KEYS_NAME), "w") as f:
+                f.writelines(f"{key}\n" for key in keys)
+            with open(self._path(self.VECTORS_NAME), "r+b") as f:
+                f.truncate(num_rows * row_bytes)
+        self._rows = {key: row for row, key in enumerate(keys)}
+        logger.info(f"Loaded the embedding cache {self.directory} with {len(self._rows)} vectors")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self), "memory_hits": self.memory_hits, "disk_hits": self.disk_hits,
+                "misses": self.misses}
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        """The cached vector of every key, None for the missing ones."""
+        vectors = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            elif key in self._rows:
+                if self._vectors is None:
+                    self._vectors = np.memmap(self._path(self.VECTORS_NAME), dtype=self.dtype, mode="r",
+                                              shape=(len(self._rows), self.dim))
+                vector = self._vectors[self._rows[key]].astype(np.float32).tolist()
+                self._remember(key, vector)
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            vectors.append(vector)
+        return vectors
+
+    def put_many(self, keys: list[str], vectors: list[list[float]]):
+        new = {key: vector for key, vector in zip(keys, vectors) if key not in self._rows}
+        if not new:
+            return
+        if self.dim is None:
+            self.dim = len(next(iter(new.values())))
+            with open(self._path(self.META_NAME), "w") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+        stored = np.asarray(list(new.values()), dtype=self.dtype)
+        # The vectors are written before their keys, so that a key never points past the end of the array
+        with open(self._path(self.VECTORS_NAME), "ab") as f:
+            f.write(stored.tobytes())
+        with open(self._path(self.KEYS_NAME), "a") as f:
+            f.writelines(f"{key}\n" for key in new)
+        # The LRU keeps the stored (e.g., float16 rounded) vectors, the same as those read back from the disk
+        for key, vector in zip(new, stored.astype(np.float32).tolist()):
+            self._rows[key] = len(self._rows)
+            self._remember(key, vector)
+        self._vectors = None
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with an `EmbeddingCache`: only the texts missing from the cache reach the model.
+
+    Text and query embeddings are cached under different keys, since some models embed queries differently.
+    """
+    _model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        super().__init__(model_name=model.model_name, embed_batch_size=model.embed_batch_size,
+                         callback_manager=model.callback_manager, **kwargs)
+        self._model = model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def model(self) -> BaseEmbedding:
+        return self._model
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    @staticmethod
+    def cache_directory(root: str, model: BaseEmbedding) -> str:
+        """One sub-directory per embedding model, e.g., `OpenAIEmbedding_text-embedding-3-small_1024`."""
+        name = f"{type(model).__name__}_{model.model_name}"
+        if getattr(model, "dimensions", None):
+            name += f"_{model.dimensions}"
+        return os.path.join(root, re.sub(r"[^\w.-]", "_", name))
+
+    def _embed_misses(self, texts: list[str]) -> list[list[float]]:
+        # The OpenAI API bounds the inputs of a request, the other models embed the whole list at once
+        if not isinstance(self._model, OpenAIEmbedding):
+            return self._model._get_text_embeddings(texts)
+        embeddings = []
+        for i in range(0, len(texts), self.embed_batch_size):
+            embeddings.extend(self._model._get_text_embeddings(texts[i:i + self.embed_batch_size]))
+        return embeddings
+
+    def _cached(self, texts: list[str], prefix: str, embed_fn) -> list[list[float]]:
+        keys = [mdhash_id(text, prefix=prefix) for text in texts]
+        embeddings = self._cache.get_many(keys)
+        # Embed every missing text once, even when it is repeated in the batch
+        misses = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if misses:
+            fresh = dict(zip(misses, embed_fn(misses)))
+            self._cache.put_many([mdhash_id(text, prefix=prefix) for text in fresh], list(fresh.values()))
+            embeddings = [fresh[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+        if len(texts) > 1:
+            logger.debug(f"Embedding cache: {len(texts) - len(misses)} cached, {len(misses)} embedded")
+        return embeddings
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._cached([text], "", self._embed_misses)[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cached(texts, "", self._embed_misses)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._cached([query], "query-", lambda queries: [self._model._get_query_embedding(queries[0])])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
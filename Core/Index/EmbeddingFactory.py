@@ -1,7 +1,7 @@
 """
 RAG Embedding Factory.
 @Reference: https://github.com/geekan/MetaGPT/blob/main/metagpt/rag/factories/embedding.py
-@Provide: OllamaEmbedding, OpenAIEmbedding
+@Provide: OllamaEmbedding, OpenAIEmbedding, HuggingFaceEmbedding, FakeEmbedding
 """
 
 from __future__ import annotations
@@ -18,6 +18,8 @@ except ImportError:
 from Config.EmbConfig import EmbeddingType
 from Config.LLMConfig import LLMType
 from Core.Common.BaseFactory import GenericFactory
+from Core.Index.EmbeddingCache import CachedEmbedding, EmbeddingCache
+from Core.Index.FakeEmbedding import DEFAULT_FAKE_DIMENSIONS, FakeEmbedding
 from Option.Config2 import Config
 
 class RAGEmbeddingFactory(GenericFactory):
@@ -28,12 +30,19 @@ class RAGEmbeddingFactory(GenericFactory):
             EmbeddingType.OPENAI: self._create_openai,
             EmbeddingType.OLLAMA: self._create_ollama,
             EmbeddingType.HF: self._create_hf,
+            EmbeddingType.FAKE: self._create_fake,
         }
         super().__init__(creators)
 
     def get_rag_embedding(self, key: EmbeddingType = None, config: Config = None) -> BaseEmbedding:
         """Key is EmbeddingType."""
-        return super().get_instance(key or self._resolve_embedding_type(config), config = config)
+        embed_model = super().get_instance(key or self._resolve_embedding_type(config), config = config)
+        if config is not None and config.embedding.vector_cache_dir:
+            cache = EmbeddingCache.open(CachedEmbedding.cache_directory(config.embedding.vector_cache_dir, embed_model),
+                                        dtype=config.embedding.vector_cache_dtype,
+                                        memory_size=config.embedding.vector_cache_memory_size)
+            embed_model = CachedEmbedding(embed_model, cache)
+        return embed_model
 
     @staticmethod
     def _resolve_embedding_type(config) -> EmbeddingType | LLMType:
@@ -85,6 +94,15 @@ class RAGEmbeddingFactory(GenericFactory):
             del params["cache_folder"]
         return HuggingFaceEmbedding(**params)
     
+    def _create_fake(self, config) -> FakeEmbedding:
+        params = dict(
+            dimensions=config.embedding.dimensions or DEFAULT_FAKE_DIMENSIONS,
+            model_name=config.embedding.model or "fake",
+        )
+        if config.embedding.embed_batch_size:
+            params["embed_batch_size"] = config.embedding.embed_batch_size
+        return FakeEmbedding(**params)
+
     @staticmethod
     def _try_set_model_and_batch_size(params: dict, config):
   
@@ -8,13 +8,88 @@ from llama_index.core.schema import (
     TextNode
 )
 from llama_index.core import StorageContext, load_index_from_storage, VectorStoreIndex, Settings
-from Core.Index.BaseIndex import BaseIndex, VectorIndexNodeResult, VectorIndexEdgeResult
+from Core.Index.BaseIndex import BaseIndex, VectorIndexNodeResult, VectorIndexEdgeResult, element_key, element_keys
 import asyncio
-from llama_index.core.schema import QueryBundle
+from llama_index.core.schema import QueryBundle, NodeWithScore
 import numpy as np
 from llama_index.vector_stores.faiss import FaissVectorStore
 from concurrent.futures import ProcessPoolExecutor
 from llama_index.embeddings.openai import OpenAIEmbedding
+from Config.FaissConfig import FaissConfig
+
+# Fewest training vectors per centroid (IVF lists, PQ codewords) before faiss warns about the clustering quality
+MIN_POINTS_PER_CENTROID = 39
+
+
+def build_faiss_index(embeddings: np.ndarray, config: FaissConfig) -> faiss.Index:
+    """
+    Create the faiss index of the configured family for the (N, D) embeddings, trained on a sample of them if the
+    family needs training (IVF, PQ, SQ). The embeddings are not added.
+    """
+    num_vectors, dim = embeddings.shape
+    index_type = config.index_type
+    nlist = max(1, min(config.ivf_nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+    if index_type.startswith("ivf") and nlist != config.ivf_nlist:
+        logger.info(f"Only {num_vectors} vectors, using {nlist} IVF lists instead of {config.ivf_nlist}")
+    if index_type == "ivf_pq":
+        if dim % config.pq_m != 0:
+            raise ValueError(f"pq_m ({config.pq_m}) must divide the embedding dimension ({dim})")
+        if num_vectors < 2 ** config.pq_nbits:
+            logger.warning(f"Only {num_vectors} vectors, too few to train {config.pq_nbits}-bit PQ codes, "
+                           f"falling back to ivf_flat")
+            index_type = "ivf_flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw_flat":
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+    elif index_type == "hnsw_sq":
+        index = faiss.IndexHNSWSQ(dim, getattr(faiss.ScalarQuantizer, config.sq_type), config.hnsw_m)
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+    elif index_type == "ivf_sq":
+        index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, nlist,
+                                              getattr(faiss.ScalarQuantizer, config.sq_type))
+    elif index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, config.pq_m, config.pq_nbits)
+    else:
+        raise ValueError(f"Unknown faiss index type: {index_type}")
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = config.hnsw_ef_construction
+    if not index.is_trained:
+        sample_size = min(config.train_sample_size, num_vectors)
+        sample = np.random.default_rng(0).choice(num_vectors, size=sample_size, replace=False)
+        logger.info(f"Training the {index_type} faiss index on {sample_size} vectors")
+        index.train(np.ascontiguousarray(embeddings[np.sort(sample)]))
+    set_faiss_search_params(index, config)
+    return index
+
+
+def set_faiss_search_params(index: faiss.Index, config: FaissConfig):
+    """Apply the query-time parameters (HNSW efSearch, IVF nprobe), e.g., to an index loaded from disk."""
+    index = faiss.downcast_index(index)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = config.hnsw_ef_search
+    ivf_index = faiss.try_extract_index_ivf(index)
+    if ivf_index is not None:
+        ivf_index.nprobe = config.ivf_nprobe
+
+
+def reconstruct_vectors(index: faiss.Index, ids: np.ndarray) -> np.ndarray:
+    """The stored (possibly quantized) vectors of the given ids, e.g., to search the index with its own vectors."""
+    # IVF indexes only reconstruct through a direct map (id -> list, offset), dropped again afterward. A hash table,
+    # since the ids of an IVF index holding its own ids (FaissNativeIndex) are not sequential after removals
+    ivf_index = faiss.try_extract_index_ivf(index) if isinstance(index, faiss.Index) else None
+    drop_direct_map = ivf_index is not None and ivf_index.direct_map.type == faiss.DirectMap.NoMap
+    if drop_direct_map:
+        ivf_index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    try:
+        return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+    finally:
+        if drop_direct_map:
+            ivf_index.set_direct_map_type(faiss.DirectMap.NoMap)
+
 
 class FaissIndex(BaseIndex):
     """FaissIndex is designed to be simple and straightforward.
@@ -25,14 +100,12 @@ class FaissIndex(BaseIndex):
     def __init__(self, config):
         super().__init__(config)
         self.embedding_model =config.embed_model
+        # Element key -> (faiss id, node id) of the live elements, built on first use
+        self._key_nodes = None
+
     async def retrieval(self, query, top_k):
-        if top_k is None:
-            top_k = self._get_retrieve_top_k()
-        retriever = self._index.as_retriever(similarity_top_k=top_k, embed_model=self.config.embed_model)
-        query_emb = self._embed_text(query)
-        query_bundle = QueryBundle(query_str=query, embedding=query_emb)
-    
-        return await retriever.aretrieve(query_bundle)
+        # The llama_index retriever fails on the faiss ids of deleted nodes, `retrieval_batch` skips them
+        return (await self.retrieval_batch([query], top_k))[0]
 
     async def retrieval_nodes(self, query, top_k, graph, need_score=False, tree_node=False):
         results = await self.retrieval(query, top_k)
@@ -50,9 +123,109 @@ class FaissIndex(BaseIndex):
         return await result.get_edge_data(graph, need_score)
 
     async def retrieval_batch(self, queries, top_k):
-        pass
+        """
+        Batched `retrieval`: all the queries are embedded with one embedding call, and searched with a single
+        `faiss.Index.search` over the (Q, D) query matrix.
+
+        Returns:
+            list[list[NodeWithScore]]: The retrieved nodes of every query, scored as `retrieval` does.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        if top_k is None:
+            top_k = self._get_retrieve_top_k()
+        if self._index is None:
+            # Neither built nor loaded yet
+            return [[] for _ in queries]
+        if len(queries) == 0:
+            return []
+        query_embs = np.asarray(self._embed_texts(queries), dtype=np.float32)
+        faiss_index = self._index.vector_store.client
+        nodes_dict = self._index.index_struct.nodes_dict
+        # The vectors of deleted nodes stay in the faiss index: over-fetch by their number and skip them
+        num_deleted = faiss_index.ntotal - len(nodes_dict)
+        dists, ids = faiss_index.search(query_embs, min(top_k + num_deleted, max(faiss_index.ntotal, 1)))
+
+        # Faiss ids -> llama_index node ids -> nodes, with one docstore lookup for the whole batch
+        node_ids = {faiss_id: nodes_dict[str(faiss_id)] for faiss_id in np.unique(ids[ids >= 0]).tolist()
+                    if str(faiss_id) in nodes_dict}
+        nodes = {node.node_id: node
+                 for node in self._index.docstore.get_nodes(list(node_ids.values()), raise_error=False)}
+        return [[NodeWithScore(node=nodes[node_ids[faiss_id]], score=dist)
+                 for dist, faiss_id in zip(query_dists.tolist(), query_ids.tolist()) if faiss_id in node_ids][:top_k]
+                for query_dists, query_ids in zip(dists, ids)]
+
+    async def retrieval_nodes_batch(self, queries, top_k, graph, need_score=False, tree_node=False):
+        results = [VectorIndexNodeResult(query_results) for query_results in await self.retrieval_batch(queries, top_k)]
+        if tree_node:
+            return await asyncio.gather(*[result.get_tree_node_data(graph, need_score) for result in results])
+        else:
+            return await asyncio.gather(*[result.get_node_data(graph, need_score) for result in results])
+
+    async def retrieval_edges_batch(self, queries, top_k, graph, need_score=False):
+        results = [VectorIndexEdgeResult(query_results) for query_results in await self.retrieval_batch(queries, top_k)]
+        return await asyncio.gather(*[result.get_edge_data(graph, need_score) for result in results])
+
+    def _faiss_index(self):
+        return self._index.vector_store.client
+
+    def _live_ids(self) -> np.ndarray:
+        """The faiss ids of the indexed elements, the vectors of deleted elements may still be in the faiss index."""
+        return np.sort(np.fromiter(map(int, self._index.index_struct.nodes_dict.keys()), dtype=np.int64))
+
+    def _metadata_of(self, ids: np.ndarray) -> list[dict[str, Any]]:
+        nodes_dict = self._index.index_struct.nodes_dict
+        node_ids = [nodes_dict[str(faiss_id)] for faiss_id in ids.tolist()]
+        nodes = {node.node_id: node for node in self._index.docstore.get_nodes(node_ids, raise_error=False)}
+        return [nodes[node_id].metadata for node_id in node_ids]
+
+    def stored_knn(self, top_k: int, block_size: int = 8192) -> tuple:
+        """
+        All-pairs top-k search of the stored vectors against the index itself, without any embedding call: the
+        vectors are reconstructed from the faiss index and searched `block_size` at a time, bounding the memory to one
+        block of vectors and results.
+
+        Returns:
+            tuple: The metadata of the N indexed elements; their (N, top_k) faiss scores, NaN past the results; the
+            (N, top_k) positions of their neighbours in the metadata list, -1 past the results; and whether the
+            scores are distances (L2) rather than similarities.
+        """
+        index = self._faiss_index() if self._index is not None else None
+        ids = self._live_ids() if index is not None else np.empty(0, dtype=np.int64)
+        scores = np.full((len(ids), top_k), np.nan, dtype=np.float32)
+        neighbors = np.full((len(ids), top_k), -1, dtype=np.int64)
+        if len(ids) == 0:
+            return [], scores, neighbors, True
+        positions = np.full(int(ids.max()) + 1, -1, dtype=np.int64)
+        positions[ids] = np.arange(len(ids))
+        # The vectors of deleted elements may still be searched: over-fetch by their number and drop them
+        k = min(top_k + index.ntotal - len(ids), index.ntotal)
+        for start in range(0, len(ids), block_size):
+            block_scores, block_ids = index.search(reconstruct_vectors(index, ids[start:start + block_size]), k)
+            valid = (block_ids >= 0) & (block_ids < len(positions))
+            block_positions = np.where(valid, positions[np.where(valid, block_ids, 0)], -1)
+            # Move the live neighbours first, keeping their rank order
+            order = np.argsort(block_positions < 0, axis=1, kind="stable")[:, :top_k]
+            block_positions = np.take_along_axis(block_positions, order, axis=1)
+            block_scores = np.take_along_axis(block_scores, order, axis=1)
+            block_scores[block_positions < 0] = np.nan
+            end = start + len(block_positions)
+            scores[start:end, :order.shape[1]] = block_scores
+            neighbors[start:end, :order.shape[1]] = block_positions
+        return self._metadata_of(ids), scores, neighbors, index.metric_type == faiss.METRIC_L2
+
     def _embed_text(self, text: str):
         return self.embedding_model._get_text_embedding(text)
+
+    def _embed_texts(self, texts: list[str]):
+        # The OpenAI API bounds the inputs of a request, the other models embed the whole list at once
+        if not isinstance(self.embedding_model, OpenAIEmbedding):
+            return self.embedding_model._get_text_embeddings(texts)
+        text_embeddings = []
+        batch_size = self.embedding_model.embed_batch_size
+        for i in range(0, len(texts), batch_size):
+            text_embeddings.extend(self.embedding_model._get_text_embeddings(texts[i:i + batch_size]))
+        return text_embeddings
     
     async def _update_index(self, datas: list[dict[str, Any]], meta_data: list):
         async def process_document(data):
@@ -69,29 +242,19 @@ class FaissIndex(BaseIndex):
         documents = await asyncio.gather(*[process_document(data) for data in datas])
         texts = [doc.text for doc in documents]
 
-        text_embeddings = []
-        if isinstance(self.embedding_model, OpenAIEmbedding):
-            batch_size = self.embedding_model.embed_batch_size
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                batch_embeddings = self.embedding_model._get_text_embeddings(batch)
-                text_embeddings.extend(batch_embeddings)
-            dim = self.embedding_model.dimensions  
-        else:
-            text_embeddings = self.embedding_model._get_text_embeddings(texts)
-            if len(text_embeddings) > 0:
-                dim = len(text_embeddings[0])   
-            else:
-                raise ValueError("No embeddings generated, cannot infer dimensions.")
+        text_embeddings = self._embed_texts(texts)
+        if len(text_embeddings) == 0:
+            raise ValueError("No embeddings generated, cannot infer dimensions.")
 
         # 初始化 FAISS Index
         vector_store = FaissVectorStore(
-            faiss_index=faiss.IndexHNSWFlat(dim, 32)
+            faiss_index=build_faiss_index(np.asarray(text_embeddings, dtype=np.float32), self.config.faiss)
         )
         storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
         self._index =  VectorStoreIndex([], storage_context=storage_context,
             embed_model= self.config.embed_model)
+        self._key_nodes = None
       
       
         
@@ -115,14 +278,73 @@ class FaissIndex(BaseIndex):
             storage_context = StorageContext.from_defaults(vector_store=vector_store, persist_dir=self.config.persist_path)
      
             self._index  =load_index_from_storage(storage_context=storage_context, embed_model=self.config.embed_model)
+            set_faiss_search_params(vector_store.client, self.config.faiss)
+            self._key_nodes = None
 
             return True
         except Exception as e:
             logger.error("Loading index error: {}".format(e))
             return False
 
-    async def upsert(self, data: dict[str: Any]):
-        pass
+    def _live_key_nodes(self, meta_data=None) -> dict[str, tuple[str, str]]:
+        """
+        Element key -> (faiss id, node id) of the indexed nodes, keyed by the `meta_data` values of their metadata, or
+        by all of them.
+        """
+        if self._key_nodes is None:
+            nodes_dict = self._index.index_struct.nodes_dict
+            faiss_ids = {node_id: faiss_id for faiss_id, node_id in nodes_dict.items()}
+            self._key_nodes = {}
+            for node in self._index.docstore.get_nodes(list(nodes_dict.values()), raise_error=False):
+                values = node.metadata.values() if meta_data is None else \
+                    [node.metadata.get(key, "") for key in meta_data]
+                self._key_nodes[element_key(list(values))] = (faiss_ids[node.node_id], node.node_id)
+        return self._key_nodes
+
+    def _indexed_hashes(self, meta_data):
+        key_nodes = self._live_key_nodes(meta_data)
+        nodes = {node.node_id: node for node in
+                 self._index.docstore.get_nodes([node_id for _, node_id in key_nodes.values()], raise_error=False)}
+        return {key: mdhash_id(nodes[node_id].text) for key, (_, node_id) in key_nodes.items()}
+
+    async def upsert(self, elements, meta_data):
+        """
+        Embed and insert the elements. The vectors of the replaced elements stay in the faiss index, which cannot remove
+        them in general (HNSW), but their nodes are dropped, so that they are never retrieved again.
+        """
+        if len(elements) == 0:
+            return
+        if self._index is None:
+            await self._update_index(elements, meta_data)
+            return
+        key_nodes = self._live_key_nodes(meta_data)
+        keys = element_keys(elements, meta_data)
+        await self._delete_keys([key for key in keys if key in key_nodes])
+        text_embeddings = self._embed_texts([data["content"] for data in elements])
+        nodes = [TextNode(text=data["content"], embedding=embedding, metadata={key: data[key] for key in meta_data},
+                          excluded_embed_metadata_keys=meta_data)
+                 for data, embedding in zip(elements, text_embeddings)]
+        self._index.insert_nodes(nodes)
+        nodes_dict = self._index.index_struct.nodes_dict
+        faiss_ids = {node_id: faiss_id for faiss_id, node_id in list(nodes_dict.items())[-len(nodes):]}
+        self._key_nodes.update((key, (faiss_ids[node.node_id], node.node_id)) for key, node in zip(keys, nodes))
+
+    async def delete(self, keys):
+        # The keys of a public delete are built from all the metadata values, e.g., `entity_name` alone
+        self._live_key_nodes()
+        await super().delete(keys)
+
+    async def _delete_keys(self, keys: list[str]):
+        if not keys:
+            return
+        key_nodes = self._key_nodes or {}
+        for key in keys:
+            if key not in key_nodes:
+                continue
+            faiss_id, node_id = key_nodes.pop(key)
+            self._index.index_struct.delete(faiss_id)
+            self._index.docstore.delete_document(node_id, raise_error=False)
+        self._index.storage_context.index_store.add_index_struct(self._index.index_struct)
 
     def exist_index(self):
         return os.path.exists(self.config.persist_path)
@@ -140,41 +362,9 @@ class FaissIndex(BaseIndex):
         logger.info("refresh index size is {}".format(len([True for doc in refreshed_docs if doc])))
 
     def _get_index(self):
-        Settings.embed_model = self.config.embed_model
-        #TODO: config the faiss index config
-        vector_store = FaissVectorStore(faiss_index=faiss.IndexHNSWFlat(1024, 32))
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        return  VectorStoreIndex(
-            nodes = [],
-            storage_context=storage_context,
-            embed_model= self.config.embed_model,
-        )   
-        # self.config.embed_model
-        # return VectorStoreIndex([])
+        # The faiss index is created by `_update_index`, once the embedding dimension is known and the index trained
+        return None
 
     async def _similarity_score(self, object_q, object_d):
         # For llama_index based vector database, we do not need it now!
         pass
-
-    async def retrieval_nodes_with_score_matrix(self, query_list, top_k, graph):
-        if isinstance(query_list, str):
-            query_list = [query_list]
-        results = await asyncio.gather(
-            *[self.retrieval_nodes(query, top_k, graph, need_score=True) for query in query_list])
-        reset_prob_matrix = np.zeros((len(query_list), graph.node_num))
-        entity_indices = []
-        scores = []
-
-        async def set_idx_score(idx, res):
-            for entity, score in zip(res[0], res[1]):
-                entity_indices.append(await graph.get_node_index(entity["entity_name"]))
-                scores.append(score)
-
-        await asyncio.gather(*[set_idx_score(idx, res) for idx, res in enumerate(results)])
-        reset_prob_matrix[np.arange(len(query_list)).reshape(-1, 1), entity_indices] = scores
-        all_entity_weights = reset_prob_matrix.max(axis=0)  # (1, #all_entities)
-
-        # Normalize the scores
-        all_entity_weights /= all_entity_weights.sum()
-        return all_entity_weights
@@ -0,0 +1,268 @@
+import json
+import os
+from typing import Any, Optional
+
+import faiss
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from Core.Common.Logger import logger
+from Core.Index.BaseIndex import content_hash, element_key, element_keys
+from Core.Index.FaissIndex import FaissIndex, build_faiss_index, reconstruct_vectors, set_faiss_search_params
+from Core.Storage.ColumnarGraphFile import Column, write_column
+
+# Fraction of tombstoned vectors in the faiss index above which it is re-built from the live vectors
+MAX_TOMBSTONE_RATIO = 0.25
+
+
+class FaissNativeIndex(FaissIndex):
+    """
+    FAISS-native entity / relation index, without the llama_index documents, docstore and storage context.
+
+    The vectors live in a raw faiss index (IVF, or wrapped in `faiss.IndexIDMap2`) whose ids are the rows of the indexed
+    elements, initially the graph node / edge indices, and the metadata (e.g., `entity_name`, `src_id` / `tgt_id`)
+    plus the content hash of every element in a columnar sidecar keyed by the same ids. The texts themselves are not
+    kept. On load, the faiss index can be memory-mapped.
+
+    Upserts append rows. The replaced and deleted rows are removed from the faiss index when it supports it, and are
+    otherwise (HNSW) tombstoned: over-fetched and filtered out of the searches until the index is compacted.
+    """
+    INDEX_NAME = "index.faiss"
+    META_NAME = "meta.json"
+    DELETED_NAME = "deleted.npy"
+    HASH_COLUMN = "content_hash"
+
+    def __init__(self, config):
+        super().__init__(config)
+        # Metadata key -> column, one row per faiss id; plain lists (None = missing) once changed in memory
+        self._metadata: dict[str, Column | list] = {}
+        self._hashes: Column | list = []
+        self._deleted = np.zeros(0, dtype=bool)
+        # Deleted rows whose vector is still in the faiss index
+        self._num_tombstones = 0
+        # Element key -> row of the live elements, built on first use
+        self._key_rows: Optional[dict[str, int]] = None
+        self._mmapped = False
+
+    @property
+    def num_vectors(self) -> int:
+        return 0 if self._index is None else self._index.ntotal - self._num_tombstones
+
+    @property
+    def num_rows(self) -> int:
+        return len(self._deleted)
+
+    def metadata(self, row: int) -> dict[str, Any]:
+        """The metadata of the element stored under the faiss id `row`."""
+        return {key: column[row] for key, column in self._metadata.items()
+                if (column.has(row) if isinstance(column, Column) else column[row] is not None)}
+
+    async def retrieval(self, query, top_k):
+        return (await self.retrieval_batch([query], top_k))[0]
+
+    async def retrieval_batch(self, queries, top_k):
+        """
+        One embedding call and one `faiss.Index.search` over the (Q, D) query matrix.
+
+        Returns:
+            list[list[NodeWithScore]]: The retrieved elements of every query, with their metadata and faiss distance.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        if top_k is None:
+            top_k = self._get_retrieve_top_k()
+        if self.num_vectors == 0:
+            return [[] for _ in queries]
+        query_embs = np.asarray(self._embed_texts(queries), dtype=np.float32)
+        # Over-fetch by the number of tombstones, so that top_k live results remain once they are filtered out
+        dists, ids = self._index.search(query_embs, min(top_k + self._num_tombstones, self._index.ntotal))
+        results = []
+        for query_dists, query_ids in zip(dists, ids):
+            live = [(dist, row) for dist, row in zip(query_dists.tolist(), query_ids.tolist())
+                    if row >= 0 and not self._deleted[row]][:top_k]
+            results.append([NodeWithScore(node=TextNode(id_=str(row), text="", metadata=self.metadata(row)),
+                                          score=dist) for dist, row in live])
+        return results
+
+    def _new_index(self, embeddings: np.ndarray):
+        """An empty index for the embeddings, added with their rows as ids."""
+        index = build_faiss_index(embeddings, self.config.faiss)
+        # IVF indexes store the ids themselves and remove them exactly. Wrapped in `IndexIDMap2`, the compaction of its
+        # id map on `remove_ids` would shift the labels of every later row, the IVF inner ids not being shifted
+        if faiss.try_extract_index_ivf(index) is not None:
+            return index
+        return faiss.IndexIDMap2(index)
+
+    def _read_index(self, mmap: bool):
+        index = faiss.read_index(os.path.join(self.config.persist_path, self.INDEX_NAME),
+                                 faiss.IO_FLAG_MMAP if mmap else 0)
+        set_faiss_search_params(index, self.config.faiss)
+        return index
+
+    def _write_index(self):
+        faiss.write_index(self._index, os.path.join(self.config.persist_path, self.INDEX_NAME))
+
+    def _faiss_index(self):
+        return self._index
+
+    def _live_ids(self) -> np.ndarray:
+        return np.flatnonzero(~self._deleted)
+
+    def _metadata_of(self, ids: np.ndarray) -> list[dict[str, Any]]:
+        return [self.metadata(row) for row in ids.tolist()]
+
+    async def _update_index(self, datas: list[dict[str, Any]], meta_data: list):
+        self._index, self._metadata, self._hashes = None, {key: [] for key in meta_data}, []
+        self._deleted, self._num_tombstones, self._key_rows = np.zeros(0, dtype=bool), 0, None
+        if len(datas) == 0:
+            logger.warning("No elements to index, the faiss index stays empty.")
+            return
+        embeddings = np.asarray(self._embed_texts([data["content"] for data in datas]), dtype=np.float32)
+        self._index = self._new_index(embeddings)
+        self._append_rows(datas, meta_data, embeddings)
+        logger.info("refresh index size is {}".format(self.num_vectors))
+
+    @staticmethod
+    def _values(column: Column | list) -> list:
+        return column.tolist() if isinstance(column, Column) else column
+
+    def _append_rows(self, datas: list[dict[str, Any]], meta_data: list, embeddings: np.ndarray):
+        rows = np.arange(self.num_rows, self.num_rows + len(datas), dtype=np.int64)
+        self._index.add_with_ids(embeddings, rows)
+        for key in dict.fromkeys([*self._metadata, *meta_data]):
+            values = self._values(self._metadata[key]) if key in self._metadata else [None] * self.num_rows
+            self._metadata[key] = values + [data.get(key) for data in datas]
+        self._hashes = self._values(self._hashes) + [content_hash(data) for data in datas]
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(datas), dtype=bool)])
+        if self._key_rows is not None:
+            self._key_rows.update(zip(element_keys(datas, meta_data), rows.tolist()))
+
+    def _live_key_rows(self, meta_data) -> dict[str, int]:
+        if self._key_rows is None:
+            columns = [self._values(self._metadata[key]) if key in self._metadata else [""] * self.num_rows
+                       for key in meta_data]
+            self._key_rows = {element_key([column[row] for column in columns]): row
+                              for row in np.flatnonzero(~self._deleted).tolist()}
+        return self._key_rows
+
+    def _indexed_hashes(self, meta_data) -> Optional[dict[str, str]]:
+        hashes = self._values(self._hashes)
+        return {key: hashes[row] for key, row in self._live_key_rows(meta_data).items()}
+
+    async def upsert(self, elements, meta_data):
+        if len(elements) == 0:
+            return
+        if self._index is None:
+            if self.num_rows == 0:
+                await self._update_index(elements, meta_data)
+                return
+            # Every row was deleted and compacted away, the dimension is known again from the new embeddings
+            self._live_key_rows(meta_data)
+        self._writable()
+        key_rows = self._live_key_rows(meta_data)
+        self._delete_rows([key_rows[key] for key in element_keys(elements, meta_data) if key in key_rows])
+        embeddings = np.asarray(self._embed_texts([data["content"] for data in elements]), dtype=np.float32)
+        if self._index is None:
+            self._index = self._new_index(embeddings)
+        self._append_rows(elements, meta_data, embeddings)
+        self._maybe_compact()
+
+    async def delete(self, keys):
+        # The keys of a public delete are built from all the metadata columns, e.g., `entity_name` alone
+        self._live_key_rows(list(self._metadata))
+        await self._delete_keys([element_key(key) for key in keys])
+
+    async def _delete_keys(self, keys: list[str]):
+        if not keys:
+            return
+        key_rows = self._key_rows or {}
+        self._delete_rows([key_rows[key] for key in keys if key in key_rows])
+        self._maybe_compact()
+
+    def _writable(self):
+        # A memory-mapped index is read-only, read it into memory before changing it
+        if self._mmapped and self._index is not None:
+            self._index = self._read_index(mmap=False)
+            self._mmapped = False
+
+    def _delete_rows(self, rows: list[int]):
+        if not rows:
+            return
+        self._writable()
+        rows = np.asarray(rows, dtype=np.int64)
+        self._deleted[rows] = True
+        if self._key_rows is not None:
+            self._key_rows = {key: row for key, row in self._key_rows.items() if not self._deleted[row]}
+        try:
+            self._index.remove_ids(rows)
+        except RuntimeError:
+            # HNSW graphs do not support removals, the vectors stay as tombstones
+            self._num_tombstones += len(rows)
+
+    def _maybe_compact(self):
+        """Re-build the faiss index from the live vectors once the tombstones exceed MAX_TOMBSTONE_RATIO."""
+        if self._index is None or self._num_tombstones <= MAX_TOMBSTONE_RATIO * self._index.ntotal:
+            return
+        live_rows = np.flatnonzero(~self._deleted)
+        logger.info(f"Compacting the faiss index: {self._num_tombstones} tombstones, {len(live_rows)} live vectors")
+        self._num_tombstones = 0
+        if len(live_rows) == 0:
+            self._index = None
+            return
+        embeddings = reconstruct_vectors(self._index, live_rows)
+        self._index = self._new_index(embeddings)
+        self._index.add_with_ids(embeddings, live_rows)
+
+    def _storage_index(self):
+        os.makedirs(self.config.persist_path, exist_ok=True)
+        meta = {"num_rows": self.num_rows, "num_tombstones": self._num_tombstones,
+                "has_index": self._index is not None, "metadata": []}
+        if self._index is not None and not self._mmapped:
+            self._write_index()
+        for idx, (key, values) in enumerate(self._metadata.items()):
+            meta["metadata"].append([key, write_column(self.config.persist_path, f"metadata_{idx}",
+                                                       self._values(values))])
+        write_column(self.config.persist_path, self.HASH_COLUMN, self._values(self._hashes))
+        np.save(os.path.join(self.config.persist_path, self.DELETED_NAME), self._deleted)
+        # The meta file is written last, it marks the index as complete
+        with open(os.path.join(self.config.persist_path, self.META_NAME), "w") as f:
+            json.dump(meta, f)
+        self._load_columns(meta)
+
+    def _load_columns(self, meta: dict):
+        self._deleted = np.load(os.path.join(self.config.persist_path, self.DELETED_NAME))
+        if meta["num_rows"] == 0:
+            # Empty columns cannot be memory-mapped
+            self._metadata, self._hashes = {key: [] for key, _ in meta["metadata"]}, []
+            return
+        self._metadata = {key: Column(self.config.persist_path, f"metadata_{idx}", kind)
+                          for idx, (key, kind) in enumerate(meta["metadata"])}
+        self._hashes = Column(self.config.persist_path, self.HASH_COLUMN, "str")
+
+    async def _load_index(self) -> bool:
+        try:
+            with open(os.path.join(self.config.persist_path, self.META_NAME), "r") as f:
+                meta = json.load(f)
+            self._index, self._mmapped = None, False
+            if meta["has_index"]:
+                self._index = self._read_index(mmap=self.config.mmap)
+                self._mmapped = self.config.mmap
+            self._load_columns(meta)
+            self._num_tombstones, self._key_rows = meta["num_tombstones"], None
+            logger.info(f"Loaded the faiss index with {self.num_vectors} vectors.")
+            return True
+        except Exception as e:
+            logger.error("Loading index error: {}".format(e))
+            return False
+
+    def exist_index(self):
+        return os.path.exists(os.path.join(self.config.persist_path, self.META_NAME))
+
+    def _get_index(self):
+        # The faiss index is created by `_update_index`, once the embedding dimension is known
+        return None
+
+    async def _update_index_from_documents(self, docs):
+        """Upsert llama_index documents as elements: their text is embedded and their metadata keys them."""
+        meta_data = list(dict.fromkeys(key for doc in docs for key in doc.metadata))
+        await self.upsert([{**doc.metadata, "content": doc.text} for doc in docs], meta_data)
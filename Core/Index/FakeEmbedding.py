@@ -0,0 +1,48 @@
+"""
+Deterministic embedding model without any network, for the tests and the load tests (`api_type: fake`).
+"""
+import hashlib
+import re
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import BaseEmbedding
+
+DEFAULT_FAKE_DIMENSIONS = 256
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Feature-hashing embedding: every lowercased word of the text adds +-1 to the coordinate given by its hash, and the
+    vector is L2-normalized. The vectors are stable across processes and machines, and the texts sharing words are
+    similar, so that the vector retrieval still returns meaningful neighbours.
+    """
+    dimensions: int = Field(default=DEFAULT_FAKE_DIMENSIONS, gt=0, description="The dimension of the vectors.")
+
+    def __init__(self, dimensions: int = DEFAULT_FAKE_DIMENSIONS, model_name: str = "fake", **kwargs: Any):
+        super().__init__(dimensions=dimensions, model_name=model_name, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        # The whole text is hashed too, so that the texts without words get distinct vectors
+        for token in re.findall(r"\w+", text.lower()) + [text]:
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if (digest >> 32) & 1 else -1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
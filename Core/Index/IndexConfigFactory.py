@@ -4,8 +4,10 @@ Index Config Factory.
 from Core.Index import get_rag_embedding
 from Core.Index.Schema import (
     VectorIndexConfig,
+    NumpyVectorIndexConfig,
     ColBertIndexConfig,
-    FAISSIndexConfig
+    FAISSIndexConfig,
+    FAISSNativeIndexConfig
 )
 
 
@@ -15,6 +17,7 @@ class IndexConfigFactory:
             "vector": self._create_vector_config,
             "colbert": self._create_colbert_config,
             "faiss": self._create_faiss_config,
+            "faiss_native": self._create_faiss_native_config,
         }
 
     def get_config(self, config, persist_path):
@@ -23,6 +26,12 @@ class IndexConfigFactory:
 
     @staticmethod
     def _create_vector_config(config, persist_path):
+        if config.vdb_vector_backend == "numpy":
+            return NumpyVectorIndexConfig(
+                persist_path=persist_path,
+                embed_model=get_rag_embedding(config.embedding.api_type, config),
+                mmap=config.vdb_mmap
+            )
         return VectorIndexConfig(
             persist_path=persist_path,
             embed_model=get_rag_embedding(config.embedding.api_type, config)
@@ -32,7 +41,17 @@ class IndexConfigFactory:
     def _create_faiss_config(config, persist_path):
         return FAISSIndexConfig(
             persist_path=persist_path,
-            embed_model=get_rag_embedding(config.embedding.api_type, config)
+            embed_model=get_rag_embedding(config.embedding.api_type, config),
+            faiss=config.faiss
+        )
+
+    @staticmethod
+    def _create_faiss_native_config(config, persist_path):
+        return FAISSNativeIndexConfig(
+            persist_path=persist_path,
+            embed_model=get_rag_embedding(config.embedding.api_type, config),
+            faiss=config.faiss,
+            mmap=config.vdb_mmap
         )
 
     @staticmethod
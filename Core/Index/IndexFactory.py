@@ -5,11 +5,15 @@ from Core.Index.ColBertIndex import ColBertIndex
 from Core.Index.Schema import (
     BaseIndexConfig,
     VectorIndexConfig,
+    NumpyVectorIndexConfig,
     ColBertIndexConfig,
-    FAISSIndexConfig
+    FAISSIndexConfig,
+    FAISSNativeIndexConfig
 )
 from Core.Index.VectorIndex import VectorIndex
 from Core.Index.FaissIndex import FaissIndex
+from Core.Index.FaissNativeIndex import FaissNativeIndex
+from Core.Index.NumpyVectorIndex import NumpyVectorIndex
 from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
 
 
@@ -17,8 +21,10 @@ class RAGIndexFactory(ConfigBasedFactory):
     def __init__(self):
         creators = {
             VectorIndexConfig: self._create_vector_index,
+            NumpyVectorIndexConfig: self._create_numpy_vector_index,
             ColBertIndexConfig: self._create_colbert,
             FAISSIndexConfig: self._create_faiss,
+            FAISSNativeIndexConfig: self._create_faiss_native,
 
         }
         super().__init__(creators)
@@ -31,6 +37,10 @@ class RAGIndexFactory(ConfigBasedFactory):
     def _create_vector_index(cls, config):
         return VectorIndex(config)
 
+    @classmethod
+    def _create_numpy_vector_index(cls, config):
+        return NumpyVectorIndex(config)
+
     @classmethod
     def _create_colbert(cls, config: ColBertIndexConfig):
         return ColBertIndex(config)
@@ -39,5 +49,8 @@ class RAGIndexFactory(ConfigBasedFactory):
     def _create_faiss(self, config):
        return FaissIndex(config)
 
+    def _create_faiss_native(self, config):
+        return FaissNativeIndex(config)
+
 
 get_index = RAGIndexFactory().get_index
@@ -0,0 +1,206 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from Core.Common.Logger import logger
+from Core.Common.Utils import mdhash_id
+
+
+class LexicalIndex:
+    """
+    Base of the persistent term-weighting indexes of keyed documents (`TFIDFIndex`, `BM25Index`).
+
+    The raw term counts of the documents are kept, so that `update` only tokenizes the new and changed documents (by
+    content hash) before the subclass re-weights the whole count matrix in `_refit`. The weights are kept as an inverted
+    index: a (terms, docs) CSR matrix, whose row of a term is its posting list (doc rows and weights in two compact
+    arrays). A batch of queries is scored with one sparse product, which only reads the postings of the query terms,
+    and ranked with an `argpartition` top-k.
+
+    The term counts, the postings (sparse `.npz`), the vocabulary, the idf and the keys with the content hash of their
+    documents are persisted under the namespace, the file names being prefixed by `NAME`.
+    """
+    NAME = "lexical"
+
+    def __init__(self, namespace=None):
+        self.namespace = namespace
+        # Lowercased words of two characters or more, as TfidfVectorizer tokenizes
+        self._analyzer = TfidfVectorizer().build_analyzer()
+        self.clear()
+
+    def clear(self):
+        self.keys: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._hashes: list[str] = []
+        self._vocabulary: dict[str, int] = {}
+        self._counts = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.idf = np.empty(0, dtype=np.float64)
+        self.postings = sparse.csr_matrix((0, 0), dtype=np.float64)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.keys)
+
+    def _file(self, suffix: str) -> str:
+        return f"{self.NAME}_{suffix}"
+
+    def _count(self, docs: list[str], grow: bool) -> sparse.csr_matrix:
+        """The (len(docs), |vocabulary|) term counts, adding the unknown terms to the vocabulary if `grow`."""
+        rows, cols = [], []
+        for row, doc in enumerate(docs):
+            for term in self._analyzer(doc or ""):
+                col = self._vocabulary.get(term)
+                if col is None:
+                    if not grow:
+                        continue
+                    col = self._vocabulary[term] = len(self._vocabulary)
+                rows.append(row)
+                cols.append(col)
+        # The duplicate (row, col) entries are summed into the counts
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(docs), len(self._vocabulary)))
+
+    def _document_frequencies(self) -> np.ndarray:
+        return np.bincount(self._counts.indices, minlength=self._counts.shape[1])
+
+    def _refit(self):
+        """Set `idf` and `postings` from the term counts."""
+        raise NotImplementedError
+
+    def _query_vectors(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        """The (Q, |vocabulary|) vectors of the queries, from their term counts."""
+        raise NotImplementedError
+
+    def _build_index_from_list(self, docs_list: list[str], keys: Optional[list[str]] = None):
+        self.clear()
+        self.keys = list(keys) if keys is not None else [str(idx) for idx in range(len(docs_list))]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._hashes = [mdhash_id(doc or "") for doc in docs_list]
+        self._counts = self._count(docs_list, grow=True)
+        self._refit()
+
+    async def update(self, keys: list[str], docs: list[str]) -> bool:
+        """
+        Bring the index up to date with the keyed documents, returns whether anything changed.
+
+        Only the new documents and those whose content changed are tokenized, the removed keys are dropped.
+        """
+        hashes = [mdhash_id(doc or "") for doc in docs]
+        changed = [idx for idx, (key, doc_hash) in enumerate(zip(keys, hashes))
+                   if key not in self._rows or self._hashes[self._rows[key]] != doc_hash]
+        kept_keys = set(keys).difference(keys[idx] for idx in changed)
+        kept_rows = [row for row, key in enumerate(self.keys) if key in kept_keys]
+        if not changed and len(kept_rows) == self.num_docs:
+            return False
+        logger.info(f"Updating the {self.NAME} index: {len(changed)} new / changed and "
+                    f"{self.num_docs - len(kept_rows) - sum(keys[idx] in self._rows for idx in changed)} removed documents")
+
+        new_counts = self._count([docs[idx] for idx in changed], grow=True)
+        kept_counts = self._counts[kept_rows]
+        kept_counts.resize((len(kept_rows), len(self._vocabulary)))
+        self._counts = sparse.vstack([kept_counts, new_counts], format="csr")
+        self.keys = [self.keys[row] for row in kept_rows] + [keys[idx] for idx in changed]
+        self._hashes = [self._hashes[row] for row in kept_rows] + [hashes[idx] for idx in changed]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._refit()
+        return True
+
+    def transform(self, queries: list[str]) -> sparse.csr_matrix:
+        """The vectors of the queries over the vocabulary of the documents, their unknown terms being dropped."""
+        return self._query_vectors(self._count(queries, grow=False))
+
+    def scores(self, queries: list[str]) -> np.ndarray:
+        """The dense (Q, num_docs) scores of the documents for every query."""
+        if self.num_docs == 0:
+            return np.zeros((len(queries), 0))
+        return (self.transform(queries) @ self.postings).toarray()
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        top_k = min(top_k, len(scores))
+        if top_k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def query(self, query_str: str, top_k: int = 10, candidates: Optional[list[str]] = None):
+        """
+        Retrieval the top_k documents of the query.
+
+        Args:
+            candidates: The keys to search among, all the documents if None.
+
+        Returns: the rows of the top_k documents, or the top_k candidates if given.
+        """
+        return self.query_batch([query_str], top_k, candidates)[0]
+
+    def query_batch(self, queries: list[str], top_k: int = 10, candidates: Optional[list[str]] = None):
+        """`query` for several queries, with one sparse product for all of them."""
+        scores = self.scores(queries)
+        if candidates is not None:
+            candidates = [key for key in dict.fromkeys(candidates) if key in self._rows]
+            if len(candidates) < self.num_docs:
+                scores = scores[:, [self._rows[key] for key in candidates]]
+            else:
+                # Every document is a candidate, e.g., the whole graph
+                candidates = self.keys
+        results = [self._top_k(query_scores, top_k) for query_scores in scores]
+        if candidates is not None:
+            return [[candidates[idx] for idx in result.tolist()] for result in results]
+        return results
+
+    def query_keys(self, query_str: str, top_k: int = 10, candidates: Optional[list[str]] = None) -> list[str]:
+        """The keys of the top_k documents (among the candidates)."""
+        return self.query_keys_with_scores(query_str, top_k, candidates)[0]
+
+    def query_keys_with_scores(self, query_str: str, top_k: int = 10,
+                               candidates: Optional[list[str]] = None) -> tuple[list[str], np.ndarray]:
+        """The keys of the top_k documents (among the candidates) and their scores."""
+        scores = self.scores([query_str])[0]
+        if candidates is not None:
+            keys = [key for key in dict.fromkeys(candidates) if key in self._rows]
+            scores = scores[[self._rows[key] for key in keys]]
+        else:
+            keys = self.keys
+        top = self._top_k(scores, top_k)
+        return [keys[idx] for idx in top.tolist()], scores[top]
+
+    async def load(self, force: bool = False) -> bool:
+        if force or not self.namespace:
+            return False
+        meta_file = self.namespace.get_load_path(self._file("meta.json"))
+        if meta_file is None or not os.path.exists(meta_file):
+            logger.info(f"No {self.NAME} index found, it will be built.")
+            return False
+        try:
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+            self._counts = sparse.load_npz(self.namespace.get_load_path(self._file("counts.npz"))).tocsr()
+            self.postings = sparse.load_npz(self.namespace.get_load_path(self._file("postings.npz"))).tocsr()
+        except Exception as e:
+            logger.error(f"Failed to load the {self.NAME} index: {e}! Need to re-build it.")
+            self.clear()
+            return False
+        self.keys, self._hashes = meta["keys"], meta["hashes"]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._vocabulary = {term: col for col, term in enumerate(meta["vocabulary"])}
+        self.idf = np.asarray(meta["idf"], dtype=np.float64)
+        logger.info(f"Successfully loaded the {self.NAME} index of {self.num_docs} documents, "
+                    f"{len(self._vocabulary)} terms.")
+        return True
+
+    async def persist(self):
+        if not self.namespace:
+            return
+        try:
+            sparse.save_npz(self.namespace.get_save_path(self._file("counts.npz")), self._counts)
+            sparse.save_npz(self.namespace.get_save_path(self._file("postings.npz")), self.postings)
+            # The meta file is written last, it marks the index as complete
+            with open(self.namespace.get_save_path(self._file("meta.json")), "w") as f:
+                json.dump({"keys": self.keys, "hashes": self._hashes, "vocabulary": list(self._vocabulary),
+                           "idf": self.idf.tolist()}, f, ensure_ascii=False)
+            logger.info(f"Saving the {self.NAME} index of {self.num_docs} documents.")
+        except Exception as e:
+            logger.error(f"Error saving the {self.NAME} index: {e}")
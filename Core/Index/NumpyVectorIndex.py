@@ -0,0 +1,100 @@
+import os
+
+import faiss
+import numpy as np
+
+from Core.Index.FaissNativeIndex import FaissNativeIndex
+
+# Queries scored at once by `BruteForceIndex.search`, bounding the (queries, vectors) score matrix
+SEARCH_BLOCK_SIZE = 256
+
+
+class BruteForceIndex:
+    """
+    Exact cosine-similarity search over a contiguous float32 matrix of unit vectors, with the interface of the faiss
+    indexes used by `FaissNativeIndex` (`search`, `add_with_ids`, `reconstruct_batch`, `ntotal`).
+
+    A search is one matrix product of the query block with the matrix and an `argpartition` top-k. Vectors cannot be
+    removed (`remove_ids` raises, as for HNSW), the deleted rows are tombstoned by the owning index instead.
+    """
+    metric_type = faiss.METRIC_INNER_PRODUCT
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray):
+        self.vectors = vectors
+        # The ids are ascending, they are the rows of the elements in the owning index
+        self.ids = ids
+
+    @classmethod
+    def empty(cls, dim: int) -> "BruteForceIndex":
+        return cls(np.empty((0, dim), dtype=np.float32), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def load(cls, vectors_path: str, ids_path: str, mmap: bool = False) -> "BruteForceIndex":
+        mmap_mode = "r" if mmap else None
+        return cls(np.load(vectors_path, mmap_mode=mmap_mode), np.load(ids_path))
+
+    def save(self, vectors_path: str, ids_path: str):
+        np.save(vectors_path, self.vectors)
+        np.save(ids_path, self.ids)
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray):
+        self.vectors = np.ascontiguousarray(np.vstack([self.vectors, self._normalize(vectors)]))
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def remove_ids(self, ids):
+        raise RuntimeError("BruteForceIndex does not support removals")
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[np.searchsorted(self.ids, ids)])
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """The (Q, k) cosine similarities and ids of the nearest vectors, padded with -inf / -1 as faiss does."""
+        queries = self._normalize(queries)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        top_k = min(k, self.ntotal)
+        if top_k == 0:
+            return scores, ids
+        for start in range(0, len(queries), SEARCH_BLOCK_SIZE):
+            block_scores = queries[start:start + SEARCH_BLOCK_SIZE] @ self.vectors.T
+            top = np.argpartition(-block_scores, top_k - 1, axis=1)[:, :top_k]
+            top_scores = np.take_along_axis(block_scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            end = start + len(block_scores)
+            scores[start:end, :top_k] = np.take_along_axis(top_scores, order, axis=1)
+            ids[start:end, :top_k] = self.ids[np.take_along_axis(top, order, axis=1)]
+        return scores, ids
+
+
+class NumpyVectorIndex(FaissNativeIndex):
+    """
+    Brute-force mode of the vector index: the unit-normalized embeddings are kept in one float32 matrix, optionally
+    memory-mapped from disk, and searched exactly by cosine similarity, as the llama_index `VectorIndex` scores them,
+    without its node parsing, docstore and per-query retriever calls.
+
+    The metadata, content hashes, upserts and deletes are those of `FaissNativeIndex`, with a `BruteForceIndex` in
+    place of the faiss index.
+    """
+    INDEX_NAME = "vectors.npy"
+    IDS_NAME = "ids.npy"
+
+    def _new_index(self, embeddings: np.ndarray):
+        return BruteForceIndex.empty(embeddings.shape[1])
+
+    def _read_index(self, mmap: bool):
+        return BruteForceIndex.load(os.path.join(self.config.persist_path, self.INDEX_NAME),
+                                    os.path.join(self.config.persist_path, self.IDS_NAME), mmap=mmap)
+
+    def _write_index(self):
+        self._index.save(os.path.join(self.config.persist_path, self.INDEX_NAME),
+                         os.path.join(self.config.persist_path, self.IDS_NAME))
@@ -6,6 +6,8 @@ from typing import Optional, Union
 from llama_index.core.embeddings import BaseEmbedding
 from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 
+from Config.FaissConfig import FaissConfig
+
 
 class BaseIndexConfig(BaseModel):
     """Common config for index.
@@ -24,6 +26,11 @@ class VectorIndexConfig(BaseIndexConfig):
     embed_model: BaseEmbedding = Field(default=None, description="Embed model.")
 
 
+class NumpyVectorIndexConfig(VectorIndexConfig):
+    """Config for the brute-force mode of the vector index: a float32 matrix searched exactly with NumPy."""
+    mmap: bool = Field(default=False, description="Memory-map the vector matrix on load.")
+
+
 class ColBertIndexConfig(BaseIndexConfig):
     """Option for colbert-based index."""
     index_name: str = Field(default="", description="The name of the index.")
@@ -39,3 +46,9 @@ class ColBertIndexConfig(BaseIndexConfig):
 
 class FAISSIndexConfig(VectorIndexConfig):
     """Config for faiss-based index."""
+    faiss: FaissConfig = Field(default_factory=FaissConfig, description="The faiss index family and its parameters.")
+
+
+class FAISSNativeIndexConfig(FAISSIndexConfig):
+    """Config for the faiss-native index: a raw faiss index plus a columnar metadata sidecar, without llama_index."""
+    mmap: bool = Field(default=False, description="Memory-map the faiss index on load (faiss.IO_FLAG_MMAP).")
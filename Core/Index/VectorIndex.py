@@ -6,7 +6,7 @@ from llama_index.core.schema import (
     Document
 )
 from llama_index.core import StorageContext, load_index_from_storage, VectorStoreIndex, Settings
-from Core.Index.BaseIndex import BaseIndex, VectorIndexNodeResult, VectorIndexEdgeResult
+from Core.Index.BaseIndex import BaseIndex, VectorIndexNodeResult, VectorIndexEdgeResult, element_key, element_keys
 import asyncio
 from llama_index.core.node_parser import SimpleNodeParser
 from llama_index.core.schema import QueryBundle
@@ -21,6 +21,8 @@ class VectorIndex(BaseIndex):
 
     def __init__(self, config):
         super().__init__(config)
+        # Element key -> ref doc id, see `_indexed_docs`
+        self._key_docs: dict[str, str] = {}
 
     async def retrieval(self, query, top_k):
         if top_k is None:
@@ -46,9 +48,38 @@ class VectorIndex(BaseIndex):
         return await result.get_edge_data(graph, need_score)
 
     async def retrieval_batch(self, queries, top_k):
-        pass
+        """
+        Batched `retrieval`: all the queries are embedded with one batched embedding call, the retriever then only
+        searches the store with the given embeddings.
+
+        Returns:
+            list[list[NodeWithScore]]: The retrieved nodes of every query.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        if top_k is None:
+            top_k = self._get_retrieve_top_k()
+        if len(queries) == 0:
+            return []
+        retriever = self._index.as_retriever(similarity_top_k=top_k, embed_model=self.config.embed_model)
+        query_embs = self.config.embed_model.get_text_embedding_batch(queries)
+        return await asyncio.gather(
+            *[retriever.aretrieve(QueryBundle(query_str=query, embedding=query_emb))
+              for query, query_emb in zip(queries, query_embs)])
 
-    async def _update_index(self, datas: list[dict[str:Any]], meta_data: list):
+    async def retrieval_nodes_batch(self, queries, top_k, graph, need_score=False, tree_node=False):
+        results = [VectorIndexNodeResult(query_results) for query_results in await self.retrieval_batch(queries, top_k)]
+        if tree_node:
+            return await asyncio.gather(*[result.get_tree_node_data(graph, need_score) for result in results])
+        else:
+            return await asyncio.gather(*[result.get_node_data(graph, need_score) for result in results])
+
+    async def retrieval_edges_batch(self, queries, top_k, graph, need_score=False):
+        results = [VectorIndexEdgeResult(query_results) for query_results in await self.retrieval_batch(queries, top_k)]
+        return await asyncio.gather(*[result.get_edge_data(graph, need_score) for result in results])
+
+    @staticmethod
+    async def _parse_nodes(datas: list[dict[str:Any]], meta_data: list):
         async def process_document(data):
             document = Document(
                 doc_id=mdhash_id(data["content"]),
@@ -63,7 +94,10 @@ class VectorIndex(BaseIndex):
             chunk_size=2048
         )
         # parser = SimpleNodeParser.from_defaults()
-        nodes = parser.get_nodes_from_documents(documents)
+        return parser.get_nodes_from_documents(documents)
+
+    async def _update_index(self, datas: list[dict[str:Any]], meta_data: list):
+        nodes = await self._parse_nodes(datas, meta_data)
         self._index = VectorStoreIndex(nodes)
         logger.info("refresh index size is {}".format(len(nodes)))
 
@@ -78,8 +112,38 @@ class VectorIndex(BaseIndex):
             logger.error("Loading index error: {}".format(e))
             return False
 
-    async def upsert(self, data: dict[str: Any]):
-        pass
+    def _indexed_docs(self, meta_data=None) -> dict[str, str]:
+        """
+        Element key -> ref doc id of the indexed elements, keyed by the `meta_data` values of their metadata, or by all
+        of them. The ref doc id is the content hash of the element.
+        """
+        return {element_key(list(node.metadata.values()) if meta_data is None
+                            else [node.metadata.get(key, "") for key in meta_data]): node.ref_doc_id
+                for node in self._index.docstore.docs.values()}
+
+    def _indexed_hashes(self, meta_data):
+        self._key_docs = self._indexed_docs(meta_data)
+        return self._key_docs
+
+    async def upsert(self, elements, meta_data):
+        """Embed and insert the elements, after deleting the indexed elements with the same key."""
+        if len(elements) == 0:
+            return
+        indexed_docs = self._indexed_docs(meta_data)
+        await self._delete_docs([indexed_docs[key] for key in element_keys(elements, meta_data) if key in indexed_docs])
+        self._index.insert_nodes(await self._parse_nodes(elements, meta_data))
+
+    async def delete(self, keys):
+        # The keys of a public delete are built from all the metadata values, e.g., `entity_name` alone
+        self._key_docs = self._indexed_docs()
+        await super().delete(keys)
+
+    async def _delete_keys(self, keys: list[str]):
+        await self._delete_docs([self._key_docs[key] for key in keys if key in self._key_docs])
+
+    async def _delete_docs(self, ref_doc_ids: list[str]):
+        for ref_doc_id in dict.fromkeys(ref_doc_ids):
+            self._index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
 
     def exist_index(self):
         return os.path.exists(self.config.persist_path)
@@ -105,25 +169,3 @@ class VectorIndex(BaseIndex):
     async def _similarity_score(self, object_q, object_d):
         # For llama_index based vector database, we do not need it now!
         pass
-
-    async def retrieval_nodes_with_score_matrix(self, query_list, top_k, graph):
-        if isinstance(query_list, str):
-            query_list = [query_list]
-        results = await asyncio.gather(
-            *[self.retrieval_nodes(query, top_k, graph, need_score=True) for query in query_list])
-        reset_prob_matrix = np.zeros((len(query_list), graph.node_num))
-        entity_indices = []
-        scores = []
-
-        async def set_idx_score(idx, res):
-            for entity, score in zip(res[0], res[1]):
-                entity_indices.append(await graph.get_node_index(entity["entity_name"]))
-                scores.append(score)
-
-        await asyncio.gather(*[set_idx_score(idx, res) for idx, res in enumerate(results)])
-        reset_prob_matrix[np.arange(len(query_list)).reshape(-1, 1), entity_indices] = scores
-        all_entity_weights = reset_prob_matrix.max(axis=0)  # (1, #all_entities)
-
-        # Normalize the scores
-        all_entity_weights /= all_entity_weights.sum()
-        return all_entity_weights
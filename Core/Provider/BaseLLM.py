@@ -7,6 +7,8 @@
 """
 from __future__ import annotations
 
+import asyncio
+import copy
 import json
 from abc import ABC, abstractmethod
 from typing import Optional, Union
@@ -23,11 +25,14 @@ from tenacity import (
 
 
 from Config.LLMConfig import LLMConfig
-from Core.Common.Constants import LLM_API_TIMEOUT, USE_CONFIG_TIMEOUT
+from Core.Common.Constants import LLM_API_TIMEOUT, LLM_PRIORITY_INTERACTIVE, USE_CONFIG_TIMEOUT
 from Core.Common.Logger import logger
 from Core.Schema.Message import Message
 from Core.Common.Utils import log_and_reraise
 from Core.Common.CostManager import CostManager, Costs
+from Core.Utils.TokenCounter import count_input_tokens
+from Core.Provider.LLMResponseCache import LLMCacheMissError, LLMResponseCache
+from Core.Provider.LLMScheduler import LLMScheduler
 
 
 class BaseLLM(ABC):
@@ -40,6 +45,9 @@ class BaseLLM(ABC):
     # OpenAI / Azure / Others
     aclient: Optional[Union[AsyncOpenAI]] = None
     cost_manager: Optional[CostManager] = None
+    response_cache: Optional[LLMResponseCache] = None
+    scheduler: Optional[LLMScheduler] = None
+    _in_flight: Optional[dict] = None
     model: Optional[str] = None  # deprecated
     pricing_plan: Optional[str] = None
    
@@ -127,7 +135,46 @@ class BaseLLM(ABC):
         stream=None,
         max_tokens = None,
         format = "text",
+        cache_namespace: str = "default",
+        priority: int = LLM_PRIORITY_INTERACTIVE,
     ) -> str:
+        message = self._build_messages(msg, system_msgs, format_msgs, images)
+        if stream is None:
+            stream = self.config.stream
+        # logger.debug(message)
+        key = None
+        if self.response_cache is not None or self.config.coalesce_requests:
+            key = LLMResponseCache.make_key(self.model or self.config.model, message, max_tokens, format,
+                                            self.config.temperature)
+        if self.config.coalesce_requests and key in self._in_flight_requests:
+            # Single flight: an identical request is already running, share its response
+            if self.cost_manager:
+                self.cost_manager.update_coalesced_calls()
+            rsp = await asyncio.shield(self._in_flight_requests[key])
+            return copy.deepcopy(rsp)
+        if self.response_cache is not None:
+            hit, rsp = self.response_cache.get(cache_namespace, key)
+            if self.cost_manager:
+                self.cost_manager.update_cache_stats(hit)
+            if hit:
+                return rsp
+            if self.response_cache.read_only:
+                raise LLMCacheMissError(cache_namespace, key)
+        request = self._scheduled_completion(message, key, cache_namespace, stream=stream, timeout=timeout,
+                                             max_tokens=max_tokens, format=format, priority=priority)
+        if not self.config.coalesce_requests:
+            return await request
+        task = asyncio.ensure_future(request)
+        self._in_flight_requests[key] = task
+        task.add_done_callback(lambda done: self._finish_in_flight_request(key, done))
+        # Shielded, so that cancelling this caller does not cancel the request shared with the coalesced ones. Every
+        # caller gets its own copy of a parsed JSON response
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _build_messages(self, msg: Union[str, list[dict[str, str]]], system_msgs: Optional[list[str]] = None,
+                        format_msgs: Optional[list[dict[str, str]]] = None,
+                        images: Optional[Union[str, list[str]]] = None) -> list[dict]:
+        """The messages of an `aask` request: the system prompt, the format messages, then the user message(s)."""
         if system_msgs:
             message = self._system_msgs(system_msgs)
         else:
@@ -140,13 +187,38 @@ class BaseLLM(ABC):
             message.append(self._user_msg(msg, images=images))
         else:
             message.extend(msg)
-        if stream is None:
-            stream = self.config.stream
-        # logger.debug(message)
-        async with self.semaphore:
-         rsp = await self.acompletion_text(message, stream=stream, timeout=self.get_timeout(timeout), max_tokens = max_tokens, format = format)
+        return message
+
+    @property
+    def _in_flight_requests(self) -> dict[str, asyncio.Future]:
+        # Request key -> task of the running request, per instance
+        if self._in_flight is None:
+            self._in_flight = {}
+        return self._in_flight
+
+    def _finish_in_flight_request(self, key: str, task: asyncio.Future):
+        self._in_flight_requests.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved, every caller may have been cancelled
+            task.exception()
+
+    async def _scheduled_completion(self, message: list[dict], key: Optional[str], cache_namespace: str, stream,
+                                    timeout, max_tokens, format, priority: int):
+        if self.scheduler is None:
+            self.scheduler = LLMScheduler.from_config(self.config)
+        tokens = self._estimate_request_tokens(message, max_tokens) if self.scheduler.counts_tokens else 0
+        rsp = await self.scheduler.submit(
+            lambda: self.acompletion_text(message, stream=stream, timeout=self.get_timeout(timeout),
+                                          max_tokens=max_tokens, format=format),
+            tokens=tokens, priority=priority)
+        if self.response_cache is not None:
+            self.response_cache.put(cache_namespace, key, rsp)
         return rsp
 
+    def _estimate_request_tokens(self, messages: list[dict], max_tokens: Optional[int]) -> int:
+        """The tokens a request counts against a TPM budget: its prompt plus its completion budget."""
+        return count_input_tokens(messages, self.pricing_plan or self.model or "") + (max_tokens or self.config.max_token)
+
     def _extract_assistant_rsp(self, context):
         return "\n".join([i["content"] for i in context if i["role"] == "assistant"])
 
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : FakeLLM.py
+@Desc    : Offline stand-in of an LLM endpoint, with canned or rule-generated responses and a simulated latency
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from typing import Callable, Optional
+
+from Config.LLMConfig import LLMConfig, LLMType
+from Core.Common.Constants import (
+    DEFAULT_COMPLETION_DELIMITER,
+    DEFAULT_RECORD_DELIMITER,
+    DEFAULT_TUPLE_DELIMITER,
+    TOKEN_TO_CHAR_RATIO,
+    USE_CONFIG_TIMEOUT
+)
+from Core.Common.CostManager import CostManager
+from Core.Common.Logger import logger
+from Core.Common.Utils import prase_json_from_response
+from Core.Prompt import CommunityPrompt, GraphPrompt, QueryPrompt, TogPrompt
+from Core.Provider.BaseLLM import BaseLLM
+from Core.Provider.LLMProviderRegister import register_provider
+from Core.Provider.LLMScheduler import LLMScheduler
+from Core.Utils.ByteTokenizer import is_offline_encoding
+from Core.Utils.TokenCounter import count_input_tokens, count_output_tokens
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+# The tokenizer and prices of the usage, the fake model having none
+DEFAULT_PRICING_PLAN = "gpt-4o-mini"
+MAX_ENTITIES = 8
+MAX_DESCRIPTION_LENGTH = 200
+NUM_TOG_ANSWERS = 10
+
+_PHRASE_PATTERN = re.compile(r"\b[A-Z][\w'-]*(?:[ \t]+[A-Z][\w'-]*)*")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def _head(template: str, length: int = 60) -> str:
+    """A literal prefix identifying the prompts of a template, cut before its first placeholder."""
+    return re.split(r"%s|\{", template.strip(), maxsplit=1)[0][:length]
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _after(text: str, marker: str) -> str:
+    idx = text.rfind(marker)
+    return text[idx + len(marker):] if idx != -1 else text
+
+
+def _fenced(text: str) -> str:
+    """The content of the last ``` fenced block of the text."""
+    parts = text.split("```")
+    return parts[-2] if len(parts) >= 3 else text
+
+
+def _phrases(text: str) -> list[str]:
+    """The capitalized phrases of the text as entities, or its first long words if it has none."""
+    phrases = list(dict.fromkeys(match.strip() for match in _PHRASE_PATTERN.findall(text)))
+    if not phrases:
+        phrases = list(dict.fromkeys(word for word in re.findall(r"\w+", text.lower()) if len(word) > 3))
+    return phrases[:MAX_ENTITIES]
+
+
+def _describe(phrase: str, text: str) -> str:
+    """The first sentence of the text mentioning the phrase."""
+    for sentence in _SENTENCE_PATTERN.split(text):
+        if phrase in sentence:
+            return sentence.strip().replace('"', "'")[:MAX_DESCRIPTION_LENGTH]
+    return phrase
+
+
+def _scores(items: list[str]) -> list[float]:
+    """Deterministic pseudo-random scores of the items, summing to 1."""
+    weights = [1 + _stable_hash(item) % 9 for item in items]
+    return [round(weight / sum(weights), 2) for weight in weights]
+
+
+@register_provider(LLMType.FAKE)
+class FakeLLM(BaseLLM):
+    """
+    LLM provider answering without any network, to run `GraphRAG.insert` / `query` end to end in the tests and to
+    load-test the pipeline's own overhead (scheduling, caching, token counting, graph merges, retrieval).
+
+    The last user message is first matched against the `fake_responses` regexes, whose canned response is returned
+    as is. Otherwise the prompt templates of the repo are recognized and answered with valid, deterministic outputs
+    built from the capitalized phrases of their input: NER and OpenIE JSON, entity / relationship records (and the NO of
+    the gleaning loop), KG agent nodes, query keywords, community reports and the ToG relation / entity scores and
+    answers. Any other prompt gets an echo of its phrases.
+
+    Every request goes through the scheduler and sleeps for a latency drawn from the `fake_latency` distribution, whose
+    mean and standard deviation are `fake_latency_mean` and `fake_latency_std` (seeded by `fake_seed`). The usage is
+    counted with the tokenizer and prices of `pricing_plan` (gpt-4o-mini by default) unless `calc_usage` is off. When
+    the tokenizer is unavailable (its encoding is downloaded on first use, which fails offline) or the offline byte
+    encoding is in use, the tokens are estimated from the text length.
+    """
+
+    def __init__(self, config: LLMConfig):
+        if config.fake_latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown fake latency distribution: {config.fake_latency}, "
+                             f"expected one of {LATENCY_DISTRIBUTIONS}")
+        self.config = config
+        self.model = config.model or "fake"
+        self.pricing_plan = config.pricing_plan or DEFAULT_PRICING_PLAN
+        self._has_tokenizer = True
+        self.cost_manager: Optional[CostManager] = None
+        self.scheduler = LLMScheduler.from_config(config)
+        self._rng = random.Random(config.fake_seed)
+        self._canned = [(re.compile(pattern, re.DOTALL), response) for pattern, response in config.fake_responses.items()]
+        # Checked in order: a gleaning context repeats the whole extraction prompt before its last question
+        self._rules: list[tuple[Callable[[str], bool], Callable[[str], str]]] = [
+            (lambda p: p.rstrip().endswith(GraphPrompt.ENTITY_IF_LOOP_EXTRACTION.strip()), lambda p: "NO"),
+            (lambda p: p.rstrip().endswith(GraphPrompt.ENTITY_CONTINUE_EXTRACTION.strip()),
+             lambda p: DEFAULT_COMPLETION_DELIMITER),
+            (lambda p: _head(GraphPrompt.NER) in p, self._ner),
+            (lambda p: _head(GraphPrompt.OPENIE_POST_NET) in p, self._openie),
+            (lambda p: _head(GraphPrompt.ENTITY_EXTRACTION) in p or _head(GraphPrompt.ENTITY_EXTRACTION_KEYWORD) in p,
+             self._records),
+            (lambda p: _head(GraphPrompt.KG_AGNET) in p, self._kg_agent),
+            (lambda p: _head(QueryPrompt.KEYWORDS_EXTRACTION) in p, self._keywords),
+            (lambda p: _head(CommunityPrompt.COMMUNITY_REPORT) in p, self._community_report),
+            (lambda p: _head(GraphPrompt.SUMMARIZE_ENTITY_DESCRIPTIONS) in p, self._summary),
+            (lambda p: _head(TogPrompt.extract_relation_prompt) in p, self._tog_relations),
+            (lambda p: _head(TogPrompt.score_entity_candidates_prompt) in p, self._tog_entities),
+            (lambda p: "(Yes or No)" in p, lambda p: "{Yes}. " + ", ".join(_phrases(_after(p, "Q:")))),
+            (lambda p: "{yes} or {no}" in p, self._tog_answers),
+        ]
+
+    def respond(self, prompt: str) -> str:
+        """The response text to a prompt (the last user message)."""
+        for pattern, response in self._canned:
+            if pattern.search(prompt):
+                return response
+        for matches, answer in self._rules:
+            if matches(prompt):
+                return answer(prompt)
+        return "Answer: " + ", ".join(_phrases(prompt[-2000:]))
+
+    def _ner(self, prompt: str) -> str:
+        return json.dumps({"named_entities": _phrases(_fenced(prompt))})
+
+    def _openie(self, prompt: str) -> str:
+        passage = _fenced(prompt)
+        try:
+            entities = json.loads(_after(prompt, "```").strip())["named_entities"]
+        except (ValueError, KeyError, TypeError):
+            entities = _phrases(passage)
+        triples = [[src, "related to", tgt] for src, tgt in zip(entities, entities[1:])]
+        return json.dumps({"named_entities": entities, "triples": triples})
+
+    def _records(self, prompt: str) -> str:
+        text = _after(prompt, "Text:").split("######################")[0].strip()
+        types = [t.strip() for t in _after(prompt, "Entity_types:").split("\n")[0].strip(" []").split(",") if t.strip()]
+        types = types or ["entity"]
+        with_keywords = "content_keywords" in prompt
+        entities = _phrases(text)
+        records = []
+        for name in entities:
+            entity_type = types[_stable_hash(name) % len(types)]
+            records.append(f'("entity"{DEFAULT_TUPLE_DELIMITER}"{name.upper()}"{DEFAULT_TUPLE_DELIMITER}'
+                           f'"{entity_type}"{DEFAULT_TUPLE_DELIMITER}"{_describe(name, text)}")')
+        for src, tgt in zip(entities, entities[1:]):
+            keywords = f'"{src.lower()}, {tgt.lower()}"{DEFAULT_TUPLE_DELIMITER}' if with_keywords else ""
+            records.append(f'("relationship"{DEFAULT_TUPLE_DELIMITER}"{src.upper()}"{DEFAULT_TUPLE_DELIMITER}'
+                           f'"{tgt.upper()}"{DEFAULT_TUPLE_DELIMITER}"{src} is related to {tgt}"'
+                           f'{DEFAULT_TUPLE_DELIMITER}{keywords}{1 + _stable_hash(src + tgt) % 9})')
+        if with_keywords:
+            records.append(f'("content_keywords"{DEFAULT_TUPLE_DELIMITER}"{", ".join(entities[:3]).lower()}")')
+        return DEFAULT_RECORD_DELIMITER.join(records) + DEFAULT_COMPLETION_DELIMITER
+
+    def _kg_agent(self, prompt: str) -> str:
+        entities = _phrases(_after(prompt, "Input:"))
+        nodes = [f"Node(id='{name}', type='Entity')" for name in entities]
+        relationships = [f"Relationship(subj=Node(id='{src}', type='Entity'), obj=Node(id='{tgt}', type='Entity'), "
+                         f"type='RelatedTo')" for src, tgt in zip(entities, entities[1:])]
+        return "Nodes:\n" + "\n".join(nodes) + "\n\nRelationships:\n" + "\n".join(relationships)
+
+    def _keywords(self, prompt: str) -> str:
+        phrases = _phrases(_after(prompt, "Retrieval:").split("######################")[0])
+        return json.dumps({"high_level_keywords": phrases[:2], "low_level_keywords": phrases})
+
+    def _community_report(self, prompt: str) -> str:
+        entities = _phrases(_after(prompt, "Text:"))
+        title = " and ".join(entities[:2]) or "Community"
+        return json.dumps({
+            "title": title,
+            "summary": f"The community of {', '.join(entities) or 'these entities'}.",
+            "rating": float(_stable_hash(title) % 10),
+            "rating_explanation": "Rule-generated rating.",
+            "findings": [{"summary": name, "explanation": f"{name} belongs to the community."} for name in entities],
+        })
+
+    def _summary(self, prompt: str) -> str:
+        return _after(prompt, "Description List:").split("#######")[0].strip()[:MAX_DESCRIPTION_LENGTH * 4]
+
+    def _tog_relations(self, prompt: str) -> str:
+        width = re.search(r"Please retrieve (\d+) relations", prompt)
+        relations = [relation.strip() for relation in _after(prompt, "Relations:").split(";") if relation.strip()]
+        relations = [relation for relation in relations if "(" not in relation and ")" not in relation]
+        relations = relations[:int(width.group(1))] if width else relations
+        return "\n".join(f"{idx + 1}. {{{relation} (Score: {score})}}: Rule-generated score."
+                         for idx, (relation, score) in enumerate(zip(relations, _scores(relations))))
+
+    def _tog_entities(self, prompt: str) -> str:
+        entities = [entity.strip() for entity in _after(prompt, "Entites:").split("\nScore:")[0].split(";")
+                    if entity.strip()]
+        return ", ".join(f"{score:.2f}" for score in _scores(entities))
+
+    def _tog_answers(self, prompt: str) -> str:
+        answers = (_phrases(_after(prompt, "Q:")) * NUM_TOG_ANSWERS)[:NUM_TOG_ANSWERS] or ["unknown"] * NUM_TOG_ANSWERS
+        return "{yes},\n" + ", ".join(f'answer{idx + 1}:"{answer}"' for idx, answer in enumerate(answers))
+
+    def _latency(self) -> float:
+        mean, std = self.config.fake_latency_mean, self.config.fake_latency_std
+        if mean <= 0:
+            return 0.0
+        if self.config.fake_latency == "uniform":
+            return max(self._rng.uniform(mean - math.sqrt(3) * std, mean + math.sqrt(3) * std), 0.0)
+        if self.config.fake_latency == "exponential":
+            return self._rng.expovariate(1 / mean)
+        if self.config.fake_latency == "lognormal":
+            sigma2 = math.log(1 + (std / mean) ** 2)
+            return self._rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return mean
+
+    async def _achat_completion(self, messages: list[dict], timeout=USE_CONFIG_TIMEOUT, max_tokens=None) -> dict:
+        await asyncio.sleep(self._latency())
+        prompt = next((message["content"] for message in reversed(messages) if message["role"] == "user"), "")
+        content = self.respond(prompt if isinstance(prompt, str) else json.dumps(prompt))
+        usage = self._calc_usage(messages, content)
+        self._update_costs(usage)
+        return {"model": self.model, "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                                  "finish_reason": "stop"}], "usage": usage}
+
+    def _calc_usage(self, messages: list[dict], rsp: str) -> dict:
+        if not self.config.calc_usage:
+            return {"prompt_tokens": 0, "completion_tokens": 0}
+        if self._has_tokenizer and not is_offline_encoding():
+            try:
+                return {"prompt_tokens": count_input_tokens(messages, self.pricing_plan),
+                        "completion_tokens": count_output_tokens(rsp, self.pricing_plan)}
+            except Exception as e:
+                logger.warning(f"No tokenizer for {self.pricing_plan} ({e}), the usage is estimated from the text length.")
+                self._has_tokenizer = False
+        return {"prompt_tokens": sum(self._estimate_tokens(str(message["content"])) for message in messages),
+                "completion_tokens": self._estimate_tokens(rsp)}
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return -(-len(text) // TOKEN_TO_CHAR_RATIO)
+
+    async def acompletion(self, messages: list[dict], timeout=USE_CONFIG_TIMEOUT, max_tokens=None) -> dict:
+        return await self._achat_completion(messages, timeout=timeout, max_tokens=max_tokens)
+
+    async def _achat_completion_stream(self, messages: list[dict], timeout=USE_CONFIG_TIMEOUT, max_tokens=None) -> str:
+        return self.get_choice_text(await self._achat_completion(messages, timeout=timeout, max_tokens=max_tokens))
+
+    async def acompletion_text(self, messages: list[dict], stream=False, timeout=USE_CONFIG_TIMEOUT, max_tokens=None,
+                               format="text") -> str:
+        rsp_text = self.get_choice_text(await self._achat_completion(messages, timeout=timeout, max_tokens=max_tokens))
+        if format == "json":
+            return prase_json_from_response(rsp_text)
+        return rsp_text
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : LLMBatch.py
+@Desc    : Offline graph extraction through a batch API: the requests are collected into JSONL jobs and resumed per request
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Optional, Union
+
+from Config.GraphConfig import GraphConfig
+from Core.Common.Constants import LLM_PRIORITY_BULK, USE_CONFIG_TIMEOUT
+from Core.Common.Logger import logger
+from Core.Common.Utils import prase_json_from_response
+from Core.Provider.BaseLLM import BaseLLM
+from Core.Provider.LLMResponseCache import LLMCacheMissError, LLMResponseCache
+from Core.Provider.LLMScheduler import LLMScheduler
+
+BATCH_MODES = ("off", "openai", "local")
+BATCH_ENDPOINT = "/v1/chat/completions"
+# The statuses of a job after which it makes no more progress, OpenAI's names
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRequestError(Exception):
+    """Raised to the extraction of a chunk when its request failed in every submitted job."""
+
+    def __init__(self, key: str, error: Any):
+        self.message = f"The batch request {key} failed: {error}"
+        super().__init__(self.message)
+
+
+class BaseBatchBackend(ABC):
+    """A batch API: runs a JSONL file of chat completion requests, keyed by their `custom_id`."""
+
+    @abstractmethod
+    async def submit(self, input_path: str) -> str:
+        """Submit the requests of the file, returns the id of the job."""
+
+    @abstractmethod
+    async def status(self, job_id: str) -> str:
+        """The status of the job, one of `TERMINAL_STATUSES` once it is over."""
+
+    @abstractmethod
+    async def output(self, job_id: str) -> list[dict]:
+        """The output lines of the job: `custom_id`, `response` (`status_code` and `body`) and `error`."""
+
+
+class OpenAIBatchBackend(BaseBatchBackend):
+    """The OpenAI Batch API (https://platform.openai.com/docs/guides/batch), half the price of the live requests."""
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    async def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                                 completion_window=self.completion_window)
+        return batch.id
+
+    async def status(self, job_id: str) -> str:
+        return (await self.client.batches.retrieve(job_id)).status
+
+    async def output(self, job_id: str) -> list[dict]:
+        batch = await self.client.batches.retrieve(job_id)
+        lines = []
+        # The failed requests are in a separate error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines.extend(json.loads(line) for line in content.text.splitlines() if line.strip())
+        return lines
+
+
+class LocalBatchBackend(BaseBatchBackend):
+    """
+    File-based stand-in of a batch API, for the tests and the endpoints without one: the requests of a job are run in
+    the background through the live client (and its scheduler, at bulk priority), their responses being appended to
+    `<job>_output.jsonl`. A job left unfinished by an interrupted process is resumed from its output file.
+    """
+
+    def __init__(self, llm: BaseLLM, work_dir: str):
+        self.llm = llm
+        self.work_dir = work_dir
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.work_dir, f"{job_id}_{suffix}")
+
+    def _read_state(self, job_id: str) -> Optional[dict]:
+        if not os.path.exists(self._path(job_id, "state.json")):
+            return None
+        with open(self._path(job_id, "state.json"), "r") as f:
+            return json.load(f)
+
+    def _write_state(self, job_id: str, state: dict):
+        with open(self._path(job_id, "state.json"), "w") as f:
+            json.dump(state, f)
+
+    async def submit(self, input_path: str) -> str:
+        job_id = f"local_{uuid.uuid4().hex[:12]}"
+        self._write_state(job_id, {"input": input_path, "status": "in_progress"})
+        self._start(job_id)
+        return job_id
+
+    async def status(self, job_id: str) -> str:
+        state = self._read_state(job_id)
+        if state is None:
+            return "failed"
+        if state["status"] == "in_progress" and job_id not in self._tasks:
+            # Submitted by an interrupted process
+            self._start(job_id)
+        return state["status"]
+
+    async def output(self, job_id: str) -> list[dict]:
+        return _read_jsonl(self._path(job_id, "output.jsonl"))
+
+    def _start(self, job_id: str):
+        self._tasks[job_id] = asyncio.ensure_future(self._run(job_id))
+
+    async def _run(self, job_id: str):
+        state = self._read_state(job_id)
+        try:
+            done = {line["custom_id"] for line in _read_jsonl(self._path(job_id, "output.jsonl"))}
+            requests = [line for line in _read_jsonl(state["input"]) if line["custom_id"] not in done]
+            if self.llm.scheduler is None:
+                self.llm.scheduler = LLMScheduler.from_config(self.llm.config)
+            with open(self._path(job_id, "output.jsonl"), "a") as output:
+                await asyncio.gather(*[self._run_request(request, output) for request in requests])
+            state["status"] = "completed"
+        except Exception as e:
+            logger.exception(f"Local batch job {job_id} failed: {e}")
+            state["status"] = "failed"
+        self._write_state(job_id, state)
+
+    async def _run_request(self, request: dict, output):
+        body = request["body"]
+        try:
+            content = await self.llm.scheduler.submit(
+                lambda: self.llm.acompletion_text(body["messages"], max_tokens=body.get("max_tokens")),
+                priority=LLM_PRIORITY_BULK)
+            # No usage: the live client already counted the costs
+            line = {"custom_id": request["custom_id"], "error": None, "response": {
+                "status_code": 200,
+                "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}}}
+        except Exception as e:
+            line = {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+        output.write(json.dumps(line, ensure_ascii=False) + "\n")
+        output.flush()
+
+
+def get_batch_backend(mode: str, llm: BaseLLM, work_dir: str, completion_window: str = "24h") -> BaseBatchBackend:
+    if mode == "openai":
+        if llm.aclient is None:
+            raise ValueError(f"The batch mode 'openai' needs an OpenAI client, {type(llm).__name__} has none")
+        return OpenAIBatchBackend(llm.aclient, completion_window)
+    if mode == "local":
+        return LocalBatchBackend(llm, work_dir)
+    raise ValueError(f"Unknown extraction batch mode: {mode}, expected one of {BATCH_MODES[1:]}")
+
+
+class _PendingRequest:
+    __slots__ = ("body", "namespace", "format", "future", "num_waiters", "attempts", "error")
+
+    def __init__(self, body: dict, namespace: str, format: str):
+        self.body = body
+        self.namespace = namespace
+        self.format = format
+        self.future = asyncio.get_running_loop().create_future()
+        self.num_waiters = 0
+        self.attempts = 0
+        self.error = None
+
+
+class BatchLLM:
+    """
+    Stand-in of the LLM during the extraction of a graph, which answers `aask` from batch jobs instead of live requests.
+
+    The extraction coroutines of all the chunks run unchanged (`gather`) until each one is either finished or waiting
+    for a response. The waiting requests are then written to a JSONL job, submitted to the backend and polled until the
+    job is over, and their responses resume the coroutines, which may ask the next round (the OpenIE after the NER, the
+    gleaning after the first extraction). A round therefore takes one job (split every `max_requests` requests).
+
+    Every response is appended to `results.jsonl` in the working directory and the submitted jobs are recorded in
+    `jobs.json`: a re-run after an interruption serves the responses already received, collects the jobs still running
+    instead of submitting their requests again, and only submits the rest. The response cache of the LLM, if any, is read
+    before and filled after the jobs, as for the live requests.
+    """
+
+    def __init__(self, llm: BaseLLM, backend: BaseBatchBackend, work_dir: str, poll_interval: float = 60.0,
+                 max_requests: int = 50000, max_retries: int = 2):
+        self.llm = llm
+        self.backend = backend
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.max_requests = max_requests
+        self.max_retries = max_retries
+        os.makedirs(work_dir, exist_ok=True)
+        self._results_path = os.path.join(work_dir, "results.jsonl")
+        self._jobs_path = os.path.join(work_dir, "jobs.json")
+        # custom_id (the response cache key of the request) -> response text
+        self._results: dict[str, str] = {line["custom_id"]: line["content"]
+                                         for line in _read_jsonl(self._results_path)}
+        self._jobs: dict[str, list[str]] = {}
+        if os.path.exists(self._jobs_path):
+            with open(self._jobs_path, "r") as f:
+                self._jobs = json.load(f)
+        self._pending: dict[str, _PendingRequest] = {}
+        self._changed = asyncio.Event()
+        if self._results or self._jobs:
+            logger.info(f"Resuming the batch extraction: {len(self._results)} responses received, "
+                        f"{len(self._jobs)} jobs submitted")
+
+    @classmethod
+    def from_config(cls, llm: BaseLLM, config: GraphConfig, work_dir: str) -> "BatchLLM":
+        backend = get_batch_backend(config.extraction_batch, llm, work_dir, config.batch_completion_window)
+        return cls(llm, backend, work_dir, config.batch_poll_interval, config.batch_max_requests,
+                   config.batch_max_retries)
+
+    def __getattr__(self, name):
+        # Everything but `aask` is the live LLM's
+        return getattr(self.llm, name)
+
+    async def aask(
+        self,
+        msg: Union[str, list[dict[str, str]]],
+        system_msgs: Optional[list[str]] = None,
+        format_msgs: Optional[list[dict[str, str]]] = None,
+        images: Optional[Union[str, list[str]]] = None,
+        timeout=USE_CONFIG_TIMEOUT,
+        stream=None,
+        max_tokens=None,
+        format="text",
+        cache_namespace: str = "default",
+        priority: int = LLM_PRIORITY_BULK,
+    ) -> Any:
+        message = self.llm._build_messages(msg, system_msgs, format_msgs, images)
+        model = self.llm.model or self.llm.config.model
+        key = LLMResponseCache.make_key(model, message, max_tokens, format, self.llm.config.temperature)
+        content = self._results.get(key)
+        if content is None and self.llm.response_cache is not None:
+            hit, rsp = self.llm.response_cache.get(cache_namespace, key)
+            if self.llm.cost_manager:
+                self.llm.cost_manager.update_cache_stats(hit)
+            if hit:
+                return rsp
+            if self.llm.response_cache.read_only:
+                raise LLMCacheMissError(cache_namespace, key)
+        if content is None:
+            request = self._pending.get(key)
+            if request is None:
+                body = {"model": model, "messages": message, "max_tokens": max_tokens or self.llm.config.max_token,
+                        "temperature": self.llm.config.temperature}
+                request = self._pending[key] = _PendingRequest(body, cache_namespace, format)
+            request.num_waiters += 1
+            self._changed.set()
+            content = await request.future
+        # Parsed for every caller, which may modify its copy
+        return prase_json_from_response(content) if format == "json" else content
+
+    async def gather(self, coros: list[Awaitable]) -> list:
+        """`asyncio.gather` of the extraction coroutines, their LLM requests being answered round by round by jobs."""
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        for task in tasks:
+            task.add_done_callback(lambda _: self._changed.set())
+        try:
+            while not all(task.done() for task in tasks):
+                await self._settle(tasks)
+                if self._pending:
+                    await self._flush()
+            return [task.result() for task in tasks]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _settle(self, tasks: list[asyncio.Future]):
+        """Wait until every coroutine is finished or waiting for a response: the round is complete."""
+        while True:
+            num_waiting = sum(request.num_waiters for request in self._pending.values())
+            if sum(task.done() for task in tasks) + num_waiting >= len(tasks):
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def _flush(self):
+        # The jobs of an interrupted run first, their requests are not submitted again
+        resumed = [job_id for job_id, keys in self._jobs.items() if any(key in self._pending for key in keys)]
+        await asyncio.gather(*[self._collect(job_id) for job_id in resumed])
+        # The coroutines resumed meanwhile may ask their next requests, they are left to the next round
+        keys = list(self._pending)
+        submitted = [await self._submit(keys[start:start + self.max_requests])
+                     for start in range(0, len(keys), self.max_requests)]
+        await asyncio.gather(*[self._collect(job_id) for job_id in submitted])
+        for key in keys:
+            request = self._pending.get(key)
+            if request is None:
+                continue
+            request.attempts += 1
+            if request.attempts > self.max_retries:
+                del self._pending[key]
+                request.future.set_exception(BatchRequestError(key, request.error or "no response"))
+            else:
+                logger.warning(f"The batch request {key} failed ({request.error}), submitting it again")
+
+    async def _submit(self, keys: list[str]) -> str:
+        input_path = os.path.join(self.work_dir, f"input_{uuid.uuid4().hex[:12]}.jsonl")
+        with open(input_path, "w") as f:
+            for key in keys:
+                line = {"custom_id": key, "method": "POST", "url": BATCH_ENDPOINT, "body": self._pending[key].body}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        job_id = await self.backend.submit(input_path)
+        self._jobs[job_id] = keys
+        self._save_jobs()
+        logger.info(f"Submitted the batch job {job_id} of {len(keys)} requests")
+        return job_id
+
+    async def _collect(self, job_id: str):
+        last_status = None
+        while (status := await self.backend.status(job_id)) not in TERMINAL_STATUSES:
+            if status != last_status:
+                logger.info(f"Batch job {job_id}: {status}")
+                last_status = status
+            await asyncio.sleep(self.poll_interval)
+        if status != "completed":
+            # An expired job still has the output of its finished requests
+            logger.warning(f"Batch job {job_id} is {status}, collecting its partial output")
+        lines = await self.backend.output(job_id)
+        with open(self._results_path, "a") as results:
+            for line in lines:
+                self._ingest(line, results)
+        del self._jobs[job_id]
+        self._save_jobs()
+        logger.info(f"Collected {len(lines)} responses of the batch job {job_id}")
+
+    def _ingest(self, line: dict, results):
+        key = line.get("custom_id")
+        request = self._pending.get(key)
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            if request is not None:
+                request.error = line.get("error") or response.get("body")
+            return
+        body = response["body"]
+        content = body["choices"][0]["message"]["content"] or ""
+        self._results[key] = content
+        results.write(json.dumps({"custom_id": key, "content": content}, ensure_ascii=False) + "\n")
+        if body.get("usage"):
+            self.llm._update_costs(body["usage"])
+        if request is None:
+            return
+        del self._pending[key]
+        if self.llm.response_cache is not None:
+            self.llm.response_cache.put(request.namespace, key, prase_json_from_response(content)
+                                        if request.format == "json" else content)
+        request.future.set_result(content)
+
+    def _save_jobs(self):
+        with open(self._jobs_path, "w") as f:
+            json.dump(self._jobs, f)
+
+
+def _read_jsonl(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    lines = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                lines.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line cut by an interruption
+                continue
+    return lines
@@ -9,6 +9,7 @@
 
 from Config.LLMConfig import LLMConfig, LLMType
 from Core.Provider.BaseLLM import BaseLLM
+from Core.Provider.LLMResponseCache import LLMResponseCache
 
 
 class LLMProviderRegistry:
@@ -42,6 +43,8 @@ def create_llm_instance(config: LLMConfig) -> BaseLLM:
     if llm.use_system_prompt and not config.use_system_prompt:
         # for models like o1-series, default openai provider.use_system_prompt is True, but it should be False for o1-*
         llm.use_system_prompt = config.use_system_prompt
+    if llm.response_cache is None:
+        llm.response_cache = LLMResponseCache.from_config(config)
     return llm
 
 
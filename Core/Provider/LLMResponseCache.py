@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : LLMResponseCache.py
+@Desc    : Disk-backed (SQLite) cache of the LLM responses, shared by the runs of the same experiment
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+from Config.LLMConfig import LLMConfig
+from Core.Common.Logger import logger
+
+CACHE_MODES = ("off", "read_write", "replay")
+# Key of the TTL / max entries applying to the namespaces without their own
+DEFAULT_NAMESPACE_KEY = "*"
+
+
+class LLMCacheMissError(Exception):
+    """Raised in replay mode when a request is not in the cache, instead of calling the LLM."""
+
+    def __init__(self, namespace: str, key: str):
+        self.message = f"No cached response for the request {key} in the namespace '{namespace}' (replay mode)"
+        super().__init__(self.message)
+
+
+class LLMResponseCache:
+    """
+    SQLite cache of the LLM responses, keyed by the SHA-256 of the model, the normalized messages, `max_tokens`,
+    `format` and the temperature.
+
+    The entries are grouped in namespaces (e.g., `ner`, `openie`, `summary`, `tog`), each with an optional TTL in
+    seconds and an optional maximum number of entries, the least recently used ones being evicted beyond it. In
+    `replay` mode the database is opened read-only: the hits are served, the misses raise `LLMCacheMissError` so that a
+    benchmark never reaches the endpoint.
+    """
+
+    def __init__(self, path: str, mode: str = "read_write", ttl: Optional[dict[str, float]] = None,
+                 max_entries: Optional[dict[str, int]] = None):
+        if mode not in CACHE_MODES[1:]:
+            raise ValueError(f"Unknown LLM cache mode: {mode}, expected one of {CACHE_MODES[1:]}")
+        self.path = path
+        self.read_only = mode == "replay"
+        self.ttl = ttl or {}
+        self.max_entries = max_entries or {}
+        if self.read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No LLM response cache to replay at {path}")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (namespace, accessed)")
+            self._conn.commit()
+            self.purge_expired()
+        logger.info(f"LLM response cache at {path} ({mode}): {self.size()} entries")
+
+    @classmethod
+    def from_config(cls, config: LLMConfig) -> Optional["LLMResponseCache"]:
+        if config.cache_mode == "off":
+            return None
+        return cls(config.cache_path, config.cache_mode, config.cache_ttl, config.cache_max_entries)
+
+    @staticmethod
+    def make_key(model: Optional[str], messages: list[dict], max_tokens: Optional[int], format: str,
+                 temperature: Optional[float] = None) -> str:
+        """The deterministic key of a request: the messages are reduced to their role and stripped content."""
+        request = {
+            "model": model,
+            "messages": [{"role": message["role"], "content": _normalize_content(message["content"])}
+                         for message in messages],
+            "max_tokens": max_tokens,
+            "format": format,
+            "temperature": temperature,
+        }
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _setting(self, settings: dict, namespace: str):
+        return settings.get(namespace, settings.get(DEFAULT_NAMESPACE_KEY))
+
+    def get(self, namespace: str, key: str) -> tuple[bool, Any]:
+        """Returns (hit, response), the expired entries being misses."""
+        row = self._conn.execute("SELECT response, created FROM responses WHERE namespace = ? AND key = ?",
+                                 (namespace, key)).fetchone()
+        if row is None:
+            return False, None
+        now = time.time()
+        ttl = self._setting(self.ttl, namespace)
+        if ttl is not None and now - row[1] > ttl:
+            if not self.read_only:
+                self._conn.execute("DELETE FROM responses WHERE namespace = ? AND key = ?", (namespace, key))
+                self._conn.commit()
+            return False, None
+        if not self.read_only:
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE namespace = ? AND key = ?",
+                               (now, namespace, key))
+            self._conn.commit()
+        return True, json.loads(row[0])
+
+    def put(self, namespace: str, key: str, response: Any):
+        if self.read_only:
+            return
+        try:
+            serialized = json.dumps(response, ensure_ascii=False)
+        except (TypeError, ValueError):
+            logger.warning(f"Not caching a response of type {type(response).__name__}, it is not JSON-serializable")
+            return
+        now = time.time()
+        self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                           (namespace, key, serialized, now, now))
+        max_entries = self._setting(self.max_entries, namespace)
+        if max_entries is not None:
+            # Evict the least recently used entries of the namespace beyond its capacity
+            self._conn.execute(
+                "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses WHERE namespace = ? "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (namespace, max_entries))
+        self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete the expired entries of every namespace with a TTL, returns their number."""
+        if self.read_only:
+            return 0
+        now, num_deleted = time.time(), 0
+        namespaces = [row[0] for row in self._conn.execute("SELECT DISTINCT namespace FROM responses")]
+        for namespace in namespaces:
+            ttl = self._setting(self.ttl, namespace)
+            if ttl is not None:
+                num_deleted += self._conn.execute("DELETE FROM responses WHERE namespace = ? AND created < ?",
+                                                  (namespace, now - ttl)).rowcount
+        self._conn.commit()
+        return num_deleted
+
+    def size(self, namespace: Optional[str] = None) -> int:
+        if namespace is None:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM responses WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def _normalize_content(content) -> Any:
+    # Multi-modal contents (lists of parts) are kept as they are
+    return content.strip() if isinstance(content, str) else content
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@File    : LLMScheduler.py
+@Desc    : Rate-limit aware scheduler of the LLM requests: RPM / TPM budgets, AIMD concurrency and priorities
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from Config.LLMConfig import LLMConfig
+from Core.Common.Constants import LLM_PRIORITY_INTERACTIVE
+from Core.Common.Logger import logger
+
+T = TypeVar("T")
+
+# AIMD: the concurrency limit is halved on a rate limit and grows by one every `limit` successful requests
+DECREASE_FACTOR = 0.5
+# The limit is also reduced (by LATENCY_DECREASE_FACTOR) when the smoothed latency exceeds this multiple of the best one
+LATENCY_TOLERANCE = 2.0
+LATENCY_DECREASE_FACTOR = 0.9
+LATENCY_SMOOTHING = 0.2
+# Pause after a rate limit without a Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    """A per-minute budget (requests or tokens), refilled continuously."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds to wait until `amount` (at most the capacity) is available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    # openai.RateLimitError and the other HTTP errors carrying a 429 status
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The delay asked by the `Retry-After` (or `retry-after-ms`) header of a rate-limit response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class LLMScheduler:
+    """
+    Admission control of the requests sharing an LLM client.
+
+    A request is admitted when it is the first waiting one by (priority, arrival), a concurrency slot is free, the
+    client is not paused after a rate limit, and the requests-per-minute and tokens-per-minute budgets cover it. The
+    interactive query calls (`LLM_PRIORITY_INTERACTIVE`) therefore overtake the queued bulk extraction calls.
+
+    The concurrency limit adapts AIMD-style between `min_concurrent` and `max_concurrent`: +1 per window of successful
+    requests while the latency stays close to the best observed one, x0.9 when it inflates, x0.5 on a 429. A rate-limited
+    request pauses the admissions for its `Retry-After` delay and is re-queued, up to `max_retries` times.
+    """
+
+    def __init__(self, max_concurrent: int, min_concurrent: int = 1, rpm_limit: Optional[int] = None,
+                 tpm_limit: Optional[int] = None, adaptive: bool = True, max_retries: int = 6):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.min_concurrent = min(max(min_concurrent, 1), self.max_concurrent)
+        self.limit = float(self.max_concurrent)
+        self.adaptive = adaptive
+        self.max_retries = max_retries
+        self._requests = TokenBucket(rpm_limit) if rpm_limit else None
+        self._tokens = TokenBucket(tpm_limit) if tpm_limit else None
+        self._waiters: list[tuple[int, int, asyncio.Event]] = []
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        # Counters, for the logs and the benchmarks
+        self.num_requests = 0
+        self.num_rate_limited = 0
+
+    @classmethod
+    def from_config(cls, config: LLMConfig) -> "LLMScheduler":
+        return cls(config.max_concurrent, config.min_concurrent, config.rpm_limit, config.tpm_limit,
+                   config.adaptive_concurrency, config.max_rate_limit_retries)
+
+    @property
+    def counts_tokens(self) -> bool:
+        """Whether the requests need a token estimate, i.e., a TPM budget is set."""
+        return self._tokens is not None
+
+    @property
+    def concurrency(self) -> int:
+        return max(int(self.limit), 1)
+
+    async def submit(self, call: Callable[[], Awaitable[T]], tokens: int = 0,
+                     priority: int = LLM_PRIORITY_INTERACTIVE) -> T:
+        """Run `call()` once admitted, re-queuing it after a rate limit."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, tokens)
+            start = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    self._release()
+                    raise
+                self._release(rate_limited=True, retry_after=retry_after_seconds(e))
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Rate limited, retrying in {self._paused_until - time.monotonic():.1f}s with the "
+                               f"concurrency limit lowered to {self.concurrency} (attempt {attempt + 1})")
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._release(latency=time.monotonic() - start)
+            return result
+
+    def _budget_delay(self, tokens: int) -> float:
+        now = time.monotonic()
+        delays = [self._paused_until - now]
+        if self._requests is not None:
+            delays.append(self._requests.delay(1, now))
+        if self._tokens is not None:
+            delays.append(self._tokens.delay(tokens, now))
+        return max(delays)
+
+    async def _acquire(self, priority: int, tokens: int):
+        entry = (priority, next(self._counter), asyncio.Event())
+        heapq.heappush(self._waiters, entry)
+        self._wake_head()
+        try:
+            while True:
+                # Only the first waiting request waits for the budgets, the others for their turn
+                timeout = None
+                if self._waiters[0] is entry and self._in_flight < self.concurrency:
+                    timeout = self._budget_delay(tokens)
+                    if timeout <= 0:
+                        break
+                entry[2].clear()
+                try:
+                    await asyncio.wait_for(entry[2].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            self._wake_head()
+            raise
+        heapq.heappop(self._waiters)
+        now = time.monotonic()
+        if self._requests is not None:
+            self._requests.consume(1, now)
+        if self._tokens is not None:
+            self._tokens.consume(tokens, now)
+        self._in_flight += 1
+        self.num_requests += 1
+        self._wake_head()
+
+    def _wake_head(self):
+        if self._waiters:
+            self._waiters[0][2].set()
+
+    def _release(self, latency: Optional[float] = None, rate_limited: bool = False,
+                 retry_after: Optional[float] = None):
+        self._in_flight -= 1
+        now = time.monotonic()
+        if rate_limited:
+            self.num_rate_limited += 1
+            self._paused_until = max(self._paused_until, now + (retry_after or DEFAULT_RETRY_AFTER))
+            self._decrease(DECREASE_FACTOR, now)
+        elif latency is not None and self.adaptive:
+            self._latency = latency if self._latency is None else \
+                (1 - LATENCY_SMOOTHING) * self._latency + LATENCY_SMOOTHING * latency
+            self._best_latency = self._latency if self._best_latency is None else min(self._best_latency,
+                                                                                       self._latency)
+            if self._latency > LATENCY_TOLERANCE * self._best_latency:
+                self._decrease(LATENCY_DECREASE_FACTOR, now)
+            else:
+                self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrent))
+        self._wake_head()
+
+    def _decrease(self, factor: float, now: float):
+        if not self.adaptive:
+            return
+        # At most one decrease per round trip, the requests already in flight saw the same congestion
+        if now - self._last_decrease < (self._latency or DEFAULT_RETRY_AFTER):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * factor, float(self.min_concurrent))
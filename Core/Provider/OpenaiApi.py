@@ -4,7 +4,7 @@ import numpy as np
 from typing import Optional, Union
 import asyncio
 
-from openai import APIConnectionError, AsyncOpenAI, AsyncStream
+from openai import APIConnectionError, AsyncOpenAI, AsyncStream, RateLimitError
 from openai._base_client import AsyncHttpxClientWrapper
 from openai.types import CompletionUsage
 from openai.types.chat import ChatCompletion, ChatCompletionChunk
@@ -12,6 +12,7 @@ from tenacity import (
     after_log,
     retry,
     retry_if_exception_type,
+    retry_if_not_exception_type,
     stop_after_attempt,
     wait_random_exponential,
 )
@@ -21,6 +22,7 @@ from Core.Common.Constants import USE_CONFIG_TIMEOUT
 from Core.Common.Logger import log_llm_stream, logger
 from Core.Provider.BaseLLM import BaseLLM
 from Core.Provider.LLMProviderRegister import register_provider
+from Core.Provider.LLMScheduler import LLMScheduler
 from Core.Common.Utils import  log_and_reraise,prase_json_from_response
 from Core.Common.CostManager import CostManager
 from Core.Utils.Exceptions import handle_exception
@@ -46,7 +48,8 @@ class OpenAILLM(BaseLLM):
         self._init_client()
         self.auto_max_tokens = False
         self.cost_manager: Optional[CostManager] = None
-        self.semaphore = asyncio.Semaphore(config.max_concurrent)
+        self.scheduler = LLMScheduler.from_config(config)
+
     def _init_client(self):
         """https://github.com/openai/openai-python#async-usage"""
         self.model = self.config.model  # Used in _calc_usage & _cons_kwargs
@@ -146,7 +149,9 @@ class OpenAILLM(BaseLLM):
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
         after=after_log(logger, logger.level("WARNING").name),
-        retry=retry_if_exception_type(Exception),
+        # The rate limits are retried by the scheduler, which honours Retry-After and lowers the concurrency. The
+        # cancellations and interrupts (not `Exception`s) are never retried
+        retry=retry_if_exception_type(Exception) & retry_if_not_exception_type(RateLimitError),
         retry_error_callback=log_and_reraise,
     )
     async def acompletion_text(self, messages: list[dict], stream=False, timeout=USE_CONFIG_TIMEOUT, max_tokens = None, format = "text") -> str:
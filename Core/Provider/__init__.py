@@ -4,9 +4,11 @@
 
 # from Core.Provider.ollama_api import OllamaLLM
 from Core.Provider.OpenaiApi import OpenAILLM
+from Core.Provider.FakeLLM import FakeLLM
 
 
 __all__ = [
     "OpenAILLM",
+    "FakeLLM",
     "OllamaLLM"
 ]
@@ -20,6 +20,13 @@ class BaseQuery(ABC):
 
     async def query(self, query):
         context = await self._retrieve_relevant_contexts(query=query)
+        return await self._generate(query, context)
+
+    async def query_batch(self, queries: list[str]) -> list:
+        """Answer many queries (e.g., an evaluation set), one after the other unless a query batches its retrieval."""
+        return [await self.query(query) for query in queries]
+
+    async def _generate(self, query, context):
         response = None
         if self.config.query_type == "summary":
             response = await self.generation_summary(query, context)
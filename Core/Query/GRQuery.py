@@ -6,69 +6,50 @@ from typing import Union
 import asyncio
 # from torch_geometric.data import Data, InMemoryDataset
 from typing import Any, Dict, List, Tuple, no_type_check
-from pcst_fast import pcst_fast
-import torch
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
 from Core.Common.Utils import truncate_str_by_token_size
+from Core.Storage.GraphTensorStorage import GraphTensorStorage
+from Core.Utils.PCST import assign_edge_prizes, build_adjacency, k_hop_node_mask, pcst_subgraph
 import time
 from Core.Utils.TokenCounter import count_output_tokens
 
 class GRQuery(BaseQuery):
     def __init__(self, config, retriever_context):
         super().__init__(config, retriever_context)
+        self.graph = retriever_context.as_dict["graph"]
+        # The persisted triplet export built by GraphRAG, or a volatile one if it is not registered
+        self.graph_tensors = retriever_context.as_dict.get("graph_tensors") or GraphTensorStorage()
+        self._tensors_version = None
 
     async def initialization(self):
-        from Core.Common.Constants import GRAPH_FIELD_SEP
-        origin_nodes = await self._retriever.retrieve_relevant_content(type=Retriever.ENTITY,
-                                                                 mode="get_all") # list[dict]
-        origin_edges = await self._retriever.retrieve_relevant_content(type=Retriever.RELATION,
-                                                                 mode="get_all") # list[dict]
-        relations = list(map(lambda x: x["relation_name"].split(sep=GRAPH_FIELD_SEP), origin_edges)) # list[list]
-        document_graph_triplets = [] # list[tuple]
-        for index, edge in enumerate(origin_edges):
-            for rel in relations[index]:
-                document_graph_triplets.append((edge["src_id"], rel, edge["tgt_id"]))
-
-        raw_nodes: Dict[str, int] = {}
-        raw_edges = []
-
-        for node in origin_nodes:
-            if node["entity_name"] not in raw_nodes:
-                raw_nodes[node["entity_name"]] = len(raw_nodes)
-
-        for tri in document_graph_triplets:
-            h, r, t = tri
-            if h not in raw_nodes:
-                raw_nodes[h] = len(raw_nodes)
-            if t not in raw_nodes:
-                raw_nodes[t] = len(raw_nodes)
-            raw_edges.append({
-                "src": raw_nodes[h],
-                "edge_attr": r,
-                "dst": raw_nodes[t]
-            })
-
-        nodes = pd.DataFrame([{ "node_id": v, "node_attr": k} for k, v in raw_nodes.items()],
+        # Only the triplets the graph gained since the last call are exported, and the views below are
+        # re-built only when the export has changed
+        await self.graph_tensors.update(self.graph)
+        if self._tensors_version == self.graph_tensors.version:
+            return
+        graph_tensors = self.graph_tensors
+        node_names = graph_tensors.node_names.tolist()
+        relation_names = np.array(graph_tensors.relation_names.tolist(), dtype=object)
+
+        nodes = pd.DataFrame({"node_id": np.arange(len(node_names)), "node_attr": node_names},
                              columns=["node_id", "node_attr"])
-        edges = pd.DataFrame(raw_edges,
+        edges = pd.DataFrame({"src": np.asarray(graph_tensors.edge_src),
+                              "edge_attr": relation_names[np.asarray(graph_tensors.edge_rel)],
+                              "dst": np.asarray(graph_tensors.edge_dst)},
                              columns=["src", "edge_attr", "dst"])
 
         nodes.node_attr = nodes.node_attr.fillna("")
 
-        edge_index = torch.tensor([
-            edges.src.tolist(),
-            edges.dst.tolist(),
-        ], dtype=torch.long)
+        edge_index = np.ascontiguousarray(graph_tensors.edge_index, dtype=np.int64)
 
-        self.edge_index = edge_index # torch[2, -1]
+        self.edge_index = edge_index # numpy[2, -1]
+        self.adjacency = build_adjacency(edge_index, len(node_names)) # scipy csr[N, N], for the k-hop option
         self.nodes = nodes # pandas: "node_id": int, "node_attr": str
         self.edges = edges # pandas: "src":int,  "edge_attr":str,  "dst": int
-        self.raw_nodes = raw_nodes # dict: key: "node_attr": str, "node_id": int
-        self.edges_list = relations # list[str]:  "edge_attr":str
-
-
+        self.raw_nodes = graph_tensors.node_names.lookup() # dict: key: "node_attr": str, "node_id": int
+        self._tensors_version = graph_tensors.version
 
     async def retrieval_via_pcst(
             self,
@@ -76,6 +57,7 @@ class GRQuery(BaseQuery):
             topk: int = 3,
             topk_e: int = 3,
             cost_e: float = 0.5,
+            k_hop: int = 0,
     ):
         c = 0.01
         if len(self.nodes) == 0 or len(self.edges) == 0:
@@ -85,24 +67,21 @@ class GRQuery(BaseQuery):
             )
             return desc
 
-        root = -1
-        num_clusters = 1
-        pruning = 'gw'
-        verbosity_level = 0
+        n_prizes = np.zeros(len(self.nodes))
         if topk > 0:
             topk = min(topk, len(self.nodes))
             retrieve_entity = await self._retriever.retrieve_relevant_content(type=Retriever.ENTITY, mode="vdb", seed=query) # list[dict]
-            retrieve_entity_id = torch.tensor(list(map(lambda x: self.raw_nodes[x["entity_name"]], retrieve_entity))) # [0,1,2,..,node_id]
-            n_prizes = torch.zeros(len(self.nodes))
-            n_prizes[retrieve_entity_id] = torch.arange(topk, 0, -1).float()
+            retrieve_entity_id = np.asarray([self.raw_nodes.get(x["entity_name"], -1) for x in retrieve_entity[:topk]],
+                                            dtype=np.int64) # [0,1,2,..,node_id]
+            node_scores = np.arange(topk, 0, -1, dtype=np.float64)[:len(retrieve_entity_id)]
+            found = retrieve_entity_id >= 0
+            n_prizes[retrieve_entity_id[found]] = node_scores[found]
             
             # 打印高分nodes
             print(f"\n=== 高分Nodes (top-{topk}) ===")
             for i, entity in enumerate(retrieve_entity[:topk]):
                 score = topk - i
                 print(f"Node {i+1}: {entity['entity_name']} (score: {score})")
-        else:
-            n_prizes = torch.zeros(len(self.nodes))
 
         if topk_e > 0:
             topk_e = min(topk_e, len(self.edges))
@@ -113,70 +92,25 @@ class GRQuery(BaseQuery):
             print(f"\n=== 高分Relationships (top-{topk_e}) ===")
             for i, (rel, score) in enumerate(zip(retrieve_relations[:topk_e], topk_e_values[:topk_e])):
                 print(f"Relation {i+1}: {rel['src_id']} --[{rel['relation_name']}]--> {rel['tgt_id']} (score: {score:.4f})")
-            
-            e_prizes = torch.zeros(len(self.edges))
-            for i, rel in enumerate(retrieve_relations):
-                index = self.edges[
-                    (self.edges['src'] == retrieve_relations[i]["src_id"]) &
-                    (self.edges['edge_attr'] == retrieve_relations[i]["relation_name"]) &
-                    (self.edges['dst'] == retrieve_relations[i]['tgt_id'])
-                ].index
-                e_prizes[index] = topk_e_values[i]
-
-            last_topk_e_value = topk_e
-            for k in range(min(topk_e, len(topk_e_values))):
-                indices = e_prizes == topk_e_values[k]
-                value = min((topk_e - k) / sum(indices), last_topk_e_value - c)
-                e_prizes[indices] = value
-                last_topk_e_value = value * (1 - c)
+
+            # Look the retrieved relations up in the (src, relation, dst) -> row index instead of scanning the edges
+            matched_rows = [self.graph_tensors.find_triplets(rel["src_id"], rel["relation_name"], rel["tgt_id"])
+                            for rel in retrieve_relations]
+            e_prizes = assign_edge_prizes(len(self.edges), matched_rows, list(topk_e_values), topk_e, c)
             # reduce the cost of the edges such that at least one edge is selected
-            cost_e = min(cost_e, e_prizes.max().item() * (1 - c / 2))
+            cost_e = min(cost_e, e_prizes.max() * (1 - c / 2))
         else:
-            e_prizes = torch.zeros(len(self.edges))
-
-        costs = []
-        edges = []
-        virtual_n_prizes = []
-        virtual_edges = []
-        virtual_costs = []
-        mapping_n = {}
-        mapping_e = {}
-        for i, (src, dst) in enumerate(self.edge_index.t().numpy()):
-            prize_e = e_prizes[i]
-            if prize_e <= cost_e:
-                mapping_e[len(edges)] = i
-                edges.append((src, dst))
-                costs.append(cost_e - prize_e)
-            else:
-                virtual_node_id = len(self.nodes) + len(virtual_n_prizes)
-                mapping_n[virtual_node_id] = i
-                virtual_edges.append((src, virtual_node_id))
-                virtual_edges.append((virtual_node_id, dst))
-                virtual_costs.append(0)
-                virtual_costs.append(0)
-                virtual_n_prizes.append(prize_e - cost_e)
-
-        prizes = np.concatenate([n_prizes, np.array(virtual_n_prizes)])
-        num_edges = len(edges)
-        if len(virtual_costs) > 0:
-            costs = np.array(costs + virtual_costs)
-            edges = np.array(edges + virtual_edges)
-
-        vertices, edges = pcst_fast(edges, prizes, costs, root, num_clusters,
-                                    pruning, verbosity_level)
-
-        selected_nodes = vertices[vertices < len(self.nodes)]
-        selected_edges = [mapping_e[e] for e in edges if e < num_edges]
-        virtual_vertices = vertices[vertices >= len(self.nodes)]
-        if len(virtual_vertices) > 0:
-            virtual_vertices = vertices[vertices >= len(self.nodes)]
-            virtual_edges = [mapping_n[i] for i in virtual_vertices]
-            selected_edges = np.array(selected_edges + virtual_edges)
-
-        edge_index = self.edge_index[:, selected_edges]
-        selected_nodes = np.unique(
-            np.concatenate(
-                [selected_nodes, edge_index[0].numpy(), edge_index[1].numpy()]))
+            e_prizes = np.zeros(len(self.edges))
+
+        node_mask = None
+        if k_hop > 0:
+            # Only search the k-hop neighbourhood of the prized nodes and of the endpoints of the prized edges
+            seeds = np.concatenate([np.flatnonzero(n_prizes > 0), self.edge_index[:, e_prizes > 0].ravel()])
+            if len(seeds) > 0:
+                node_mask = k_hop_node_mask(self.adjacency, seeds, k_hop)
+
+        selected_nodes, selected_edges = pcst_subgraph(self.edge_index, n_prizes, e_prizes, cost_e,
+                                                       node_mask=node_mask)
 
         n = self.nodes.iloc[selected_nodes]
         e = self.edges.iloc[selected_edges]
@@ -208,6 +142,7 @@ class GRQuery(BaseQuery):
             topk=self.config.top_k,
             topk_e=self.config.topk_e,
             cost_e=self.config.cost_e,
+            k_hop=self.config.pcst_k_hop,
         )
         desc = truncate_str_by_token_size(input_str=desc, max_token_size=self.config.max_txt_len)
         return query, desc
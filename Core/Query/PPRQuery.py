@@ -1,3 +1,5 @@
+import asyncio
+
 from Core.Query.BaseQuery import BaseQuery
 from Core.Common.Logger import logger
 from Core.Common.Constants import Retriever
@@ -47,49 +49,75 @@ class PPRQuery(BaseQuery):
                                                                                          link_entity=True,
                                                                                          type=Retriever.CHUNK,
                                                                                          mode="ppr")
-            thoughts = []
-
-            passage_scores = {passage: score for passage, score in zip(retrieved_passages, scores)}
-            few_shot_examples = []
-            # Iterative refinement loop
-            for iteration in range(2, self.config.max_ir_steps + 1):
-                logger.info("Entering the ir-cot iteration: {}".format(iteration))
-                # Generate a new thought based on current passages and thoughts
-                new_thought = await self.reason_step(few_shot_examples, query, retrieved_passages[: self.config.top_k],
-                                                     thoughts)
-                thoughts.append(new_thought)
-                print("Thought:", new_thought)
-
-                # Check if the thought contains the answer
-                if 'So the answer is:' in new_thought:
-                    break
-
-                # Retrieve new passages based on the new thought
-                new_passages, new_scores = await self._retriever.retrieve_relevant_content(query=query,
-                                                                                           seed_entities=thoughts,
-                                                                                            link_entity=True,
-                                                                                           type=Retriever.CHUNK,
-                                                                                           mode="ppr")
-
-                # Update passage scores
-                for passage, score in zip(new_passages, new_scores):
-                    if passage in passage_scores:
-                        passage_scores[passage] = max(passage_scores[passage], score)
-                    else:
-                        passage_scores[passage] = score
-
-                # Sort passages by score in descending order
-                sorted_passages = sorted(
-                    passage_scores.items(), key=lambda item: item[1], reverse=True
-                )
-                retrieved_passages, scores = zip(*sorted_passages)
-
-            return retrieved_passages
+            return await self._refine_by_ircot(query, retrieved_passages, scores)
 
         else:
             return await self._retriever.retrieve_relevant_content(query=query, seed_entities=entities,
                                                                    type=Retriever.CHUNK, mode="aug_ppr")
 
+    async def _retrieve_relevant_contexts_batch(self, queries: list[str]) -> list:
+        # The entities of all the queries are linked with one vector search, and their PPR runs as one batch
+        entities_list = await asyncio.gather(*[self.extract_query_entities(query) for query in queries])
+        if not self.config.augmentation_ppr:
+            # For HippoRAG
+            results = await self._retriever.retrieve_relevant_content(queries=queries,
+                                                                      seed_entities_list=entities_list,
+                                                                      link_entity=True, type=Retriever.CHUNK,
+                                                                      mode="ppr_batch")
+            return await asyncio.gather(*[self._refine_by_ircot(query, retrieved_passages, scores)
+                                          for query, (retrieved_passages, scores) in zip(queries, results)])
+        return await self._retriever.retrieve_relevant_content(queries=queries, seed_entities_list=entities_list,
+                                                               type=Retriever.CHUNK, mode="aug_ppr_batch")
+
+    async def query_batch(self, queries: list[str]) -> list:
+        """
+        Answer many queries at once, e.g., for the offline evaluation: the same answers as `query`, but the PPR
+        retrieval of all the queries is batched, then their IR-CoT steps and generations run concurrently.
+        """
+        contexts = await self._retrieve_relevant_contexts_batch(queries)
+        return await asyncio.gather(*[self._generate(query, context) for query, context in zip(queries, contexts)])
+
+    async def _refine_by_ircot(self, query, retrieved_passages, scores):
+        """Refine the passages retrieved for the query with the IR-CoT steps, up to `max_ir_steps`."""
+        thoughts = []
+
+        passage_scores = {passage: score for passage, score in zip(retrieved_passages, scores)}
+        few_shot_examples = []
+        # Iterative refinement loop
+        for iteration in range(2, self.config.max_ir_steps + 1):
+            logger.info("Entering the ir-cot iteration: {}".format(iteration))
+            # Generate a new thought based on current passages and thoughts
+            new_thought = await self.reason_step(few_shot_examples, query, retrieved_passages[: self.config.top_k],
+                                                 thoughts)
+            thoughts.append(new_thought)
+            print("Thought:", new_thought)
+
+            # Check if the thought contains the answer
+            if 'So the answer is:' in new_thought:
+                break
+
+            # Retrieve new passages based on the new thought
+            new_passages, new_scores = await self._retriever.retrieve_relevant_content(query=query,
+                                                                                       seed_entities=thoughts,
+                                                                                        link_entity=True,
+                                                                                       type=Retriever.CHUNK,
+                                                                                       mode="ppr")
+
+            # Update passage scores
+            for passage, score in zip(new_passages, new_scores):
+                if passage in passage_scores:
+                    passage_scores[passage] = max(passage_scores[passage], score)
+                else:
+                    passage_scores[passage] = score
+
+            # Sort passages by score in descending order
+            sorted_passages = sorted(
+                passage_scores.items(), key=lambda item: item[1], reverse=True
+            )
+            retrieved_passages, scores = zip(*sorted_passages)
+
+        return retrieved_passages
+
 
     async def generation_qa(self, query, context):
 
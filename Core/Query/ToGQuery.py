@@ -160,7 +160,7 @@ class ToGQuery(BaseQuery):
         messages = [{"role": "system", "content": "You are an AI assistant that helps people find information."},
                     {"role": "user", "content": context}]
         print("QA context: ",context)
-        response = await self.llm.aask(msg=messages)
+        response = await self.llm.aask(msg=messages, cache_namespace="tog")
 
         if mode == "retrieve":
             # extract is_stop answer from response
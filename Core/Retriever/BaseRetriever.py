@@ -46,8 +46,8 @@ class BaseRetriever(ABC):
         )
         return edge_datas
 
-    async def _run_personalized_pagerank(self, query, query_entities):
-        # Run Personalized PageRank
+    async def _build_ppr_reset_vector(self, query, query_entities):
+        # Build the reset probability vector of Personalized PageRank
         reset_prob_matrix = np.zeros(self.graph.node_num)
 
         if self.config.use_entity_similarity_for_ppr:
@@ -64,35 +64,57 @@ class BaseRetriever(ABC):
         else:
             # Set the weight of the retrieved documents based on the number of documents they appear in
             # Please refer to the HippoRAG code for more details: https://github.com/OSU-NLP-Group/HippoRAG/tree/main
-            if not hasattr(self, "entity_chunk_count"):
-                # Register the entity-chunk count matrix into the class when you first use it.
-                e2r = await self.entities_to_relationships.get()
-                r2c = await self.relationships_to_chunks.get()
-                c2e = e2r.dot(r2c).T
-                c2e[c2e.nonzero()] = 1
-                self.entity_chunk_count = c2e.sum(0).T
+            # The entity-chunk count is built once with the e2r/r2c maps and shared by all the retrievers
+            entity_chunk_count = await self.entity_chunk_count.get()
 
             for entity in query_entities:
     
                 entity_idx = await self.graph.get_node_index(entity["entity_name"])
                 if self.config.node_specificity:
-                    if self.entity_chunk_count[entity_idx] == 0:
+                    if entity_chunk_count[entity_idx] == 0:
                         weight = 1
                     else:
-                        weight = 1 / float(self.entity_chunk_count[entity_idx])
+                        weight = 1 / float(entity_chunk_count[entity_idx])
                     reset_prob_matrix[entity_idx] = weight
                 else:
                     reset_prob_matrix[entity_idx] = 1.0
-        # TODO: as a method in our NetworkXGraph class or directly use the networkx graph
-        # Transform the graph to igraph format 
-        return await self.graph.personalized_pagerank([reset_prob_matrix])
+        return reset_prob_matrix
 
-    async def link_query_entities(self, query_entities):
+    async def _run_personalized_pagerank(self, query, query_entities):
+        # Run Personalized PageRank
+        reset_prob_matrix = await self._build_ppr_reset_vector(query, query_entities)
+        # The graph storage keeps a cached igraph / CSR snapshot of the graph, so no per-query conversion is needed
+        return await self.graph.personalized_pagerank([reset_prob_matrix],
+                                                      implementation=self.config.ppr_implementation)
+
+    async def _run_personalized_pagerank_batch(self, queries, query_entities_list):
+        """
+        Run Personalized PageRank for a batch of queries with the `ppr_batch_implementation` of the config, by
+        default one sparse matrix-matrix power iteration shared by all the queries.
+
+        Returns:
+            np.ndarray: The PPR scores (Q, N), one row per query.
+        """
+        if self.config.use_entity_similarity_for_ppr:
+            # Each of the two similarity terms is one batched vector search over all the queries
+            reset_prob_matrix = await self.entities_vdb.retrieval_nodes_with_score_matrices(
+                query_entities_list, top_k=1, graph=self.graph)
+            reset_prob_matrix += await self.entities_vdb.retrieval_nodes_with_score_matrices(
+                [[query] for query in queries], top_k=self.config.top_k_entity_for_ppr, graph=self.graph)
+        else:
+            reset_prob_matrix = np.stack([await self._build_ppr_reset_vector(query, query_entities)
+                                          for query, query_entities in zip(queries, query_entities_list)])
+        return await self.graph.personalized_pagerank_batch(reset_prob_matrix,
+                                                            implementation=self.config.ppr_batch_implementation)
 
-        entities = []
-        for query_entity in query_entities:
-            node_datas = await self.entities_vdb.retrieval_nodes(query_entity, top_k=1, graph=self.graph)
-            # For entity link, we only consider the top-ranked entity
-            entities.append(node_datas[0])
+    async def link_query_entities(self, query_entities):
+        # One batched vector search for all the query entities
+        node_datas = await self.entities_vdb.retrieval_nodes_batch(query_entities, top_k=1, graph=self.graph)
+        # For entity link, we only consider the top-ranked entity
+        return [node_data[0] for node_data in node_datas]
 
-        return entities
+    async def link_query_entities_batch(self, query_entities_list):
+        # Link the entities of all the queries with a single batched vector search
+        entities = iter(await self.link_query_entities(
+            [query_entity for query_entities in query_entities_list for query_entity in query_entities]))
+        return [[next(entities) for _ in query_entities] for query_entities in query_entities_list]
@@ -2,15 +2,20 @@ from Core.Common.Logger import logger
 from Core.Retriever.BaseRetriever import BaseRetriever
 import asyncio
 import numpy as np
-from Core.Common.Utils import truncate_list_by_token_size, split_string_by_multi_markers, min_max_normalize, to_str_by_maxtokens
+from Core.Common.Utils import truncate_list_by_token_size, split_string_by_multi_markers, min_max_normalize, to_str_by_maxtokens, reciprocal_rank_fusion
 from Core.Retriever.RetrieverFactory import register_retriever_method
 from Core.Common.Constants import GRAPH_FIELD_SEP,TOKEN_TO_CHAR_RATIO
+
+# Length of the rankings fused by `bm25_ppr`
+RRF_DEPTH = 100
+
+
 class ChunkRetriever(BaseRetriever):
     def __init__(self, **kwargs):
 
         config = kwargs.pop("config")
         super().__init__(config)
-        self.mode_list = ["entity_occurrence", "ppr", "from_relation", "aug_ppr"]
+        self.mode_list = ["entity_occurrence", "ppr", "from_relation", "aug_ppr", "ppr_batch", "aug_ppr_batch", "bm25", "bm25_ppr"]
         self.type = "chunk"
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -131,6 +136,39 @@ class ChunkRetriever(BaseRetriever):
         sorted_docs = await self.doc_chunk.get_data_by_indices(sorted_doc_ids[:top_k])
         return sorted_docs, sorted_scores[:top_k]
 
+    @register_retriever_method(type="chunk", method_name="bm25")
+    async def _find_relevant_chunks_by_bm25(self, seed, top_k=None):
+        # Lexical match of the query with the chunks, no embedding call: the (docs, scores) of the matching chunks
+        if top_k is None:
+            top_k = self.config.top_k
+        chunk_ids, scores = self.chunks_bm25.query_keys_with_scores(seed, top_k)
+        matched = scores > 0
+        sorted_docs = await asyncio.gather(*[self.doc_chunk.get_data_by_key(chunk_id)
+                                             for chunk_id, match in zip(chunk_ids, matched) if match])
+        return sorted_docs, scores[matched]
+
+    @register_retriever_method(type="chunk", method_name="bm25_ppr")
+    async def _find_relevant_chunks_by_bm25_ppr(self, query, seed_entities: list[dict], link_entity=False):
+        # Reciprocal rank fusion of the `ppr` ranking of the chunks with their `bm25` ranking: the (docs, fused scores)
+        top_k = self.config.top_k
+        depth = max(top_k, RRF_DEPTH)
+        if link_entity:
+            seed_entities = await self.link_query_entities(seed_entities)
+        if len(seed_entities) == 0:
+            ppr_ranking = []
+        else:
+            node_ppr_matrix = await self._run_personalized_pagerank(query, seed_entities)
+            edge_prob = (await self.entities_to_relationships.get()).T.dot(node_ppr_matrix)
+            ppr_chunk_prob = (await self.relationships_to_chunks.get()).T.dot(edge_prob)
+            ppr_ranking = np.argsort(ppr_chunk_prob, kind='mergesort')[::-1][:depth].tolist()
+        chunk_ids, scores = self.chunks_bm25.query_keys_with_scores(query, depth)
+        bm25_indices = await self.doc_chunk.get_indices_by_keys([chunk_id for chunk_id, score
+                                                                 in zip(chunk_ids, scores.tolist()) if score > 0])
+        fused = reciprocal_rank_fusion([ppr_ranking, bm25_indices[bm25_indices >= 0].tolist()],
+                                       k=self.config.rrf_k)[:top_k]
+        sorted_docs = await self.doc_chunk.get_data_by_indices([index for index, _ in fused])
+        return sorted_docs, np.array([score for _, score in fused])
+
     @register_retriever_method(type="chunk", method_name="aug_ppr")
     async def _find_relevant_chunks_by_ppr(self, query, seed_entities: list[dict]):
         # 
@@ -154,3 +192,58 @@ class ChunkRetriever(BaseRetriever):
                 "relationships": self.config.relationships_max_tokens * TOKEN_TO_CHAR_RATIO,
                 "chunks": self.config.local_max_token_for_text_unit * TOKEN_TO_CHAR_RATIO,
             }, entities=sorted_entities, relationships=sorted_relationships, chunks=sorted_docs)
+
+    async def _run_chunk_ppr_batch(self, queries: list[str], seed_entities_list: list[list[dict]],
+                                   uniform_without_seeds: bool = True):
+        # Propagate the (Q, N) batched PPR scores to the relationships (Q, E) and the chunks (Q, C). As `ppr`, the
+        # queries without seed entities get uniform scores, unless `uniform_without_seeds` is off (as `aug_ppr`)
+        entity_to_edge_mat = await self.entities_to_relationships.get()
+        relationship_to_chunk_mat = await self.relationships_to_chunks.get()
+        node_ppr_matrices = np.ones((len(queries), self.graph.node_num)) / self.graph.node_num
+        batch_ids = [i for i, seed_entities in enumerate(seed_entities_list)
+                     if len(seed_entities) or not uniform_without_seeds]
+        if len(batch_ids):
+            node_ppr_matrices[batch_ids] = await self._run_personalized_pagerank_batch(
+                [queries[i] for i in batch_ids], [seed_entities_list[i] for i in batch_ids])
+        edge_prob_matrices = np.asarray(entity_to_edge_mat.T.dot(node_ppr_matrices.T))
+        ppr_chunk_prob_matrices = np.asarray(relationship_to_chunk_mat.T.dot(edge_prob_matrices)).T
+        return node_ppr_matrices, edge_prob_matrices.T, ppr_chunk_prob_matrices
+
+    @register_retriever_method(type="chunk", method_name="ppr_batch")
+    async def _find_relevant_chunks_by_ppr_batch(self, queries: list[str], seed_entities_list: list[list[dict]],
+                                                 link_entity=False):
+        # Batched version of `ppr`: one (docs, scores) pair per query
+        if link_entity:
+            seed_entities_list = await self.link_query_entities_batch(seed_entities_list)
+        _, _, ppr_chunk_prob_matrices = await self._run_chunk_ppr_batch(queries, seed_entities_list)
+        top_k = self.config.top_k
+        results = []
+        for ppr_chunk_prob in ppr_chunk_prob_matrices:
+            ppr_chunk_prob = min_max_normalize(ppr_chunk_prob)
+            sorted_doc_ids = np.argsort(ppr_chunk_prob, kind='mergesort')[::-1]
+            sorted_scores = ppr_chunk_prob[sorted_doc_ids]
+            sorted_docs = await self.doc_chunk.get_data_by_indices(sorted_doc_ids[:top_k])
+            results.append((sorted_docs, sorted_scores[:top_k]))
+        return results
+
+    @register_retriever_method(type="chunk", method_name="aug_ppr_batch")
+    async def _find_relevant_chunks_by_aug_ppr_batch(self, queries: list[str], seed_entities_list: list[list[dict]]):
+        # Batched version of `aug_ppr`: one context string per query
+        node_ppr_matrices, edge_prob_matrices, ppr_chunk_prob_matrices = await self._run_chunk_ppr_batch(
+            queries, seed_entities_list, uniform_without_seeds=False)
+        results = []
+        for node_ppr_matrix, edge_prob, ppr_chunk_prob in zip(node_ppr_matrices, edge_prob_matrices,
+                                                              ppr_chunk_prob_matrices):
+            sorted_doc_ids = np.argsort(ppr_chunk_prob, kind='mergesort')[::-1]
+            sorted_entity_ids = np.argsort(node_ppr_matrix, kind='mergesort')[::-1]
+            sorted_relationship_ids = np.argsort(edge_prob, kind='mergesort')[::-1]
+
+            sorted_docs = await self.doc_chunk.get_data_by_indices(sorted_doc_ids)
+            sorted_entities = await self.graph.get_node_by_indices(sorted_entity_ids)
+            sorted_relationships = await self.graph.get_edge_by_indices(sorted_relationship_ids)
+            results.append(to_str_by_maxtokens(max_chars={
+                "entities": self.config.entities_max_tokens * TOKEN_TO_CHAR_RATIO,
+                "relationships": self.config.relationships_max_tokens * TOKEN_TO_CHAR_RATIO,
+                "chunks": self.config.local_max_token_for_text_unit * TOKEN_TO_CHAR_RATIO,
+            }, entities=sorted_entities, relationships=sorted_relationships, chunks=sorted_docs))
+        return results
@@ -3,7 +3,7 @@ from Core.Retriever.BaseRetriever import BaseRetriever
 import numpy as np
 import asyncio
 from collections import defaultdict
-from Core.Common.Utils import truncate_list_by_token_size
+from Core.Common.Utils import truncate_list_by_token_size, reciprocal_rank_fusion
 from Core.Index.TFIDFStore import TFIDFIndex
 from Core.Retriever.RetrieverFactory import register_retriever_method
 
@@ -13,7 +13,7 @@ class EntityRetriever(BaseRetriever):
 
         config = kwargs.pop("config")
         super().__init__(config)
-        self.mode_list = ["ppr", "vdb", "from_relation", "tf_df", "all", "by_neighbors", "link_entity", "get_all", "from_relation_by_agent"]
+        self.mode_list = ["ppr", "ppr_batch", "vdb", "from_relation", "tf_df", "all", "by_neighbors", "link_entity", "get_all", "from_relation_by_agent", "bm25", "hybrid"]
         self.type = "entity"
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -32,6 +32,24 @@ class EntityRetriever(BaseRetriever):
 
         return nodes, ppr_node_matrix
 
+    @register_retriever_method(type="entity", method_name="ppr_batch")
+    async def _find_relevant_entities_by_ppr_batch(self, queries: list[str], seed_entities_list: list[list[dict]],
+                                                   link_entity=False):
+        # Batched version of `ppr`: one result per query, None for the queries without seed entities
+        if link_entity:
+            seed_entities_list = await self.link_query_entities_batch(seed_entities_list)
+        results = [None] * len(queries)
+        batch_ids = [i for i, seed_entities in enumerate(seed_entities_list) if len(seed_entities)]
+        if len(batch_ids) == 0:
+            return results
+        ppr_node_matrices = await self._run_personalized_pagerank_batch([queries[i] for i in batch_ids],
+                                                                        [seed_entities_list[i] for i in batch_ids])
+        for i, ppr_node_matrix in zip(batch_ids, ppr_node_matrices):
+            topk_indices = np.argsort(ppr_node_matrix)[-self.config.top_k:]
+            nodes = await self.graph.get_node_by_indices(topk_indices)
+            results[i] = (nodes, ppr_node_matrix)
+        return results
+
     @register_retriever_method(type="entity", method_name="vdb")
     async def _find_relevant_entities_vdb(self, seed, tree_node=False, top_k=None):
         try:
@@ -66,15 +84,11 @@ class EntityRetriever(BaseRetriever):
     @register_retriever_method(type="entity", method_name="tf_df")
     async def _find_relevant_entities_tf_df(self, seed, corpus, top_k, candidates_idx):
         try:
-            graph_nodes = list(await self.graph.get_nodes())
-            corpus = dict({id: (await self.graph.get_node(id))['description'] for id in graph_nodes})
-            candidates_idx = list(id for id in graph_nodes)
-            index = TFIDFIndex()
-
-            index._build_index_from_list([corpus[_] for _ in candidates_idx])
-            idxs = index.query(query_str=seed, top_k=top_k)
-
-            new_candidates_idx = [candidates_idx[_] for _ in idxs]
+            index = getattr(self, "entities_tfidf", None)
+            if index is None or index.num_docs == 0:
+                # No persisted index in the context, build one in memory on the first call and keep it up to date
+                index = await self._in_memory_tfidf(corpus)
+            new_candidates_idx = index.query_keys(query_str=seed, top_k=top_k, candidates=candidates_idx)
             cur_contexts = [corpus[_] for _ in new_candidates_idx]
 
             return cur_contexts, new_candidates_idx
@@ -82,6 +96,43 @@ class EntityRetriever(BaseRetriever):
         except Exception as e:
             logger.exception(f"Failed to find relevant entities_vdb: {e}")
 
+    async def _in_memory_tfidf(self, corpus):
+        if getattr(self, "_tfidf", None) is None:
+            self._tfidf = TFIDFIndex()
+        await self._tfidf.update(list(corpus), list(corpus.values()))
+        return self._tfidf
+
+    @register_retriever_method(type="entity", method_name="bm25")
+    async def _find_relevant_entities_bm25(self, seed, top_k=None):
+        # Lexical match of the query with the entity descriptions, no embedding call
+        try:
+            if top_k is None:
+                top_k = self.config.top_k
+            entity_names, scores = self.entities_bm25.query_keys_with_scores(seed, top_k)
+            entity_names = [name for name, score in zip(entity_names, scores.tolist()) if score > 0]
+            if not len(entity_names):
+                return None
+            node_datas = await asyncio.gather(*[self.graph.get_node(name) for name in entity_names])
+            node_degrees = await asyncio.gather(*[self.graph.node_degree(name) for name in entity_names])
+            return [{**n, "entity_name": name, "rank": d}
+                    for name, n, d in zip(entity_names, node_datas, node_degrees) if n is not None]
+        except Exception as e:
+            logger.exception(f"Failed to find relevant entities_bm25: {e}")
+
+    @register_retriever_method(type="entity", method_name="hybrid")
+    async def _find_relevant_entities_hybrid(self, seed, top_k=None):
+        # Reciprocal rank fusion of the `vdb` and the `bm25` rankings
+        if top_k is None:
+            top_k = self.config.top_k
+        rankings = [await self.retrieve_relevant_content(mode="vdb", seed=seed, top_k=top_k),
+                    await self.retrieve_relevant_content(mode="bm25", seed=seed, top_k=top_k)]
+        node_datas = {node["entity_name"]: node for ranking in rankings if ranking for node in ranking}
+        if not node_datas:
+            return None
+        fused = reciprocal_rank_fusion([[node["entity_name"] for node in ranking] for ranking in rankings if ranking],
+                                       k=self.config.rrf_k)
+        return [node_datas[entity_name] for entity_name, _ in fused[:top_k]]
+
     @register_retriever_method(type="entity", method_name="all")
     async def _find_relevant_entities_all(self, key):
         graph_nodes = list(await self.graph.get_nodes())
@@ -92,12 +143,7 @@ class EntityRetriever(BaseRetriever):
     @register_retriever_method(type="entity", method_name="link_entity")
     async def _link_entities(self, query_entities):
         # For entity link, we only consider the top-ranked entity
-        entities = await asyncio.gather(
-            *[self.entities_vdb.retrieval_nodes(query_entity, top_k=1, graph=self.graph) for query_entity in
-              query_entities]
-        )
-        entities = list(map(lambda x: x[0], entities))
-        return entities
+        return await self.link_query_entities(query_entities)
 
     @register_retriever_method(type="entity", method_name="get_all")
     async def _get_all_entities(self):
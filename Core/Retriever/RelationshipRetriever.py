@@ -10,7 +10,7 @@ class RelationshipRetriever(BaseRetriever):
     def __init__(self, **kwargs):
         config = kwargs.pop("config")
         super().__init__(config)
-        self.mode_list = ["entity_occurrence", "from_entity", "ppr", "vdb", "from_entity_by_agent", "get_all", "by_source&target"]
+        self.mode_list = ["entity_occurrence", "from_entity", "ppr", "ppr_batch", "vdb", "from_entity_by_agent", "get_all", "by_source&target"]
         self.type = "relationship"
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -18,7 +18,7 @@ class RelationshipRetriever(BaseRetriever):
     @register_retriever_method(type="relationship", method_name="ppr")
     async def _find_relevant_relationships_by_ppr(self, query, seed_entities: list[dict], node_ppr_matrix=None):
         #
-        entity_to_edge_mat = await self._entities_to_relationships.get()
+        entity_to_edge_mat = await self.entities_to_relationships.get()
         if node_ppr_matrix is None:
             # Create a vector (num_doc) with 1s at the indices of the retrieved documents and 0s elsewhere
             node_ppr_matrix = await self._run_personalized_pagerank(query, seed_entities)
@@ -28,6 +28,21 @@ class RelationshipRetriever(BaseRetriever):
 
         return await self._construct_relationship_context(edges)
 
+    @register_retriever_method(type="relationship", method_name="ppr_batch")
+    async def _find_relevant_relationships_by_ppr_batch(self, queries: list[str], seed_entities_list: list[list[dict]],
+                                                        node_ppr_matrices=None):
+        # Batched version of `ppr`: `node_ppr_matrices` is the (Q, N) output of the batched PPR if already computed
+        entity_to_edge_mat = await self.entities_to_relationships.get()
+        if node_ppr_matrices is None:
+            node_ppr_matrices = await self._run_personalized_pagerank_batch(queries, seed_entities_list)
+        edge_prob_matrices = np.asarray(entity_to_edge_mat.T.dot(np.asarray(node_ppr_matrices).T)).T
+        results = []
+        for edge_prob_matrix in edge_prob_matrices:
+            topk_indices = np.argsort(edge_prob_matrix)[-self.config.top_k:]
+            edges = await self.graph.get_edge_by_indices(topk_indices)
+            results.append(await self._construct_relationship_context(edges))
+        return results
+
     @register_retriever_method(type="relationship", method_name="vdb")
     async def _find_relevant_relations_vdb(self, seed, need_score=False, need_context=True, top_k=None):
         try:
@@ -93,7 +93,10 @@ class ColbertEdgeResult(RelationResult):
         self.ranks = ranks
         self.scores = scores
 
-    async def get_edge_data(self, graph):
-        return await asyncio.gather(
-            *[(graph.get_edge_by_index(edge_idx), self.scores[idx]) for idx, edge_idx in enumerate(self.edge_idxs)]
-        )
\ No newline at end of file
+    async def get_edge_data(self, graph, score = False):
+        edges = await asyncio.gather(*[graph.get_edge_by_index(edge_idx) for edge_idx in self.edge_idxs])
+        if score:
+
+            return edges, [r for r in self.scores]
+        else:
+            return edges
\ No newline at end of file
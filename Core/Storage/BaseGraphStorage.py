@@ -1,3 +1,5 @@
+import asyncio
+
 import numpy as np
 from typing import  Union
 
@@ -30,6 +32,15 @@ class BaseGraphStorage(BaseStorage):
     ) -> Union[list[tuple[str, str]], None]:
         raise NotImplementedError
 
+    async def neighbors(self, node_id: str):
+        raise NotImplementedError
+
+    async def get_edges_data(self, need_content=True) -> list[dict]:
+        raise NotImplementedError
+
+    async def get_one_path(self, start: str, cand: list[str], cutoff: int = 5):
+        raise NotImplementedError
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         raise NotImplementedError
 
@@ -38,6 +49,132 @@ class BaseGraphStorage(BaseStorage):
     ):
         raise NotImplementedError
 
+    async def upsert_nodes(self, nodes: list[tuple[str, dict]]):
+        # Bulk version of `upsert_node`, backends can override it with a native bulk insert
+        for node_id, node_data in nodes:
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict]]):
+        # Bulk version of `upsert_edge`, backends can override it with a native bulk insert
+        for source_node_id, target_node_id, edge_data in edges:
+            await self.upsert_edge(source_node_id, target_node_id, edge_data)
+
+    # The traversals below only rely on the primitives above, backends can override them with native versions
+    async def find_k_hop_neighbors(self, start_node: str, k: int) -> set:
+        """
+        find the k hop neighbors about the given input node
+        :param start_node: str, entity_name
+        :param k: int, k hop value
+        :return: K hop sets(including start_node)
+        """
+        if k < 1:
+            raise ValueError("K-hop neighbours value must greater than 1.")
+
+        visited = set()
+        current_level = {start_node}
+
+        for _ in range(k):
+            next_level = set()  # 下一层的节点
+            for node in current_level:
+                neighbors = set(await self.neighbors(node))
+                next_level.update(neighbors - visited)
+            visited.update(next_level)
+            current_level = next_level
+
+        return current_level
+
+    async def find_k_hop_neighbors_batch(self, start_nodes: list[str], k: int) -> set:
+        nodes_set_list = await asyncio.gather(
+            *[self.find_k_hop_neighbors(node, k) for node in start_nodes]
+        )
+        nodes_list = []
+        for node_set in nodes_set_list:
+            nodes_list.extend(list(node_set))
+        return set(nodes_list)
+
+    async def get_edge_relation_name(self, source_node_id: str, target_node_id: str):
+        edge_data = await self.get_edge(source_node_id, target_node_id)
+        return edge_data.get("relation_name") if edge_data is not None else None
+
+    async def get_edge_relation_name_batch(self, edges: list[tuple[str, str]]):
+        relations = await asyncio.gather(
+            *[self.get_edge_relation_name(edge[0], edge[1]) for edge in edges]
+        )
+        return relations
+
+    async def get_paths_from_sources(self, start_nodes: list[str], cutoff: int = 5) -> list[tuple[str, str, str]]:
+        cand = set(start_nodes)
+        paths = []
+        while len(cand) != 0:
+            start = next(iter(cand))
+            cand.remove(start)
+            
+            path_concat = []
+            while True:
+                result = await self.get_one_path(start, cand, cutoff)
+                if result is None: break
+                end, path = result
+                path_concat.extend(path)
+                cand.remove(end)
+            
+            if (len(path_concat)): paths.append(path_concat)
+
+        return paths
+
+    async def get_neighbors_from_sources(self, start_nodes: list[str]):
+        neighbor_list = []
+        neighbor_list_cand = []
+        for u in start_nodes:
+            neis = [(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(u)]
+            neighbor_list.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(u)])
+
+            while neis != []:
+                inter = list(set(neis) & set(start_nodes))
+                new_neis = []
+
+                if len(inter) != 0:
+                    for v in inter:
+                        new_neis.extend([(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(v)])
+                        neighbor_list_cand.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(v)])
+                else:
+                    for v in neis:
+                        new_neis.extend([(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(v)])
+                        neighbor_list_cand.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(v)])
+                if len(neighbor_list_cand) > 10:
+                    break
+                neis = new_neis
+        if len(neighbor_list)<=5:
+            neighbor_list.extend(neighbor_list_cand)
+        return neighbor_list
+
+    async def get_subgraph_from_same_chunk(self):
+        # origin_nodes = await self.get_nodes_data() # list[dict]
+        from Core.Common.Constants import GRAPH_FIELD_SEP
+        origin_edges = await self.get_edges_data() # list[dict]
+
+        from collections import defaultdict
+        # chunk_to_metagraph_nodes = defaultdict(list)  # {"chunk_id": [node1, node2,...]}
+        chunk_to_metagraph_edges = defaultdict(list)  # {"chunk_id": [edge1, edge2,...]}
+        # for node in origin_nodes:
+        #     chunk_to_metagraph_nodes[node['source_id']].append(node)
+        for edge in origin_edges:
+            chunk_to_metagraph_edges[edge["source_id"]].append(edge)
+
+        subgraphs = []
+        async def get_subgraph_data(key, value):
+            subgraph_context = ""
+            for ed in value:
+                seperated_edge = ed["relation_name"].split(GRAPH_FIELD_SEP)
+                tmp = tuple(map(lambda x: ed['src_id'] + " " + x + " " + ed["tgt_id"], seperated_edge))
+                tmp = "; ".join(tmp)
+                subgraph_context += tmp
+                subgraph_context += "; "
+            subgraphs.append({"source_id":key, "content": subgraph_context})
+
+        await asyncio.gather(*[get_subgraph_data(key, value) for key, value in chunk_to_metagraph_edges.items()])
+
+        return subgraphs
+
     async def clustering(self, algorithm: str):
         raise NotImplementedError
 
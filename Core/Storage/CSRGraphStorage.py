@@ -0,0 +1,715 @@
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Optional, Union
+
+import igraph as ig
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from Core.Common.Logger import logger
+from Core.Storage.BaseGraphStorage import BaseGraphStorage
+from Core.Storage.GraphTensorStorage import StringPool
+from Core.Storage.NetworkXStorage import NetworkXStorage
+from Core.Utils.PageRank import build_transition_matrix
+
+
+class AttributeColumn:
+    """
+    One node / edge attribute, stored as an array over the rows.
+
+    Strings are stored as ids into the shared value pool of the storage ("str", -1 = missing), floats as is
+    ("float", NaN = missing), and anything else as Python objects ("object", None = missing). A column receiving a
+    value of another type is widened to "object".
+    """
+    DTYPES = {"str": np.int64, "float": np.float64, "object": object}
+    MISSING = {"str": -1, "float": np.nan, "object": None}
+
+    def __init__(self, kind: str, capacity: int = 0, data: Optional[np.ndarray] = None):
+        self.kind = kind
+        self.data = self.empty(kind, capacity) if data is None else data
+
+    @classmethod
+    def empty(cls, kind: str, capacity: int) -> np.ndarray:
+        return np.full(capacity, cls.MISSING[kind], dtype=cls.DTYPES[kind])
+
+    @staticmethod
+    def kind_of(value: Any) -> str:
+        if isinstance(value, str):
+            return "str"
+        if isinstance(value, float):
+            return "float"
+        return "object"
+
+    def resize(self, capacity: int):
+        data = self.empty(self.kind, capacity)
+        data[:len(self.data)] = self.data
+        self.data = data
+
+
+class CSRGraphStorage(BaseGraphStorage):
+    """
+    Array-backed undirected graph storage, a compact alternative to `NetworkXStorage` with the same API.
+
+    * Node ids are interned into a string pool, the position of a node in the pool being its index.
+    * Edges are two integer arrays (source / target node index), the position of an edge being its index.
+    * Attributes are column arrays (see `AttributeColumn`), all string values being interned into one shared pool,
+      instead of one Python dict per node and per edge.
+    * Edges are looked up through a sorted array of `lo << 32 | hi` node-pair keys, plus a small dict for the edges
+      added since the last compaction; the CSR adjacency used by the traversals is a snapshot re-built after
+      structural changes, as the PPR snapshots of `NetworkXStorage`.
+
+    Node dicts and edge dicts are built on access, so mutating them does not write to the storage.
+    """
+    name: str = "csr_data"  # The directory of the persisted arrays
+    META_NAME = "meta.json"
+    # Compact the pending edges into the sorted key array past max(PENDING_LIMIT, num_edges // 8) edges
+    PENDING_LIMIT = 4096
+
+    def __init__(self):
+        super().__init__()
+        self._version = 0
+        self._data_version = 0
+        self._snapshots = {}
+        self._reset()
+
+    def _reset(self):
+        self._node_ids = StringPool()
+        self._values = StringPool()
+        self._node_columns: dict[str, AttributeColumn] = {}
+        self._edge_columns: dict[str, AttributeColumn] = {}
+        self._node_capacity = 0
+        self._edge_capacity = 0
+        self._num_edges = 0
+        self._edge_src = np.empty(0, dtype=np.int64)
+        self._edge_tgt = np.empty(0, dtype=np.int64)
+        # Sorted node-pair keys of the compacted edges, and the edge index of each key
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._sorted_edges = np.empty(0, dtype=np.int64)
+        self._pending_edges: dict[int, int] = {}
+        # The value pool as an object array, for the bulk decoding, re-built when the pool grows
+        self._value_array = np.empty(0, dtype=object)
+        self._snapshots.clear()
+
+    @property
+    def graph_dir(self):
+        assert self.namespace is not None
+        return self.namespace.get_save_path(self.name)
+
+    @property
+    def graph_file(self):
+        return self.graph_dir
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def data_version(self) -> int:
+        return self._data_version
+
+    def _bump_version(self):
+        self._version += 1
+        self._data_version += 1
+
+    @property
+    def graph(self) -> nx.Graph:
+        """A NetworkX copy of the graph, for the algorithms that need one (e.g., the graph clustering)."""
+        return self.to_networkx()
+
+    def to_networkx(self, node_indices: Optional[np.ndarray] = None) -> nx.Graph:
+        """Export the graph, or the subgraph induced by the given nodes, as a NetworkX graph."""
+        num_nodes, num_edges = self.get_node_num(), self._num_edges
+        if node_indices is None:
+            node_indices = np.arange(num_nodes)
+            edge_indices = np.arange(num_edges)
+        else:
+            node_mask = np.zeros(num_nodes, dtype=bool)
+            node_mask[node_indices] = True
+            edge_indices = np.flatnonzero(node_mask[self._edge_src[:num_edges]] & node_mask[self._edge_tgt[:num_edges]])
+        node_ids = self._node_id_array()
+        graph = nx.Graph()
+        graph.add_nodes_from(zip(node_ids[node_indices].tolist(), self._records(self._node_columns, node_indices)))
+        graph.add_edges_from(zip(node_ids[self._edge_src[edge_indices]].tolist(),
+                                 node_ids[self._edge_tgt[edge_indices]].tolist(),
+                                 self._records(self._edge_columns, edge_indices)))
+        return graph
+
+    # Attribute columns
+
+    def _intern(self, value: str) -> int:
+        lookup = self._values.lookup()
+        value_id = lookup.get(value)
+        if value_id is None:
+            table = self._values.tolist()
+            value_id = lookup[value] = len(table)
+            table.append(value)
+        return value_id
+
+    def _widen(self, column: AttributeColumn):
+        column.data, column.kind = self._decode(column, slice(None)), "object"
+
+    def _set_value(self, columns: dict[str, AttributeColumn], key: str, row: int, value: Any, capacity: int):
+        column = columns.get(key)
+        if value is None:
+            if column is not None:
+                column.data[row] = AttributeColumn.MISSING[column.kind]
+            return
+        kind = AttributeColumn.kind_of(value)
+        if column is None:
+            column = columns[key] = AttributeColumn(kind, capacity)
+        elif column.kind != kind and column.kind != "object":
+            self._widen(column)
+        column.data[row] = self._intern(value) if column.kind == "str" else value
+
+    def _set_values(self, columns: dict[str, AttributeColumn], key: str, rows: np.ndarray, values: list,
+                    capacity: int):
+        """Bulk version of `_set_value`, the strings being interned in one pass."""
+        kinds = {AttributeColumn.kind_of(value) for value in values if value is not None}
+        if len(kinds) != 1 or None in values:
+            for row, value in zip(rows.tolist(), values):
+                self._set_value(columns, key, row, value, capacity)
+            return
+        kind = kinds.pop()
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = AttributeColumn(kind, capacity)
+        elif column.kind != kind and column.kind != "object":
+            self._widen(column)
+        if column.kind == "str":
+            column.data[rows] = self._values.intern(values)
+        elif column.kind == "float":
+            column.data[rows] = values
+        else:
+            for row, value in zip(rows.tolist(), values):
+                column.data[row] = value
+
+    def _get_value(self, column: AttributeColumn, row: int) -> Any:
+        value = column.data[row]
+        if column.kind == "str":
+            return None if value < 0 else self._values[value]
+        if column.kind == "float":
+            return None if np.isnan(value) else float(value)
+        return value
+
+    def _decode(self, column: AttributeColumn, rows) -> np.ndarray:
+        """The values of the rows as an object array, None for the missing ones."""
+        data = column.data[rows]
+        if column.kind == "object":
+            return data
+        values = np.full(len(data), None, dtype=object)
+        if column.kind == "str":
+            present = data >= 0
+            if len(self._value_array) != len(self._values):
+                self._value_array = np.array(self._values.tolist(), dtype=object)
+            values[present] = self._value_array[data[present]]
+        else:
+            present = ~np.isnan(data)
+            values[present] = data[present].tolist()
+        return values
+
+    def _record(self, columns: dict[str, AttributeColumn], row: int) -> dict:
+        record = {}
+        for key, column in columns.items():
+            value = self._get_value(column, row)
+            if value is not None:
+                record[key] = value
+        return record
+
+    def _records(self, columns: dict[str, AttributeColumn], rows: np.ndarray) -> list[dict]:
+        records = [{} for _ in range(len(rows))]
+        for key, column in columns.items():
+            for record, value in zip(records, self._decode(column, rows).tolist()):
+                if value is not None:
+                    record[key] = value
+        return records
+
+    # Nodes and edges
+
+    def _node_id_array(self) -> np.ndarray:
+        def _build():
+            node_ids = np.empty(self.get_node_num(), dtype=object)
+            node_ids[:] = self._node_ids.tolist()
+            return node_ids
+
+        return self._get_snapshot("node_ids", _build)
+
+    def _add_nodes(self, node_ids: list[str]) -> np.ndarray:
+        """Return the index of every node, adding the unknown ones."""
+        num_nodes = self.get_node_num()
+        indices = self._node_ids.intern(node_ids)
+        if self.get_node_num() > num_nodes:
+            if self.get_node_num() > self._node_capacity:
+                self._node_capacity = max(self.get_node_num(), 2 * self._node_capacity, 16)
+                for column in self._node_columns.values():
+                    column.resize(self._node_capacity)
+            self._bump_version()
+        return indices
+
+    def _node_index(self, node_id: str) -> Optional[int]:
+        return self._node_ids.lookup().get(node_id)
+
+    def _edge_index(self, src: int, tgt: int) -> int:
+        key = (min(src, tgt) << 32) | max(src, tgt)
+        edge = self._pending_edges.get(key)
+        if edge is not None:
+            return edge
+        pos = np.searchsorted(self._sorted_keys, key)
+        if pos < len(self._sorted_keys) and self._sorted_keys[pos] == key:
+            return int(self._sorted_edges[pos])
+        return -1
+
+    def _find_edge(self, source_node_id: str, target_node_id: str) -> int:
+        src, tgt = self._node_index(source_node_id), self._node_index(target_node_id)
+        if src is None or tgt is None:
+            return -1
+        return self._edge_index(src, tgt)
+
+    def _add_edges(self, src: np.ndarray, tgt: np.ndarray):
+        num_edges = self._num_edges + len(src)
+        if num_edges > self._edge_capacity:
+            self._edge_capacity = max(num_edges, 2 * self._edge_capacity, 16)
+            for name in ("_edge_src", "_edge_tgt"):
+                array = np.zeros(self._edge_capacity, dtype=np.int64)
+                array[:self._num_edges] = getattr(self, name)[:self._num_edges]
+                setattr(self, name, array)
+            for column in self._edge_columns.values():
+                column.resize(self._edge_capacity)
+        self._edge_src[self._num_edges:num_edges] = src
+        self._edge_tgt[self._num_edges:num_edges] = tgt
+        self._num_edges = num_edges
+        self._bump_version()
+
+    def _compact(self):
+        """Merge the pending edges into the sorted key array."""
+        src, tgt = self._edge_src[:self._num_edges], self._edge_tgt[:self._num_edges]
+        keys = (np.minimum(src, tgt) << 32) | np.maximum(src, tgt)
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys, self._sorted_edges = keys[order], order
+        self._pending_edges = {}
+
+    async def has_node(self, node_id: str) -> bool:
+        return self._node_index(node_id) is not None
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return self._find_edge(source_node_id, target_node_id) >= 0
+
+    async def get_node(self, node_id: str) -> Union[dict, None]:
+        node_index = self._node_index(node_id)
+        return None if node_index is None else self._record(self._node_columns, node_index)
+
+    async def get_edge(self, source_node_id: str, target_node_id: str) -> Union[dict, None]:
+        edge_index = self._find_edge(source_node_id, target_node_id)
+        return None if edge_index < 0 else self._record(self._edge_columns, edge_index)
+
+    async def get_edge_weight(self, source_node_id: str, target_node_id: str) -> Union[float, None]:
+        edge_index = self._find_edge(source_node_id, target_node_id)
+        if edge_index < 0 or "weight" not in self._edge_columns:
+            return None
+        return self._get_value(self._edge_columns["weight"], edge_index)
+
+    async def upsert_node(self, node_id: str, node_data: dict):
+        node_index = int(self._add_nodes([node_id])[0])
+        self._data_version += 1
+        for key, value in node_data.items():
+            self._set_value(self._node_columns, key, node_index, value, self._node_capacity)
+
+    async def upsert_edge(self, source_node_id: str, target_node_id: str, edge_data: dict):
+        src, tgt = self._add_nodes([source_node_id, target_node_id]).tolist()
+        edge_index = self._edge_index(src, tgt)
+        if edge_index < 0:
+            edge_index = self._num_edges
+            self._pending_edges[(min(src, tgt) << 32) | max(src, tgt)] = edge_index
+            self._add_edges(np.array([src]), np.array([tgt]))
+            if len(self._pending_edges) > max(self.PENDING_LIMIT, self._num_edges // 8):
+                self._compact()
+        # Edge weights feed the PPR snapshots, so any edge update invalidates them
+        self._snapshots.clear()
+        self._data_version += 1
+        for key, value in edge_data.items():
+            self._set_value(self._edge_columns, key, edge_index, value, self._edge_capacity)
+
+    async def upsert_nodes(self, nodes: list[tuple[str, dict]]):
+        if not nodes:
+            return
+        rows = self._add_nodes([node_id for node_id, _ in nodes])
+        self._set_records(self._node_columns, rows, [node_data for _, node_data in nodes], self._node_capacity)
+        self._data_version += 1
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict]]):
+        if not edges:
+            return
+        self._compact()
+        src = self._add_nodes([source_node_id for source_node_id, _, _ in edges])
+        tgt = self._add_nodes([target_node_id for _, target_node_id, _ in edges])
+        keys = (np.minimum(src, tgt) << 32) | np.maximum(src, tgt)
+        # Known pairs get their edge index, the new ones (de-duplicated) are appended
+        pos = np.minimum(np.searchsorted(self._sorted_keys, keys), max(len(self._sorted_keys) - 1, 0))
+        is_known = (self._sorted_keys[pos] == keys) if len(self._sorted_keys) else np.zeros(len(keys), dtype=bool)
+        rows = np.empty(len(keys), dtype=np.int64)
+        rows[is_known] = self._sorted_edges[pos[is_known]]
+        new_keys, first, inverse = np.unique(keys[~is_known], return_index=True, return_inverse=True)
+        if len(new_keys):
+            # Keep the order of first appearance for the new edges
+            order = np.argsort(first, kind="stable")
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            rows[~is_known] = self._num_edges + rank[inverse.ravel()]
+            new_src, new_tgt = src[~is_known][first[order]], tgt[~is_known][first[order]]
+            self._add_edges(new_src, new_tgt)
+            self._compact()
+        self._set_records(self._edge_columns, rows, [edge_data for _, _, edge_data in edges], self._edge_capacity)
+        self._snapshots.clear()
+        self._data_version += 1
+
+    def _set_records(self, columns: dict[str, AttributeColumn], rows: np.ndarray, records: list[dict],
+                     capacity: int):
+        by_key: dict[str, tuple[list, list]] = {}
+        for row, record in zip(rows.tolist(), records):
+            for key, value in record.items():
+                key_rows, key_values = by_key.setdefault(key, ([], []))
+                key_rows.append(row)
+                key_values.append(value)
+        for key, (key_rows, key_values) in by_key.items():
+            self._set_values(columns, key, np.asarray(key_rows, dtype=np.int64), key_values, capacity)
+
+    def clear(self):
+        self._reset()
+        self._bump_version()
+
+    # Structure
+
+    def _get_snapshot(self, name: str, builder):
+        """Return the cached structure `name`, re-built only when the graph has changed since it was built."""
+        version, snapshot = self._snapshots.get(name, (None, None))
+        if version != self._version:
+            snapshot = builder()
+            self._snapshots[name] = (self._version, snapshot)
+        return snapshot
+
+    def get_csr_snapshot(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The CSR adjacency: (indptr, neighbour node indices, edge indices, degrees), the neighbours of every node being
+        sorted by index. Self-loops appear once in the adjacency and count twice in the degree, as in NetworkX.
+        """
+
+        def _build():
+            num_nodes = self.get_node_num()
+            src, tgt = self._edge_src[:self._num_edges], self._edge_tgt[:self._num_edges]
+            not_loop = src != tgt
+            rows = np.concatenate([src, tgt[not_loop]])
+            cols = np.concatenate([tgt, src[not_loop]])
+            edges = np.concatenate([np.arange(self._num_edges), np.flatnonzero(not_loop)])
+            order = np.lexsort((cols, rows))
+            indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+            degrees = np.bincount(src, minlength=num_nodes) + np.bincount(tgt, minlength=num_nodes)
+            return indptr, cols[order], edges[order], degrees
+
+        return self._get_snapshot("csr", _build)
+
+    def _expand(self, frontier: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """All the (position in the frontier, neighbour) pairs of the frontier nodes, read from the CSR slices."""
+        indptr, indices, _, _ = self.get_csr_snapshot()
+        degrees = indptr[frontier + 1] - indptr[frontier]
+        positions = np.repeat(np.arange(len(frontier)), degrees)
+        offsets = np.arange(degrees.sum()) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        return positions, indices[indptr[frontier][positions] + offsets]
+
+    def get_igraph_snapshot(self) -> ig.Graph:
+        """The weighted igraph view of the graph, vertex i being the node of index i."""
+
+        def _build():
+            igraph_ = ig.Graph(n=self.get_node_num(),
+                               edges=np.column_stack([self._edge_src[:self._num_edges],
+                                                      self._edge_tgt[:self._num_edges]]).tolist(),
+                               directed=False)
+            igraph_.es["weight"] = self._edge_weights().tolist()
+            return igraph_
+
+        return self._get_snapshot("igraph", _build)
+
+    def get_transition_matrix_snapshot(self) -> csr_matrix:
+        """The transposed transition matrix P^T used by the NumPy power-iteration PPR."""
+
+        def _build():
+            return build_transition_matrix(self._edge_src[:self._num_edges], self._edge_tgt[:self._num_edges],
+                                           self._edge_weights(), self.get_node_num(), directed=False)
+
+        return self._get_snapshot("transition_matrix", _build)
+
+    def _edge_weights(self) -> np.ndarray:
+        # Edges without weight are treated as unit weight
+        return np.asarray([1.0 if weight is None else weight for weight in self._edge_attr_column("weight", None)],
+                          dtype=np.float64)
+
+    def _edge_attr_column(self, key: str, default: Any = "") -> list:
+        column = self._edge_columns.get(key)
+        if column is None:
+            return [default] * self._num_edges
+        return [default if value is None else value
+                for value in self._decode(column, slice(0, self._num_edges)).tolist()]
+
+    def _neighbor_indices(self, node_index: int) -> np.ndarray:
+        indptr, indices, _, _ = self.get_csr_snapshot()
+        return indices[indptr[node_index]:indptr[node_index + 1]]
+
+    async def node_degree(self, node_id: str) -> int:
+        node_index = self._node_index(node_id)
+        return 0 if node_index is None else int(self.get_csr_snapshot()[3][node_index])
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_node_edges(self, source_node_id: str):
+        node_index = self._node_index(source_node_id)
+        if node_index is None:
+            return None
+        return [(source_node_id, neighbor) for neighbor in
+                self._node_id_array()[self._neighbor_indices(node_index)].tolist()]
+
+    async def neighbors(self, node_id):
+        node_index = self._node_index(node_id)
+        if node_index is None:
+            raise ValueError(f"The node {node_id} is not in the graph.")
+        return self._node_id_array()[self._neighbor_indices(node_index)].tolist()
+
+    async def nodes(self):
+        return self._node_ids.tolist()
+
+    async def edges(self):
+        node_ids = self._node_id_array()
+        return list(zip(node_ids[self._edge_src[:self._num_edges]].tolist(),
+                        node_ids[self._edge_tgt[:self._num_edges]].tolist()))
+
+    async def get_nodes(self):
+        return self._node_ids.tolist()
+
+    def get_node_num(self):
+        return len(self._node_ids)
+
+    def get_edge_num(self):
+        return self._num_edges
+
+    async def get_nodes_data(self):
+        nodes = self._records(self._node_columns, np.arange(self.get_node_num()))
+        for node_data in nodes:
+            node_data.setdefault("description", "")
+            node_data.setdefault("entity_type", "")
+            content_parts = [node_data["entity_name"]]
+            if node_data["entity_type"]:
+                content_parts.append(f"{node_data['entity_type']}")
+            if node_data["description"]:
+                content_parts.append(f"{node_data['description']}")
+            node_data["content"] = ": ".join(content_parts)
+        return nodes
+
+    async def get_edges_data(self, need_content=True):
+        edges = self._records(self._edge_columns, np.arange(self._num_edges))
+        if need_content:
+            for edge_data in edges:
+                if edge_data.get("relation_name", "") != "":
+                    edge_data["content"] = "{relation_name}"
+                else:
+                    edge_data["content"] = "{keywords} {src_id} {tgt_id} {description}".format(
+                        keywords=edge_data.get("keywords", ""), src_id=edge_data["src_id"],
+                        tgt_id=edge_data["tgt_id"], description=edge_data.get("description", ""))
+        return edges
+
+    async def get_node_metadata(self) -> list[str]:
+        return ["entity_name"]
+
+    async def get_edge_metadata(self) -> list[str]:
+        return ["src_id", "tgt_id"]
+
+    async def get_subgraph_metadata(self) -> list[str]:
+        return ["source_id"]
+
+    def get_edge_index(self, src_id, tgt_id):
+        return self._find_edge(src_id, tgt_id)
+
+    async def get_edge_index_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Export the edge list as integer arrays: (src node index, tgt node index, edge index)."""
+        return (self._edge_src[:self._num_edges].copy(), self._edge_tgt[:self._num_edges].copy(),
+                np.arange(self._num_edges, dtype=np.int64))
+
+    async def get_edge_attr_column(self, key: str, default: Any = "") -> list:
+        """Return one attribute of every edge, in edge index order."""
+        return self._edge_attr_column(key, default)
+
+    async def get_node_index(self, node_id):
+        node_index = self._node_index(node_id)
+        if node_index is None:
+            logger.error(f"Node {node_id} not in graph")
+        return node_index
+
+    async def get_node_indices(self, node_ids: list[str]) -> np.ndarray:
+        lookup = self._node_ids.lookup()
+        return np.fromiter((lookup.get(node_id, -1) for node_id in node_ids), dtype=np.int64)
+
+    async def get_node_by_index(self, index):
+        return self._record(self._node_columns, index)
+
+    async def get_edge_by_index(self, index):
+        return self._record(self._edge_columns, index)
+
+    async def find_k_hop_neighbors(self, start_node: str, k: int) -> set:
+        return await self.find_k_hop_neighbors_batch([start_node], k)
+
+    async def find_k_hop_neighbors_batch(self, start_nodes: list[str], k: int) -> set:
+        """
+        The nodes at the k-th level of the traversal started from each node (see
+        `BaseGraphStorage.find_k_hop_neighbors`).
+
+        The traversals of all the start nodes advance together: the frontier is a set of (traversal, node) pairs,
+        encoded as `traversal * num_nodes + node`, which is expanded through the CSR slices at every hop.
+        """
+        if k < 1:
+            raise ValueError("K-hop neighbours value must greater than 1.")
+        start = await self.get_node_indices(start_nodes)
+        start = start[start >= 0]
+        if len(start) == 0:
+            return set()
+        num_nodes = self.get_node_num()
+        traversals, frontier = np.arange(len(start)), start
+        visited = np.empty(0, dtype=np.int64)
+        for _ in range(k):
+            positions, neighbors = self._expand(frontier)
+            keys = np.unique(traversals[positions] * num_nodes + neighbors)
+            keys = keys[~np.isin(keys, visited, assume_unique=True)]
+            visited = np.union1d(visited, keys)
+            traversals, frontier = np.divmod(keys, num_nodes)
+        return set(self._node_id_array()[np.unique(frontier)].tolist())
+
+    async def get_one_path(self, start: str, cand: list[str], cutoff: int = 5):
+        """The closest candidate within `cutoff` hops of `start` (breadth-first search), and the edges to it."""
+        start_index = self._node_index(start)
+        if start_index is None:
+            return None
+        cand_mask = np.zeros(self.get_node_num(), dtype=bool)
+        cand_indices = await self.get_node_indices(list(cand))
+        cand_mask[cand_indices[cand_indices >= 0]] = True
+        predecessors = np.full(self.get_node_num(), -1, dtype=np.int64)
+        predecessors[start_index] = start_index
+        frontier = np.array([start_index], dtype=np.int64)
+        end = None
+        for _ in range(cutoff):
+            positions, targets = self._expand(frontier)
+            sources = frontier[positions]
+            is_new = predecessors[targets] < 0
+            targets, first = np.unique(targets[is_new], return_index=True)
+            predecessors[targets] = sources[is_new][first]
+            reached = targets[cand_mask[targets]]
+            if len(reached):
+                end = int(reached[0])
+                break
+            if len(targets) == 0:
+                break
+            frontier = targets
+        if end is None:
+            return None
+
+        node_ids = self._node_id_array()
+        path = []
+        cur = end
+        while cur != start_index:
+            path.append(await self.get_edge(node_ids[predecessors[cur]], node_ids[cur]))
+            cur = int(predecessors[cur])
+        return node_ids[end], path[::-1]
+
+    async def get_induced_subgraph(self, nodes: list[str]):
+        node_indices = await self.get_node_indices(nodes)
+        return self.to_networkx(node_indices[node_indices >= 0])
+
+    async def get_stable_largest_cc(self):
+        return NetworkXStorage.stable_largest_connected_component(self.graph)
+
+    async def cluster_data_to_subgraphs(self, cluster_data: dict[str, list[dict[str, str]]]):
+        for node_id, clusters in cluster_data.items():
+            await self.upsert_node(node_id, {"clusters": json.dumps(clusters)})
+        logger.info(f"Rewrite the graph with cluster data")
+        await self.persist(force=True)
+
+    async def get_community_schema(self):
+        return NetworkXStorage.community_schema_of(self.graph)
+
+    async def embed_nodes(self, algorithm: str) -> tuple[np.ndarray, list[str]]:
+        raise ValueError(f"Node embedding algorithm {algorithm} not supported")
+
+    # Persistence
+
+    async def load_graph(self, force: bool = False) -> bool:
+        if force:
+            logger.info("Force rebuilding the graph")
+            return False
+        meta_file = os.path.join(self.graph_dir, self.META_NAME)
+        if not os.path.exists(meta_file):
+            logger.info("CSR graph does not exist! Need to build the graph from scratch.")
+            return False
+        try:
+            self._load(self.graph_dir)
+        except Exception as e:
+            logger.error(f"Failed to load graph from: {self.graph_dir} with {e}! Need to re-build the graph.")
+            self._reset()
+            return False
+        logger.info(f"Successfully loaded graph from: {self.graph_dir} with {self.get_node_num()} nodes and "
+                    f"{self.get_edge_num()} edges")
+        return True
+
+    def _load(self, directory: str):
+        with open(os.path.join(directory, self.META_NAME), "r") as f:
+            meta = json.load(f)
+
+        def _array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"))
+
+        def _column(name, kind):
+            if kind != "object":
+                return AttributeColumn(kind, data=_array(name))
+            with open(os.path.join(directory, f"{name}.pkl"), "rb") as f:
+                values = pickle.load(f)
+            data = np.empty(len(values), dtype=object)
+            for row, value in enumerate(values):
+                data[row] = value
+            return AttributeColumn(kind, data=data)
+
+        self._reset()
+        self._node_ids = StringPool(_array("node_ids_buffer"), _array("node_ids_offsets"))
+        self._values = StringPool(_array("values_buffer"), _array("values_offsets"))
+        self._edge_src, self._edge_tgt = _array("edge_src"), _array("edge_tgt")
+        self._num_edges = self._edge_capacity = len(self._edge_src)
+        self._node_capacity = len(self._node_ids)
+        self._node_columns = {key: _column(f"nodes_{idx}", kind) for idx, (key, kind) in enumerate(meta["nodes"])}
+        self._edge_columns = {key: _column(f"edges_{idx}", kind) for idx, (key, kind) in enumerate(meta["edges"])}
+        self._compact()
+        self._bump_version()
+
+    async def persist(self, force):
+        if os.path.exists(self.graph_dir) and not force:
+            return
+        logger.info(f"Writing graph with {self.get_node_num()} nodes, {self.get_edge_num()} edges into "
+                    f"{self.graph_dir}")
+        tmp_directory = f"{self.graph_dir}.tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        num_nodes, num_edges = self.get_node_num(), self._num_edges
+        arrays = dict(zip(("node_ids_buffer", "node_ids_offsets"), self._node_ids.to_arrays()))
+        arrays.update(zip(("values_buffer", "values_offsets"), self._values.to_arrays()))
+        arrays.update(edge_src=self._edge_src[:num_edges], edge_tgt=self._edge_tgt[:num_edges])
+        meta = {"nodes": [], "edges": []}
+        for prefix, columns, size in (("nodes", self._node_columns, num_nodes), ("edges", self._edge_columns, num_edges)):
+            for idx, (key, column) in enumerate(columns.items()):
+                meta[prefix].append([key, column.kind])
+                if column.kind == "object":
+                    with open(os.path.join(tmp_directory, f"{prefix}_{idx}.pkl"), "wb") as f:
+                        pickle.dump(column.data[:size].tolist(), f, protocol=pickle.HIGHEST_PROTOCOL)
+                else:
+                    arrays[f"{prefix}_{idx}"] = column.data[:size]
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), np.asarray(array))
+        with open(os.path.join(tmp_directory, self.META_NAME), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(self.graph_dir, ignore_errors=True)
+        os.replace(tmp_directory, self.graph_dir)
@@ -34,6 +34,10 @@ class ChunkKVStorage(BaseKVStorage):
         index_list = [self._key_to_index.get(chunk_id, None) for chunk_id in key_list]
         return index_list
     
+    async def get_indices_by_keys(self, keys: List[str]) -> npt.NDArray[np.int64]:
+        """Map chunk ids to chunk indices in bulk, -1 for the unknown ids."""
+        return np.fromiter((self._key_to_index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
     async def get_index_by_key(self, key:str) -> int:
         return self._key_to_index.get(key, None)
 
@@ -0,0 +1,240 @@
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Iterable, Optional
+
+import networkx as nx
+import numpy as np
+
+from Core.Common.Logger import logger
+from Core.Storage.GraphIndexMap import GraphIndexMap
+from Core.Storage.GraphTensorStorage import StringPool
+
+FORMAT_VERSION = 1
+META_NAME = "meta.json"
+
+
+def _column_kind(values: list) -> str:
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, str) for value in present):
+        return "str"
+    if all(isinstance(value, (bool, np.bool_)) for value in present):
+        return "bool"
+    if all(isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)) for value in present):
+        if all(-2 ** 63 <= value < 2 ** 63 for value in present):
+            return "int64"
+    elif all(isinstance(value, float) for value in present):
+        return "float64"
+    return "object"
+
+
+def write_column(directory: str, name: str, values: list) -> str:
+    """Write one column (None = missing value), returns its kind."""
+    kind = _column_kind(values)
+    is_present = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+    if not is_present.all():
+        np.save(os.path.join(directory, f"{name}.mask.npy"), is_present)
+    if kind == "str":
+        buffer, offsets = StringPool.from_strings(["" if value is None else value for value in values]).to_arrays()
+        np.save(os.path.join(directory, f"{name}.buffer.npy"), buffer)
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    elif kind == "object":
+        with open(os.path.join(directory, f"{name}.pkl"), "wb") as f:
+            pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        fill = {"bool": False, "int64": 0, "float64": 0.0}[kind]
+        np.save(os.path.join(directory, f"{name}.npy"),
+                np.asarray([fill if value is None else value for value in values], dtype=kind))
+    return kind
+
+
+class Column:
+    """One attribute column of the file, memory-mapped; the values are only decoded on access."""
+
+    def __init__(self, directory: str, name: str, kind: str):
+        self.kind = kind
+        mask_file = os.path.join(directory, f"{name}.mask.npy")
+        self.is_present = np.load(mask_file, mmap_mode="r") if os.path.exists(mask_file) else None
+        if kind == "str":
+            self.values = StringPool(np.load(os.path.join(directory, f"{name}.buffer.npy"), mmap_mode="r"),
+                                     np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"))
+        elif kind == "object":
+            with open(os.path.join(directory, f"{name}.pkl"), "rb") as f:
+                self.values = pickle.load(f)
+        else:
+            self.values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+    def has(self, row: int) -> bool:
+        return self.is_present is None or bool(self.is_present[row])
+
+    def __getitem__(self, row: int) -> Any:
+        value = self.values[row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def tolist(self) -> list:
+        """All the values, None for the missing ones."""
+        values = self.values if isinstance(self.values, list) else self.values.tolist()
+        if self.is_present is None:
+            return values
+        return [value if present else None for value, present in zip(values, self.is_present.tolist())]
+
+
+class LazyAttributes:
+    """
+    The attribute columns left out of the graph at load time, e.g., `description`.
+
+    They are filled into the attribute dict of a node / edge on its first access, or into the whole graph at once.
+    A value is only filled when the attribute is still missing from the dict, so that values written since the load
+    are kept.
+    """
+
+    def __init__(self, index_map: GraphIndexMap, node_columns: dict[str, Column], edge_columns: dict[str, Column]):
+        # The rows of the file, kept even when the graph index map of the storage is re-built after changes
+        self.index_map = index_map
+        self.node_columns = node_columns
+        self.edge_columns = edge_columns
+
+    @staticmethod
+    def _fill(data: dict, columns: dict[str, Column], row: Optional[int]):
+        if row is None or row < 0:
+            return
+        for key, column in columns.items():
+            if key not in data and column.has(row):
+                data[key] = column[row]
+
+    def fill_node(self, node_id: str, data: dict):
+        self._fill(data, self.node_columns, self.index_map.node_index(node_id))
+
+    def fill_edge(self, src_id: str, tgt_id: str, data: dict):
+        row = self.index_map.edge_index(src_id, tgt_id)
+        if row < 0:
+            row = self.index_map.edge_index(tgt_id, src_id)
+        self._fill(data, self.edge_columns, row)
+
+    def fill_all(self, graph: nx.Graph):
+        node_ids = self.index_map.node_ids.tolist()
+        for key, column in self.node_columns.items():
+            for node_id, value in zip(node_ids, column.tolist()):
+                data = graph.nodes.get(node_id)
+                if value is not None and data is not None and key not in data:
+                    data[key] = value
+        edge_src, edge_tgt = self.index_map.edge_src.tolist(), self.index_map.edge_tgt.tolist()
+        for key, column in self.edge_columns.items():
+            for src, tgt, value in zip(edge_src, edge_tgt, column.tolist()):
+                data = graph.edges.get((node_ids[src], node_ids[tgt]))
+                if value is not None and data is not None and key not in data:
+                    data[key] = value
+
+
+def _collect_keys(records: Iterable[dict]) -> list[str]:
+    keys = {}
+    for data in records:
+        keys.update(dict.fromkeys(data))
+    return list(keys)
+
+
+def write_columnar_graph(graph: nx.Graph, directory: str):
+    """
+    Write the graph as columnar node / edge tables: one `.npy` file per attribute (strings as a UTF-8 buffer plus
+    offsets), so that reading it back needs no parsing and heavy columns can stay memory-mapped.
+
+    The rows follow `graph.nodes()` / `graph.edges()`, so the tables also are the GraphIndexMap of the graph.
+    """
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    node_ids = list(graph.nodes())
+    node_data = [data for _, data in graph.nodes(data=True)]
+    node_to_index = {node_id: idx for idx, node_id in enumerate(node_ids)}
+    edges = list(graph.edges(data=True))
+    np.save(os.path.join(tmp_directory, "edge_src.npy"),
+            np.fromiter((node_to_index[u] for u, _, _ in edges), dtype=np.int64, count=len(edges)))
+    np.save(os.path.join(tmp_directory, "edge_tgt.npy"),
+            np.fromiter((node_to_index[v] for _, v, _ in edges), dtype=np.int64, count=len(edges)))
+
+    meta = {"format_version": FORMAT_VERSION, "directed": graph.is_directed(), "graph": graph.graph,
+            "num_nodes": len(node_ids), "num_edges": len(edges),
+            "node_id_kind": write_column(tmp_directory, "node_ids", node_ids), "nodes": [], "edges": []}
+    for idx, key in enumerate(_collect_keys(node_data)):
+        kind = write_column(tmp_directory, f"nodes_{idx}", [data.get(key) for data in node_data])
+        meta["nodes"].append([key, kind])
+    for idx, key in enumerate(_collect_keys(data for _, _, data in edges)):
+        kind = write_column(tmp_directory, f"edges_{idx}", [data.get(key) for _, _, data in edges])
+        meta["edges"].append([key, kind])
+    with open(os.path.join(tmp_directory, META_NAME), "w") as f:
+        json.dump(meta, f)
+
+    # Swap the directories only once the new one is complete
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+
+
+def _build_attribute_dicts(size: int, columns: dict[str, Column]) -> list[dict]:
+    records = [{} for _ in range(size)]
+    for key, column in columns.items():
+        values = column.tolist()
+        if column.is_present is None:
+            for data, value in zip(records, values):
+                data[key] = value
+        else:
+            for data, value in zip(records, values):
+                if value is not None:
+                    data[key] = value
+    return records
+
+
+def read_columnar_graph(directory: str, lazy_attrs: Iterable[str] = ()) -> tuple[nx.Graph, GraphIndexMap,
+                                                                                   Optional[LazyAttributes]]:
+    """
+    Read a graph written by `write_columnar_graph`.
+
+    Args:
+        directory: The directory of the columnar tables.
+        lazy_attrs: Attributes left memory-mapped and only decoded on access, see `LazyAttributes`.
+
+    Returns:
+        (graph, index_map, lazy_attributes): The graph, its GraphIndexMap and its lazy columns (None if there are none).
+    """
+    with open(os.path.join(directory, META_NAME), "r") as f:
+        meta = json.load(f)
+    if meta["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar graph format version {meta['format_version']}")
+    lazy_attrs = set(lazy_attrs)
+
+    def _columns(prefix: str, lazy: bool) -> dict[str, Column]:
+        return {key: Column(directory, f"{prefix}_{idx}", kind) for idx, (key, kind) in enumerate(meta[prefix])
+                if (key in lazy_attrs) == lazy}
+
+    node_ids = np.empty(meta["num_nodes"], dtype=object)
+    node_ids[:] = Column(directory, "node_ids", meta["node_id_kind"]).tolist()
+    edge_src = np.load(os.path.join(directory, "edge_src.npy"))
+    edge_tgt = np.load(os.path.join(directory, "edge_tgt.npy"))
+
+    graph = nx.DiGraph() if meta["directed"] else nx.Graph()
+    graph.graph.update(meta["graph"])
+    node_id_list = node_ids.tolist()
+    graph.add_nodes_from(zip(node_id_list, _build_attribute_dicts(meta["num_nodes"], _columns("nodes", False))))
+    graph.add_edges_from(zip(node_ids[edge_src].tolist(), node_ids[edge_tgt].tolist(),
+                             _build_attribute_dicts(meta["num_edges"], _columns("edges", False))))
+
+    index_map = GraphIndexMap(node_ids=node_ids, edge_src=edge_src, edge_tgt=edge_tgt)
+    lazy_node_columns, lazy_edge_columns = _columns("nodes", True), _columns("edges", True)
+    lazy = None
+    if lazy_node_columns or lazy_edge_columns:
+        lazy = LazyAttributes(index_map, lazy_node_columns, lazy_edge_columns)
+    return graph, index_map, lazy
+
+
+def migrate_graphml(graphml_file: str, directory: str, verify: bool = False):
+    """Convert a GraphML file into the columnar format, optionally checking that both hold the same graph."""
+    graph = nx.read_graphml(graphml_file)
+    logger.info(f"Converting {graphml_file} ({graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges) "
+                f"into {directory}")
+    write_columnar_graph(graph, directory)
+    if verify:
+        converted, _, _ = read_columnar_graph(directory)
+        if not (nx.utils.nodes_equal(graph.nodes(data=True), converted.nodes(data=True)) and
+                nx.utils.edges_equal(graph.edges(data=True), converted.edges(data=True))):
+            raise ValueError(f"The converted graph in {directory} differs from {graphml_file}")
@@ -0,0 +1,116 @@
+import os
+import pickle
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from Core.Common.Logger import logger
+
+
+@dataclass
+class GraphIndexMap:
+    """
+    Bidirectional id <-> index table for the nodes and edges of a graph storage.
+
+    The node order follows `graph.nodes()` and the edge order follows `graph.edges()` at build time,
+    which is the order used by the entity/relationship indexes and the e2r/r2c maps.
+    Edges are stored as two compact arrays of node positions, and looked up through a dict keyed by
+    `src_idx * num_nodes + tgt_idx`, so every lookup is O(1).
+    A persisted map records the size and mtime of the graph file written along with it, so that `matches` validates
+    it on load without walking the graph.
+    """
+    node_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    edge_src: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    edge_tgt: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    version: int = 0
+    # Fingerprint of the graph file the map was persisted with, see `source_fingerprint`
+    source: Optional[dict] = None
+    _node_to_index: Dict[str, int] = field(init=False, repr=False, default_factory=dict)
+    _edge_to_index: Dict[int, int] = field(init=False, repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self._node_to_index = {node_id: idx for idx, node_id in enumerate(self.node_ids.tolist())}
+        keys = (self.edge_src * self.num_nodes + self.edge_tgt).tolist()
+        self._edge_to_index = dict(zip(keys, range(len(keys))))
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph, version: int = 0) -> "GraphIndexMap":
+        node_ids = np.empty(graph.number_of_nodes(), dtype=object)
+        node_ids[:] = list(graph.nodes())
+        node_to_index = {node_id: idx for idx, node_id in enumerate(node_ids.tolist())}
+
+        edge_src = np.fromiter((node_to_index[u] for u, _ in graph.edges()), dtype=np.int64,
+                               count=graph.number_of_edges())
+        edge_tgt = np.fromiter((node_to_index[v] for _, v in graph.edges()), dtype=np.int64,
+                               count=graph.number_of_edges())
+        return cls(node_ids=node_ids, edge_src=edge_src, edge_tgt=edge_tgt, version=version)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_src)
+
+    def node_index(self, node_id: str) -> Optional[int]:
+        return self._node_to_index.get(node_id)
+
+    def node_indices(self, node_ids: Iterable[str]) -> np.ndarray:
+        """Return the index of each node id, -1 for the unknown ones."""
+        return np.fromiter((self._node_to_index.get(node_id, -1) for node_id in node_ids), dtype=np.int64)
+
+    def node_id(self, index: int) -> str:
+        return self.node_ids[index]
+
+    def edge_index(self, src_id: str, tgt_id: str) -> int:
+        """Return the index of the edge stored as (src_id, tgt_id), -1 if there is no such edge."""
+        src_idx = self._node_to_index.get(src_id)
+        tgt_idx = self._node_to_index.get(tgt_id)
+        if src_idx is None or tgt_idx is None:
+            return -1
+        return self._edge_to_index.get(src_idx * self.num_nodes + tgt_idx, -1)
+
+    def edge_ids(self, index: int) -> Tuple[str, str]:
+        return self.node_ids[self.edge_src[index]], self.node_ids[self.edge_tgt[index]]
+
+    @staticmethod
+    def source_fingerprint(source_file: str) -> Optional[dict]:
+        """The size and mtime of a graph file, None if it does not exist."""
+        if not os.path.exists(source_file):
+            return None
+        stat = os.stat(source_file)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def matches(self, graph: nx.Graph, source_file: str) -> bool:
+        """
+        Check whether the table still describes the given graph, read from `source_file`.
+
+        The graph file round-trips the order of the nodes and edges, so the table holds as long as that file is the
+        one it was persisted with; the counts guard against a graph changed since it was read.
+        """
+        if self.num_nodes != graph.number_of_nodes() or self.num_edges != graph.number_of_edges():
+            return False
+        return self.source is not None and self.source == self.source_fingerprint(source_file)
+
+    def persist(self, file_name: str, source_file: Optional[str] = None):
+        """Persist the table, along with the fingerprint of the graph file `source_file` written just before."""
+        logger.info(f"Writing graph index map with {self.num_nodes} nodes, {self.num_edges} edges into {file_name}")
+        self.source = self.source_fingerprint(source_file) if source_file is not None else None
+        with open(file_name, "wb") as f:
+            pickle.dump({"node_ids": self.node_ids, "edge_src": self.edge_src, "edge_tgt": self.edge_tgt,
+                         "version": self.version, "source": self.source}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_name: str) -> Optional["GraphIndexMap"]:
+        if not os.path.exists(file_name):
+            return None
+        try:
+            with open(file_name, "rb") as f:
+                data = pickle.load(f)
+            return cls(**data)
+        except Exception as e:
+            logger.error(f"Failed to load graph index map from: {file_name} with {e}! Need to re-build it.")
+            return None
@@ -0,0 +1,29 @@
+"""
+Graph Storage Factory.
+"""
+from Core.Storage.BaseGraphStorage import BaseGraphStorage
+from Core.Storage.CSRGraphStorage import CSRGraphStorage
+from Core.Storage.NetworkXStorage import NetworkXStorage
+
+
+class GraphStorageFactory():
+    def __init__(self):
+        self.creators = {
+            "networkx": self._create_networkx_storage,
+            "csr": self._create_csr_storage,
+        }
+
+    def get_graph_storage(self, config) -> BaseGraphStorage:
+        """Key is `graph_storage` of the graph config."""
+        return self.creators[config.graph_storage](config)
+
+    @staticmethod
+    def _create_networkx_storage(config):
+        return NetworkXStorage(config.graph_storage_format, config.graph_lazy_attrs)
+
+    @staticmethod
+    def _create_csr_storage(config):
+        return CSRGraphStorage()
+
+
+get_graph_storage = GraphStorageFactory().get_graph_storage
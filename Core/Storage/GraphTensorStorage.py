@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+from Core.Common.Constants import GRAPH_FIELD_SEP
+from Core.Common.Logger import logger
+from Core.Storage.BaseStorage import BaseStorage
+
+
+class StringPool:
+    """
+    Interned string table, persisted as one UTF-8 buffer plus an offset array so both files can be memory-mapped.
+    """
+
+    def __init__(self, buffer: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None):
+        self._buffer = np.empty(0, dtype=np.uint8) if buffer is None else buffer
+        self._offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self._strings: Optional[list[str]] = None
+        self._lookup: Optional[dict[str, int]] = None
+
+    @classmethod
+    def from_strings(cls, strings: list[str]) -> "StringPool":
+        """A pool holding the strings in order, duplicates included (e.g., an attribute column)."""
+        pool = cls()
+        pool._strings = list(strings)
+        return pool
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1 if self._strings is None else len(self._strings)
+
+    def __getitem__(self, index: int) -> str:
+        if self._strings is not None:
+            return self._strings[index]
+        return bytes(self._buffer[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+    def tolist(self) -> list[str]:
+        if self._strings is None:
+            buffer = bytes(self._buffer)
+            offsets = self._offsets.tolist()
+            self._strings = [buffer[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+        return self._strings
+
+    def index(self, string: str) -> Optional[int]:
+        return self.lookup().get(string)
+
+    def intern(self, strings: Iterable[str]) -> np.ndarray:
+        """Return the id of every string, appending the unseen ones to the table."""
+        table = self.tolist()
+        lookup = self.lookup()
+        ids = []
+        for string in strings:
+            string_id = lookup.get(string)
+            if string_id is None:
+                string_id = lookup[string] = len(table)
+                table.append(string)
+            ids.append(string_id)
+        return np.asarray(ids, dtype=np.int64)
+
+    def to_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._strings is None:
+            return self._buffer, self._offsets
+        encoded = [string.encode("utf-8") for string in self._strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def lookup(self) -> dict[str, int]:
+        """The string -> id dict, built on first use."""
+        if self._lookup is None:
+            self._lookup = {string: idx for idx, string in enumerate(self.tolist())}
+        return self._lookup
+
+
+@dataclass
+class GraphTensorStorage(BaseStorage):
+    """
+    Integer export of a graph as (src, relation, dst) triplets, the input of the G-Retriever PCST retrieval.
+
+    Every relation of an edge (merged with GRAPH_FIELD_SEP) becomes one triplet row. Node and relation names are
+    interned, and the triplets are three integer arrays, all persisted as `.npy` files and memory-mapped on load.
+    The export is append-only: ids of nodes and triplets never change, and `update` only adds what the graph gained.
+    """
+    RESOURCE_NAMES = ("node_names_buffer", "node_names_offsets", "relation_names_buffer", "relation_names_offsets",
+                      "edge_src", "edge_dst", "edge_rel")
+    META_NAME = "meta.json"
+
+    node_names: StringPool = field(init=False, default_factory=StringPool)
+    relation_names: StringPool = field(init=False, default_factory=StringPool)
+    edge_src: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    edge_dst: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    edge_rel: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    # Bumped whenever the export changes, so that the consumers know when to refresh their views
+    version: int = field(init=False, default=0)
+    # Fingerprint of the exported graph columns at the last synchronization, persisted along with the tensors
+    _graph_fingerprint: Optional[str] = field(init=False, default=None)
+    _synced_data_version: Optional[int] = field(init=False, default=None)
+    # (src, relation, dst) -> triplet row, built on first use
+    _triplet_rows: Optional[dict] = field(init=False, default=None)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_src)
+
+    @property
+    def edge_index(self) -> np.ndarray:
+        return np.vstack([self.edge_src, self.edge_dst])
+
+    def triplet_rows(self) -> dict:
+        """The (src id, relation id, dst id) -> triplet row hash index."""
+        if self._triplet_rows is None:
+            keys = zip(self.edge_src.tolist(), self.edge_rel.tolist(), self.edge_dst.tolist())
+            self._triplet_rows = {key: row for row, key in enumerate(keys)}
+        return self._triplet_rows
+
+    def find_triplets(self, src_name: str, relation_name: str, dst_name: str) -> np.ndarray:
+        """The triplet rows of an edge, one per relation merged in `relation_name`."""
+        src_id, dst_id = self.node_names.index(src_name), self.node_names.index(dst_name)
+        if src_id is None or dst_id is None:
+            return np.empty(0, dtype=np.int64)
+        triplet_rows = self.triplet_rows()
+        rows = [triplet_rows.get((src_id, self.relation_names.index(rel), dst_id))
+                for rel in relation_name.split(sep=GRAPH_FIELD_SEP)]
+        return np.asarray([row for row in rows if row is not None], dtype=np.int64)
+
+    @staticmethod
+    def fingerprint(*columns: list) -> str:
+        """A hash of the string columns of a graph, that changes whenever one of their values does."""
+        digest = hashlib.blake2b(digest_size=16)
+        for column in columns:
+            digest.update("\x1f".join(map(str, column)).encode("utf-8"))
+            digest.update(b"\x1e")
+        return digest.hexdigest()
+
+    def clear(self):
+        """Drop the export, e.g., when the graph is re-built from scratch."""
+        self.node_names, self.relation_names = StringPool(), StringPool()
+        self.edge_src, self.edge_dst, self.edge_rel = (np.empty(0, dtype=np.int64) for _ in range(3))
+        self._graph_fingerprint = None
+        self._synced_data_version = None
+        self._triplet_rows = None
+        self.version += 1
+
+    async def load(self, force: bool = False) -> bool:
+        if force or not self.namespace:
+            return False
+        meta_file = self.namespace.get_load_path(self.META_NAME)
+        if meta_file is None or not os.path.exists(meta_file):
+            logger.info("No graph tensors found, they will be built from the graph.")
+            return False
+        try:
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(self.namespace.get_load_path(f"{name}.npy"), mmap_mode="r")
+                      for name in self.RESOURCE_NAMES}
+        except Exception as e:
+            logger.error(f"Failed to load the graph tensors: {e}! Need to re-build them.")
+            return False
+        self.node_names = StringPool(arrays["node_names_buffer"], arrays["node_names_offsets"])
+        self.relation_names = StringPool(arrays["relation_names_buffer"], arrays["relation_names_offsets"])
+        self.edge_src, self.edge_dst, self.edge_rel = arrays["edge_src"], arrays["edge_dst"], arrays["edge_rel"]
+        self._graph_fingerprint = meta.get("graph_fingerprint")
+        self._synced_data_version = None
+        self._triplet_rows = None
+        self.version += 1
+        logger.info(f"Successfully loaded graph tensors with {self.num_nodes} nodes and {self.num_edges} triplets.")
+        return True
+
+    async def persist(self):
+        if not self.namespace:
+            return
+        arrays = dict(zip(("node_names_buffer", "node_names_offsets"), self.node_names.to_arrays()))
+        arrays.update(zip(("relation_names_buffer", "relation_names_offsets"), self.relation_names.to_arrays()))
+        arrays.update(edge_src=self.edge_src, edge_dst=self.edge_dst, edge_rel=self.edge_rel)
+        try:
+            for name, array in arrays.items():
+                np.save(self.namespace.get_save_path(f"{name}.npy"), np.asarray(array))
+            with open(self.namespace.get_save_path(self.META_NAME), "w") as f:
+                json.dump({"graph_fingerprint": self._graph_fingerprint}, f)
+            logger.info(f"Saving graph tensors with {self.num_nodes} nodes and {self.num_edges} triplets.")
+        except Exception as e:
+            logger.error(f"Error saving the graph tensors: {e}")
+
+    async def update(self, graph) -> bool:
+        """
+        Bring the export up to date with the graph, returns whether anything was added.
+
+        Within a process the check relies on the `data_version` of the graph storage. Otherwise (e.g., right after
+        `load`, the version being per process) the columns of the graph are read and their fingerprint is compared
+        with the one of the last synchronization, before diffing them against the triplets.
+        """
+        data_version = graph.data_version
+        if data_version is not None and data_version == self._synced_data_version:
+            return False
+        nodes = list(await graph.get_nodes())
+        src_names = await graph.get_relationships_attrs(key="src_id")
+        dst_names = await graph.get_relationships_attrs(key="tgt_id")
+        relation_names = await graph.get_relationships_attrs(key="relation_name")
+        fingerprint = self.fingerprint(nodes, src_names, dst_names, relation_names)
+        if fingerprint == self._graph_fingerprint:
+            self._synced_data_version = data_version
+            return False
+
+        num_nodes, num_edges = self.num_nodes, self.num_edges
+        self.node_names.intern(nodes)
+        src_ids = self.node_names.intern(src_names)
+        dst_ids = self.node_names.intern(dst_names)
+        relations = [relation_name.split(sep=GRAPH_FIELD_SEP) for relation_name in relation_names]
+        counts = np.fromiter(map(len, relations), dtype=np.int64, count=len(relations))
+        rel_ids = self.relation_names.intern(rel for edge_relations in relations for rel in edge_relations)
+        src_ids, dst_ids = np.repeat(src_ids, counts), np.repeat(dst_ids, counts)
+
+        # Keep only the triplets that are not exported yet
+        triplet_rows = self.triplet_rows()
+        is_new = np.zeros(len(rel_ids), dtype=bool)
+        for row, key in enumerate(zip(src_ids.tolist(), rel_ids.tolist(), dst_ids.tolist())):
+            if key not in triplet_rows:
+                triplet_rows[key] = len(triplet_rows)
+                is_new[row] = True
+        self.edge_src = np.concatenate([self.edge_src, src_ids[is_new]])
+        self.edge_dst = np.concatenate([self.edge_dst, dst_ids[is_new]])
+        self.edge_rel = np.concatenate([self.edge_rel, rel_ids[is_new]])
+
+        self._graph_fingerprint = fingerprint
+        self._synced_data_version = data_version
+        changed = self.num_nodes != num_nodes or self.num_edges != num_edges
+        if changed:
+            self.version += 1
+            logger.info(f"Graph tensors updated: {self.num_nodes - num_nodes} new nodes, "
+                        f"{self.num_edges - num_edges} new triplets.")
+        return changed
@@ -2,34 +2,63 @@ import html
 import json
 import os
 from collections import defaultdict
-from typing import Any, Union, cast
+from typing import Any, Iterable, Union, cast
+import igraph as ig
 import networkx as nx
 import numpy as np
 from pydantic import model_validator
+from scipy.sparse import csr_matrix
 import asyncio
 from Core.Common.Constants import GRAPH_FIELD_SEP
 from Core.Common.Logger import logger
 from Core.Schema.CommunitySchema import LeidenInfo
 from Core.Storage.BaseGraphStorage import BaseGraphStorage
+from Core.Storage.ColumnarGraphFile import read_columnar_graph, write_columnar_graph
+from Core.Storage.GraphIndexMap import GraphIndexMap
+from Core.Utils.PageRank import build_transition_matrix
 
 
 class NetworkXStorage(BaseGraphStorage):
-    def __init__(self):
+    STORAGE_FORMATS = ("graphml", "columnar")
+
+    def __init__(self, storage_format: str = "graphml", lazy_attrs: Iterable[str] = ("description",)):
         super().__init__()
-        self.edge_list = None
-        self.node_list = None
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown graph storage format {storage_format}, expected one of {self.STORAGE_FORMATS}")
+        self.storage_format = storage_format
+        # Attributes only decoded on access when loading the columnar format
+        self.lazy_attrs = tuple(lazy_attrs)
+        self._lazy = None
+        # Bumped on every structural change (new node / new edge), used to invalidate the derived structures
+        self._version = 0
+        # Bumped on every write, attribute-only updates included, used by the structures that copy node/edge data
+        self._data_version = 0
+        self._index_map = None
+        # Derived structures (e.g., the PPR snapshots), each stored as (version, structure)
+        self._snapshots = {}
 
     name: str = "nx_data.graphml"  # The valid file name for NetworkX
+    columnar_name: str = "nx_data.columns"  # The directory of the columnar format
+    index_map_name: str = "nx_index_map.pkl"  # The id <-> index table persisted alongside the GraphML
     _graph: nx.Graph = nx.Graph()
 
     def load_nx_graph(self) -> bool:
+        if self.storage_format == "columnar":
+            if os.path.exists(self.columnar_dir):
+                return self._load_columnar_graph()
+            if os.path.exists(self.graphml_xml_file):
+                logger.info("No columnar graph found, falling back to the GraphML file; it will be converted on the "
+                            "next persist (or run `migrate_graph_storage.py`).")
         # Attempting to load the graph from the specified GraphML file
         logger.info(f"Attempting to load the graph from: {self.graphml_xml_file}")
         if os.path.exists(self.graphml_xml_file):
             try:
                 self._graph = nx.read_graphml(self.graphml_xml_file)
+                self._lazy = None
+                self._bump_version()
                 logger.info(
                     f"Successfully loaded graph from: {self.graphml_xml_file} with {self._graph.number_of_nodes()} nodes and {self._graph.number_of_edges()} edges")
+                self._load_index_map()
                 return True
             except Exception as e:
                 logger.error(
@@ -40,6 +69,27 @@ class NetworkXStorage(BaseGraphStorage):
             logger.info("GraphML file does not exist! Need to build the graph from scratch.")
             return False
 
+    def _load_columnar_graph(self) -> bool:
+        logger.info(f"Attempting to load the graph from: {self.columnar_dir}")
+        try:
+            self._graph, index_map, self._lazy = read_columnar_graph(self.columnar_dir, self.lazy_attrs)
+        except Exception as e:
+            logger.error(f"Failed to load graph from: {self.columnar_dir} with {e}! Need to re-build the graph.")
+            return False
+        self._bump_version()
+        # The tables follow the node / edge order of the graph, so they already are its index map
+        index_map.version = self._version
+        self._index_map = index_map
+        logger.info(f"Successfully loaded graph from: {self.columnar_dir} with {self._graph.number_of_nodes()} nodes "
+                    f"and {self._graph.number_of_edges()} edges")
+        return True
+
+    def _materialize(self):
+        """Fill the lazy attributes into the whole graph, before handing it out or writing it."""
+        if self._lazy is not None:
+            self._lazy.fill_all(self._graph)
+            self._lazy = None
+
     @staticmethod
     def write_nx_graph(graph: nx.Graph, file_name):
         logger.info(
@@ -59,6 +109,49 @@ class NetworkXStorage(BaseGraphStorage):
         assert self.namespace is not None
         return self.namespace.get_save_path(self.name)
 
+    @property
+    def columnar_dir(self):
+        assert self.namespace is not None
+        return self.namespace.get_save_path(self.columnar_name)
+
+    @property
+    def graph_file(self):
+        """The file (or directory) the graph is persisted into, depending on the storage format."""
+        return self.columnar_dir if self.storage_format == "columnar" else self.graphml_xml_file
+
+    @property
+    def index_map_file(self):
+        assert self.namespace is not None
+        return self.namespace.get_save_path(self.index_map_name)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def data_version(self) -> int:
+        return self._data_version
+
+    def _bump_version(self):
+        self._version += 1
+        self._data_version += 1
+
+    def _load_index_map(self):
+        index_map = GraphIndexMap.load(self.index_map_file)
+        if index_map is not None and index_map.matches(self._graph, self.graphml_xml_file):
+            index_map.version = self._version
+            self._index_map = index_map
+            logger.info(f"Successfully loaded graph index map from: {self.index_map_file}")
+        else:
+            logger.info("Graph index map is missing or outdated, it will be re-built on first use.")
+
+    @property
+    def index_map(self) -> GraphIndexMap:
+        """The id <-> index table of the current graph, re-built lazily after structural changes."""
+        if self._index_map is None or self._index_map.version != self._version:
+            self._index_map = GraphIndexMap.from_graph(self._graph, self._version)
+        return self._index_map
+
     @staticmethod
     def _stabilize_graph(graph: nx.Graph) -> nx.Graph:
         """Refer to https://github.com/microsoft/graphrag/index/graph/utils/stable_lcc.py
@@ -101,13 +194,19 @@ class NetworkXStorage(BaseGraphStorage):
 
     @property
     def graph(self):
+        self._materialize()
         return self._graph
 
     async def _persist(self, force):
-        if os.path.exists(self.graphml_xml_file) and not force:
+        if os.path.exists(self.graph_file) and not force:
             return
-        logger.info(f"Writing graph into {self.graphml_xml_file}")
-        NetworkXStorage.write_nx_graph(self.graph, self.graphml_xml_file)
+        logger.info(f"Writing graph into {self.graph_file}")
+        if self.storage_format == "columnar":
+            logger.info(f"Writing graph with {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
+            write_columnar_graph(self.graph, self.columnar_dir)
+        else:
+            NetworkXStorage.write_nx_graph(self.graph, self.graphml_xml_file)
+            self.index_map.persist(self.index_map_file, self.graphml_xml_file)
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -116,7 +215,10 @@ class NetworkXStorage(BaseGraphStorage):
         return self._graph.has_edge(source_node_id, target_node_id)
 
     async def get_node(self, node_id: str) -> Union[dict, None]:
-        return self._graph.nodes.get(node_id)
+        node_data = self._graph.nodes.get(node_id)
+        if node_data is not None and self._lazy is not None:
+            self._lazy.fill_node(node_id, node_data)
+        return node_data
 
     async def node_degree(self, node_id: str) -> int:
         # [numberchiffre]: node_id not part of graph returns `DegreeView({})` instead of 0
@@ -136,7 +238,10 @@ class NetworkXStorage(BaseGraphStorage):
     async def get_edge(
             self, source_node_id: str, target_node_id: str
     ) -> Union[dict, None]:
-        return self._graph.edges.get((source_node_id, target_node_id))
+        edge_data = self._graph.edges.get((source_node_id, target_node_id))
+        if edge_data is not None and self._lazy is not None:
+            self._lazy.fill_edge(source_node_id, target_node_id, edge_data)
+        return edge_data
 
     async def get_node_edges(self, source_node_id: str):
         if self._graph.has_node(source_node_id):
@@ -144,14 +249,31 @@ class NetworkXStorage(BaseGraphStorage):
         return None
 
     async def upsert_node(self, node_id: str, node_data: dict):
+        if not self._graph.has_node(node_id):
+            self._bump_version()
+        self._data_version += 1
         self._graph.add_node(node_id, **node_data)
 
     # TODO: not use dict for edge_data
     async def upsert_edge(
             self, source_node_id: str, target_node_id: str, edge_data: dict
     ):
+        if not self._graph.has_edge(source_node_id, target_node_id):
+            self._bump_version()
+        # Edge weights feed the PPR snapshots, so any edge update invalidates them
+        self._snapshots.clear()
+        self._data_version += 1
         self._graph.add_edge(source_node_id, target_node_id, **edge_data)
 
+    async def upsert_nodes(self, nodes: list[tuple[str, dict]]):
+        self._graph.add_nodes_from(nodes)
+        self._bump_version()
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict]]):
+        self._graph.add_edges_from(edges)
+        self._snapshots.clear()
+        self._bump_version()
+
     async def _cluster_data_to_subgraphs(self, cluster_data: dict[str, list[dict[str, str]]]):
 
         for node_id, clusters in cluster_data.items():
@@ -188,7 +310,8 @@ class NetworkXStorage(BaseGraphStorage):
 
     # TODO: remove to the basegraph class
     async def get_nodes_data(self):
-        node_list = list(self._graph.nodes())
+        self._materialize()
+        node_list = self.index_map.node_ids.tolist()
 
         async def get_node_data(node_id):
             node_data = await self.get_node(node_id)
@@ -212,7 +335,9 @@ class NetworkXStorage(BaseGraphStorage):
         return nodes
 
     async def get_edges_data(self, need_content=True):
-        edge_list = list(self._graph.edges())
+        self._materialize()
+        index_map = self.index_map
+        edge_list = [index_map.edge_ids(idx) for idx in range(index_map.num_edges)]
         edges = []
 
         async def get_edge_data(edge_id):
@@ -232,55 +357,26 @@ class NetworkXStorage(BaseGraphStorage):
         await asyncio.gather(*[get_edge_data(edge) for edge in edge_list])
         return edges
 
-    async def get_subgraph_from_same_chunk(self):
-        # origin_nodes = await self.get_nodes_data() # list[dict]
-        from Core.Common.Constants import GRAPH_FIELD_SEP
-        origin_edges = await self.get_edges_data() # list[dict]
-
-        from collections import defaultdict
-        # chunk_to_metagraph_nodes = defaultdict(list)  # {"chunk_id": [node1, node2,...]}
-        chunk_to_metagraph_edges = defaultdict(list)  # {"chunk_id": [edge1, edge2,...]}
-        # for node in origin_nodes:
-        #     chunk_to_metagraph_nodes[node['source_id']].append(node)
-        for edge in origin_edges:
-            chunk_to_metagraph_edges[edge["source_id"]].append(edge)
-
-        subgraphs = []
-        async def get_subgraph_data(key, value):
-            subgraph_context = ""
-            for ed in value:
-                seperated_edge = ed["relation_name"].split(GRAPH_FIELD_SEP)
-                tmp = tuple(map(lambda x: ed['src_id'] + " " + x + " " + ed["tgt_id"], seperated_edge))
-                tmp = "; ".join(tmp)
-                subgraph_context += tmp
-                subgraph_context += "; "
-            subgraphs.append({"source_id":key, "content": subgraph_context})
-
-        await asyncio.gather(*[get_subgraph_data(key, value) for key, value in chunk_to_metagraph_edges.items()])
-
-        return subgraphs
-
-
-
-
-
-
-
     async def get_stable_largest_cc(self):
-        return NetworkXStorage.stable_largest_connected_component(self._graph)
+        return NetworkXStorage.stable_largest_connected_component(self.graph)
 
     async def cluster_data_to_subgraphs(self, cluster_data):
         await self._cluster_data_to_subgraphs(cluster_data)
 
     async def get_community_schema(self):
+        return NetworkXStorage.community_schema_of(self.graph)
+
+    @staticmethod
+    def community_schema_of(graph: nx.Graph) -> dict[str, LeidenInfo]:
+        """Gather the communities recorded in the `clusters` attribute of the nodes of a NetworkX graph."""
         max_num_ids = 0
         levels = defaultdict(set)
         _schemas: dict[str, LeidenInfo] = defaultdict(LeidenInfo)
-        for node_id, node_data in self._graph.nodes(data=True):
+        for node_id, node_data in graph.nodes(data=True):
             if "clusters" not in node_data:
                 continue
             clusters = json.loads(node_data["clusters"])
-            this_node_edges = self._graph.edges(node_id)
+            this_node_edges = graph.edges(node_id)
 
             for cluster in clusters:
                 level = cluster["level"]
@@ -344,76 +440,80 @@ class NetworkXStorage(BaseGraphStorage):
         return self._graph.neighbors(node_id)
 
     def get_edge_index(self, src_id, tgt_id):
-        if self.edge_list is None:
-            self.edge_list = list(self._graph.edges())
-        try:
-            return self.edge_list.index((src_id, tgt_id))
-        except ValueError:
-            return -1
+        return self.index_map.edge_index(src_id, tgt_id)
+
+    async def get_edge_index_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Export the edge list as integer arrays: (src node index, tgt node index, edge index)."""
+        index_map = self.index_map
+        return index_map.edge_src, index_map.edge_tgt, np.arange(index_map.num_edges, dtype=np.int64)
+
+    async def get_edge_attr_column(self, key: str, default: Any = "") -> list:
+        """Return one attribute of every edge, in edge index order."""
+        return self._edge_attr_column(key, default)
+
+    def _get_snapshot(self, name: str, builder):
+        """Return the cached structure `name`, re-built only when the graph has changed since it was built."""
+        version, snapshot = self._snapshots.get(name, (None, None))
+        if version != self._version:
+            logger.info(f"Building the {name} snapshot of the graph (version {self._version})")
+            snapshot = builder()
+            self._snapshots[name] = (self._version, snapshot)
+        return snapshot
+
+    def get_igraph_snapshot(self) -> ig.Graph:
+        """The weighted igraph view of the graph, vertex i being the node of index i."""
+
+        def _build():
+            index_map = self.index_map
+            igraph_ = ig.Graph(n=index_map.num_nodes,
+                               edges=np.column_stack([index_map.edge_src, index_map.edge_tgt]).tolist(),
+                               directed=False)
+            igraph_.es["weight"] = self._edge_weights().tolist()
+            return igraph_
+
+        return self._get_snapshot("igraph", _build)
+
+    def get_transition_matrix_snapshot(self) -> csr_matrix:
+        """The transposed transition matrix P^T used by the NumPy power-iteration PPR."""
+
+        def _build():
+            index_map = self.index_map
+            return build_transition_matrix(index_map.edge_src, index_map.edge_tgt, self._edge_weights(),
+                                           index_map.num_nodes, directed=False)
+
+        return self._get_snapshot("transition_matrix", _build)
+
+    def _edge_weights(self) -> np.ndarray:
+        # Edges without weight are treated as unit weight
+        return np.asarray([1.0 if weight is None else weight for weight in self._edge_attr_column("weight", None)],
+                          dtype=np.float64)
+
+    def _edge_attr_column(self, key: str, default: Any = "") -> list:
+        if key in self.lazy_attrs:
+            self._materialize()
+        index_map = self.index_map
+        edges = self._graph.edges
+        return [edges[src_id, tgt_id].get(key, default) for src_id, tgt_id in
+                zip(index_map.node_ids[index_map.edge_src].tolist(), index_map.node_ids[index_map.edge_tgt].tolist())]
 
     async def get_induced_subgraph(self, nodes: list[str]):
-        return self._graph.subgraph(nodes)
+        return self.graph.subgraph(nodes)
 
     async def get_node_index(self, node_id):
-        if self.node_list is None:
-            self.node_list = list(self._graph.nodes())
-        try:
-            return self.node_list.index(node_id)
-        except ValueError:
+        node_index = self.index_map.node_index(node_id)
+        if node_index is None:
             logger.error(f"Node {node_id} not in graph")
+        return node_index
+
+    async def get_node_indices(self, node_ids: list[str]) -> np.ndarray:
+        return self.index_map.node_indices(node_ids)
 
     async def get_node_by_index(self, index):
-        if self.node_list is None:
-            self.node_list = list(self._graph.nodes())
-        return await self.get_node(self.node_list[index])
+        return await self.get_node(self.index_map.node_id(index))
 
     async def get_edge_by_index(self, index):
-        if self.edge_list is None:
-            self.edge_list = list(self._graph.edges())
-
-        return await self.get_edge(self.edge_list[index][0], self.edge_list[index][1])
-
-    async def find_k_hop_neighbors(self, start_node: str, k: int) -> set:
-        """
-        find the k hop neighbors about the given input node
-        :param start_node: str, entity_name
-        :param k: int, k hop value
-        :return: K hop sets(including start_node)
-        """
-        if k < 1:
-            raise ValueError("K-hop neighbours value must greater than 1.")
-
-        visited = set()
-        current_level = {start_node}
-
-        for _ in range(k):
-            next_level = set()  # 下一层的节点
-            for node in current_level:
-                neighbors = set(await self.neighbors(node))
-                next_level.update(neighbors - visited)
-            visited.update(next_level)
-            current_level = next_level
-
-        return current_level
-
-    async def find_k_hop_neighbors_batch(self, start_nodes: list[str], k: int) -> set:
-        nodes_set_list = await asyncio.gather(
-            *[self.find_k_hop_neighbors(node, k) for node in start_nodes]
-        )
-        nodes_list = []
-        for node_set in nodes_set_list:
-            nodes_list.extend(list(node_set))
-        return set(nodes_list)
-
-    async def get_edge_relation_name(self, source_node_id: str, target_node_id: str):
-        edge_data = self._graph.edges.get((source_node_id, target_node_id))
-        return edge_data.get("relation_name") if edge_data is not None else None
-
-    async def get_edge_relation_name_batch(self, edges: list[tuple[str, str]]):
-        relations = await asyncio.gather(
-            *[self.get_edge_relation_name(edge[0], edge[1]) for edge in edges]
-        )
-        return relations
+        src_id, tgt_id = self.index_map.edge_ids(index)
+        return await self.get_edge(src_id, tgt_id)
 
     async def get_one_path(self, start: str, cand: list[str], cutoff: int = 5):
         pred, dist = nx.dijkstra_predecessor_and_distance(self._graph, source = start, cutoff = cutoff, weight = None)
@@ -422,70 +522,14 @@ class NetworkXStorage(BaseGraphStorage):
             if (node in cand) and (end is None or dis < dist[end]): end = node
         if end is None: return None
 
-        # import pdb
-        # pdb.set_trace()
-
         path = []
         cur = end
         while cur != start:
             path.append(await self.get_edge(pred[cur][0], cur))
             cur = pred[cur][0]
-        # import pdb
-        # pdb.set_trace()
         return end, path[::-1]
 
-    async def get_paths_from_sources(self, start_nodes: list[str], cutoff: int = 5) -> list[tuple[str, str, str]]:
-        # import pdb
-        # pdb.set_trace()
-        cand = set(start_nodes)
-        paths = []
-        while len(cand) != 0:
-            start = next(iter(cand))
-            cand.remove(start)
-            
-            path_concat = []
-            while True:
-                result = await self.get_one_path(start, cand, cutoff)
-                if result is None: break
-                end, path = result
-                # import pdb
-                # pdb.set_trace()
-                path_concat.extend(path)
-                cand.remove(end)
-            
-            if (len(path_concat)): paths.append(path_concat)
-
-        return paths
-
-    async def get_neighbors_from_sources(self, start_nodes: list[str]):
-        # import pdb
-        # pdb.set_trace()
-        neighbor_list = []
-        neighbor_list_cand = []
-        for u in start_nodes:
-            neis = [(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(u)]
-            neighbor_list.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(u)])
-
-            while neis != []:
-                inter = list(set(neis) & set(start_nodes))
-                new_neis = []
-
-                if len(inter) != 0:
-                    for v in inter:
-                        new_neis.extend([(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(v)])
-                        neighbor_list_cand.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(v)])
-                else:
-                    for v in neis:
-                        new_neis.extend([(await self.get_edge(e[0], e[1]))["tgt_id"] for e in await self.get_node_edges(v)])
-                        neighbor_list_cand.extend([(await self.get_edge(e[0], e[1])) for e in await self.get_node_edges(v)])
-                if len(neighbor_list_cand) > 10:
-                    break
-                neis = new_neis
-        if len(neighbor_list)<=5:
-            neighbor_list.extend(neighbor_list_cand)
-        # import pdb
-        # pdb.set_trace()
-        return neighbor_list
-
     def clear(self):
         self._graph = nx.Graph()
+        self._lazy = None
+        self._bump_version()
@@ -0,0 +1,112 @@
+from typing import Optional
+
+import numpy as np
+from pcst_fast import pcst_fast
+from scipy.sparse import coo_matrix, csr_matrix
+
+
+def assign_edge_prizes(num_edges: int, matched_rows: list[np.ndarray], scores: list[float], topk_e: int,
+                       c: float = 0.01) -> np.ndarray:
+    """
+    Edge prizes of G-Retriever from the retrieved relations.
+
+    Args:
+        num_edges: Number of triplet rows of the graph.
+        matched_rows: The triplet rows matched by each retrieved relation (from the triplet hash index).
+        scores: The retrieval score of each retrieved relation.
+        topk_e: Number of top relations that receive a prize.
+        c: Gap between two consecutive prize levels.
+
+    Returns:
+        np.ndarray: The prize of every triplet row, the rows sharing a score share the prize of its rank.
+    """
+    e_prizes = np.zeros(num_edges)
+    for rows, score in zip(matched_rows, scores):
+        e_prizes[rows] = score
+
+    last_topk_e_value = topk_e
+    for k in range(min(topk_e, len(scores))):
+        indices = e_prizes == scores[k]
+        num_indices = int(indices.sum())
+        value = min((topk_e - k) / num_indices if num_indices else np.inf, last_topk_e_value - c)
+        e_prizes[indices] = value
+        last_topk_e_value = value * (1 - c)
+    return e_prizes
+
+
+def build_adjacency(edge_index: np.ndarray, num_nodes: int) -> csr_matrix:
+    """The symmetric boolean adjacency of the triplet graph, used to expand k-hop neighbourhoods."""
+    src, dst = edge_index
+    data = np.ones(2 * len(src), dtype=bool)
+    return coo_matrix((data, (np.concatenate([src, dst]), np.concatenate([dst, src]))),
+                      shape=(num_nodes, num_nodes)).tocsr()
+
+
+def k_hop_node_mask(adjacency: csr_matrix, seeds: np.ndarray, k: int) -> np.ndarray:
+    """Boolean mask of the nodes within `k` hops of the seed nodes."""
+    reached = np.zeros(adjacency.shape[0], dtype=bool)
+    reached[seeds] = True
+    frontier = reached.copy()
+    for _ in range(k):
+        frontier = (adjacency @ frontier) & ~reached
+        if not frontier.any():
+            break
+        reached |= frontier
+    return reached
+
+
+def pcst_subgraph(edge_index: np.ndarray, n_prizes: np.ndarray, e_prizes: np.ndarray, cost_e: float,
+                  node_mask: Optional[np.ndarray] = None, root: int = -1, num_clusters: int = 1,
+                  pruning: str = "gw", verbosity_level: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Prize-collecting Steiner tree over the triplet graph, as in G-Retriever.
+
+    Edges whose prize exceeds `cost_e` are replaced by a virtual node carrying the surplus prize and two free edges;
+    the other edges cost `cost_e - prize`. All the PCST inputs are built with array operations.
+
+    Args:
+        edge_index: (2, E) source / destination node of every triplet row.
+        n_prizes: Prize of every node.
+        e_prizes: Prize of every triplet row.
+        cost_e: Cost of an edge.
+        node_mask: Restrict the search to these nodes (e.g., a k-hop neighbourhood), None for the whole graph.
+
+    Returns:
+        (selected_nodes, selected_edges): Node ids and triplet rows of the selected subgraph.
+    """
+    num_nodes = len(n_prizes)
+    src, dst = edge_index
+    if node_mask is None:
+        node_ids = np.arange(num_nodes)
+        edge_ids = np.arange(len(src))
+    else:
+        # Run on the induced subgraph with local node ids, and map the result back afterwards
+        node_ids = np.flatnonzero(node_mask)
+        edge_ids = np.flatnonzero(node_mask[src] & node_mask[dst])
+        local_ids = np.full(num_nodes, -1, dtype=np.int64)
+        local_ids[node_ids] = np.arange(len(node_ids))
+        src, dst = local_ids[src[edge_ids]], local_ids[dst[edge_ids]]
+        n_prizes, e_prizes = n_prizes[node_ids], e_prizes[edge_ids]
+    num_local_nodes = len(node_ids)
+
+    is_virtual = e_prizes > cost_e
+    real_edges = np.flatnonzero(~is_virtual)
+    virtual_edges = np.flatnonzero(is_virtual)
+    virtual_nodes = num_local_nodes + np.arange(len(virtual_edges))
+
+    # Every virtual edge becomes (src, virtual node) and (virtual node, dst)
+    split_edges = np.empty((2 * len(virtual_edges), 2), dtype=np.int64)
+    split_edges[0::2, 0], split_edges[0::2, 1] = src[virtual_edges], virtual_nodes
+    split_edges[1::2, 0], split_edges[1::2, 1] = virtual_nodes, dst[virtual_edges]
+
+    edges = np.concatenate([np.column_stack([src[real_edges], dst[real_edges]]).astype(np.int64), split_edges])
+    prizes = np.concatenate([n_prizes, e_prizes[virtual_edges] - cost_e]).astype(np.float64)
+    costs = np.concatenate([cost_e - e_prizes[real_edges], np.zeros(len(split_edges))]).astype(np.float64)
+
+    vertices, selected = pcst_fast(edges, prizes, costs, root, num_clusters, pruning, verbosity_level)
+
+    selected_edges = np.concatenate([real_edges[selected[selected < len(real_edges)]],
+                                     virtual_edges[vertices[vertices >= num_local_nodes] - num_local_nodes]])
+    selected_nodes = np.unique(np.concatenate([vertices[vertices < num_local_nodes],
+                                               src[selected_edges], dst[selected_edges]]))
+    return node_ids[selected_nodes], edge_ids[selected_edges]
@@ -0,0 +1,62 @@
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, diags
+
+
+def build_transition_matrix(src: np.ndarray, tgt: np.ndarray, weights: np.ndarray, num_nodes: int,
+                            directed: bool = False) -> csr_matrix:
+    """
+    Build the transposed, row-normalized transition matrix P^T of a weighted graph.
+
+    Args:
+        src, tgt: Node indices of the edge endpoints.
+        weights: Edge weights.
+        num_nodes: Number of nodes of the graph.
+        directed: Whether to follow edges only from src to tgt.
+
+    Returns:
+        csr_matrix: P^T with shape (num_nodes, num_nodes), so that `P^T @ p` is one random-walk step.
+    """
+    if not directed:
+        src, tgt, weights = np.concatenate([src, tgt]), np.concatenate([tgt, src]), np.concatenate([weights, weights])
+    adjacency = coo_matrix((weights, (src, tgt)), shape=(num_nodes, num_nodes)).tocsr()
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    inv_out_weight = np.divide(1.0, out_weight, out=np.zeros_like(out_weight), where=out_weight > 0)
+    return (diags(inv_out_weight) @ adjacency).T.tocsr()
+
+
+def personalized_pagerank_power_iteration(transition_t: csr_matrix, reset: np.ndarray, damping: float,
+                                          tol: float = 1e-8, max_iter: int = 100) -> np.ndarray:
+    """
+    Personalized PageRank by power iteration, following igraph's semantics.
+
+    `damping` is the probability to follow an edge, the walker restarts from the reset distribution otherwise;
+    the mass of dangling nodes is redistributed according to the reset distribution as well.
+
+    Args:
+        transition_t: P^T from `build_transition_matrix`.
+        reset: Reset vector (N,) or reset matrix (N, Q), one column per query; columns are normalized internally.
+        damping: Probability to follow an edge.
+        tol: Stop once the L1 change of every column is below this value.
+        max_iter: Maximum number of iterations.
+
+    Returns:
+        np.ndarray: Scores with the same shape as `reset`, each column summing to 1.
+    """
+    reset = np.asarray(reset, dtype=np.float64)
+    is_vector = reset.ndim == 1
+    reset = reset.reshape(reset.shape[0], -1)
+    reset_mass = reset.sum(axis=0, keepdims=True)
+    # An all-zero reset vector falls back to the uniform distribution, as in the classic PageRank
+    reset = np.where(reset_mass > 0, reset / np.where(reset_mass > 0, reset_mass, 1), 1.0 / max(reset.shape[0], 1))
+
+    dangling = np.asarray(transition_t.sum(axis=0)).ravel() == 0
+    scores = reset.copy()
+    for _ in range(max_iter):
+        dangling_mass = scores[dangling].sum(axis=0, keepdims=True)
+        new_scores = damping * (transition_t @ scores + dangling_mass * reset) + (1 - damping) * reset
+        converged = np.abs(new_scores - scores).sum(axis=0).max() < tol
+        scores = new_scores
+        if converged:
+            break
+    scores /= scores.sum(axis=0, keepdims=True)
+    return scores[:, 0] if is_vector else scores
@@ -6,12 +6,12 @@
 @Ref: https://github.com/geekan/MetaGPT/blob/main/metagpt/utils/token_counter.py
 """
 import anthropic
-import tiktoken
 from openai.types import CompletionUsage
 from openai.types.chat import ChatCompletionChunk
 
 from Core.Common.Logger import logger
 from Core.Utils.AhttpClient import apost
+from Core.Utils.ByteTokenizer import encoding_for_model, get_encoding
 
 TOKEN_COSTS = {
     "gpt-3.5-turbo": {"prompt": 0.0015, "completion": 0.002},
@@ -380,10 +380,10 @@ def count_input_tokens(messages, model="gpt-3.5-turbo-0125"):
         num_tokens = vo.count_tokens(str(messages))
         return num_tokens
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        encoding = encoding_for_model(model)
     except KeyError:
         logger.info(f"Warning: model {model} not found in tiktoken. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = get_encoding("cl100k_base")
     if model in {
         "gpt-3.5-turbo-0613",
         "gpt-3.5-turbo-16k-0613",
@@ -470,10 +470,10 @@ def count_output_tokens(string: str, model: str) -> int:
         num_tokens = vo.count_tokens(string)
         return num_tokens
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        encoding = encoding_for_model(model)
     except KeyError:
         logger.info(f"Warning: model {model} not found in tiktoken. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = get_encoding("cl100k_base")
     return len(encoding.encode(string))
 
 
@@ -52,10 +52,8 @@ class RAGQueryDatasetNoDoc(Dataset):
         other_attrs = self.dataset.iloc[idx].drop(["answers", "question"])
         return {"id": idx, "question": question, "answer": answers, **other_attrs}
     
-    def load_entities_triples(self):
-        entities = set()
-        triples = []
-
+    def iter_triples(self):
+        """Stream the (source, relation, target, date) triples of the TSV file, one line at a time."""
         with open(self.data_path, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
@@ -68,9 +66,16 @@ class RAGQueryDatasetNoDoc(Dataset):
                 source, relation, target, date = parts
                 if source == "" or target == "" or relation == "":
                     continue
-                entities.add(source)
-                entities.add(target)
-                triples.append((source, relation, target, date))
+                yield source, relation, target, date
+
+    def load_entities_triples(self):
+        entities = set()
+        triples = []
+
+        for source, relation, target, date in self.iter_triples():
+            entities.add(source)
+            entities.add(target)
+            triples.append((source, relation, target, date))
 
         return list(entities), triples
 
@@ -32,7 +32,11 @@ class Config(WorkingParams, YamlModel):
     use_entities_vdb: bool = True
     use_relations_vdb: bool = True  # Only set True for LightRAG
     use_subgraphs_vdb: bool = False  # Only set True for Medical-GraphRAG
-    vdb_type: str = "vector"  # vector/colbert
+    vdb_type: str = "vector"  # vector/colbert/faiss/faiss_native
+    vdb_vector_backend: str = "llama_index"  # vector only: llama_index / numpy (brute-force float32 matrix)
+    vdb_mmap: bool = False  # faiss_native and numpy vector only: memory-map the stored vectors on load
+    faiss: FaissConfig = FaissConfig()  # faiss/faiss_native: index family and its parameters
+    use_bm25: bool = False  # BM25 indexes over the chunks and the entity descriptions, for the `bm25` / `hybrid` retrievals
     token_model: str = "gpt-3.5-turbo"
     
     
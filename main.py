@@ -29,18 +29,16 @@ def check_dirs(opt):
 
 
 def wrapper_query(query_dataset, digimon, result_dir):
-    all_res = []
-
     # dataset_len = len(query_dataset)
     dataset_len = 100
-    
-    for _, i in enumerate(range(dataset_len)):
-        print(f"Processing query {i+1}/{dataset_len}")
-        query = query_dataset[i]
+    all_res = [query_dataset[i] for i in range(dataset_len)]
+
+    # One batch for all the queries, the PPR queries batch their retrieval
+    print(f"Processing {dataset_len} queries")
+    outputs = asyncio.run(digimon.query_batch([query["question"] for query in all_res]))
+    for query, res in zip(all_res, outputs):
         print(query['answer'])
-        res = asyncio.run(digimon.query(query["question"]))
         query["output"] = res
-        all_res.append(query)
 
     all_res_df = pd.DataFrame(all_res)
     save_path = os.path.join(result_dir, "results.json")
@@ -77,11 +75,11 @@ if __name__ == "__main__":
     # corpus = query_dataset.get_corpus()
     # corpus = corpus[:10]
 
-    entities, triples = query_dataset.load_entities_triples()
-    # print(entities)
+    # Stream the triples from the TSV file instead of loading them all in memory
+    triples = query_dataset.iter_triples()
 
     # asyncio.run(digimon.insert(corpus))
-    asyncio.run(digimon.insert(docs=None, entities=entities, triples=triples))
+    asyncio.run(digimon.insert(docs=None, triples=triples))
 
     save_path = wrapper_query(query_dataset, digimon, result_dir)
 
@@ -0,0 +1,62 @@
+"""
+Convert the GraphML graphs of existing workspaces into the columnar format (`graph_storage_format: columnar`).
+
+Every `*graph_storage_nx_data.graphml` file found under the given paths gets a `*graph_storage_nx_data.columns`
+directory next to it, which `NetworkXStorage` loads instead of the GraphML file once the format is selected.
+
+Usage:
+    python migrate_graph_storage.py ./Results/LightRAG --verify
+    python migrate_graph_storage.py ./Results/HippoRAG/graph_storage_nx_data.graphml --remove_graphml
+"""
+import argparse
+import os
+import time
+
+import networkx as nx
+
+from Core.Storage.ColumnarGraphFile import migrate_graphml, read_columnar_graph
+from Core.Storage.NetworkXStorage import NetworkXStorage
+
+GRAPHML_SUFFIX = f"graph_storage_{NetworkXStorage.name}"
+
+
+def find_graphml_files(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, _, files in os.walk(path):
+            yield from (os.path.join(root, name) for name in sorted(files) if name.endswith(GRAPHML_SUFFIX))
+
+
+def main(args):
+    num_migrated = 0
+    for graphml_file in find_graphml_files(args.paths):
+        directory = graphml_file[:-len(NetworkXStorage.name)] + NetworkXStorage.columnar_name
+        if os.path.exists(directory) and not args.overwrite:
+            print(f"Skipping {graphml_file}: {directory} already exists (use --overwrite)")
+            continue
+        migrate_graphml(graphml_file, directory, verify=args.verify)
+        num_migrated += 1
+
+        start = time.perf_counter()
+        nx.read_graphml(graphml_file)
+        graphml_time = time.perf_counter() - start
+        start = time.perf_counter()
+        read_columnar_graph(directory, lazy_attrs=args.lazy_attrs)
+        print(f"{graphml_file} -> {directory}: load time {graphml_time:.2f}s -> {time.perf_counter() - start:.2f}s")
+
+        if args.remove_graphml:
+            os.remove(graphml_file)
+    print(f"Migrated {num_migrated} graph(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="Workspace directories or GraphML files to convert.")
+    parser.add_argument("--verify", action="store_true", help="Check that the converted graph equals the GraphML one.")
+    parser.add_argument("--overwrite", action="store_true", help="Re-convert graphs that already have a columnar copy.")
+    parser.add_argument("--remove_graphml", action="store_true", help="Delete the GraphML files once converted.")
+    parser.add_argument("--lazy_attrs", nargs="*", default=["description"],
+                        help="Attributes left lazy when timing the columnar load (graph.graph_lazy_attrs).")
+    main(parser.parse_args())